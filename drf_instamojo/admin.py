@@ -9,6 +9,7 @@ from drfaddons.admin import CreateUpdateAdmin
 from drf_instamojo.models import InstamojoConfiguration
 from drf_instamojo.models import Payment
 from drf_instamojo.models import PaymentRequest
+from drf_instamojo.replicas import ReplicaAdminMixin
 
 
 class InstamojoConfigurationAdmin(CreateUpdateAdmin):
@@ -22,9 +23,10 @@ class InstamojoConfigurationAdmin(CreateUpdateAdmin):
     search_fields = ("auth_token", "api_key")
 
 
-class PaymentRequestAdmin(CreateUpdateAdmin):
+class PaymentRequestAdmin(ReplicaAdminMixin, CreateUpdateAdmin):
     """
-    Admin interface for Payment Request model.
+    Admin interface for Payment Request model. Read from a replica, if
+    READ_DATABASES is set.
 
     Author: Himanshu Shankar (https://himanshus.com)
     """
@@ -32,6 +34,7 @@ class PaymentRequestAdmin(CreateUpdateAdmin):
     list_display = ("id", "amount", "purpose", "status", "created_by", "is_enabled")
     search_fields = ("id", "amount", "purpose")
     list_filter = ("status", "is_enabled")
+    list_select_related = ("created_by",)
 
     def has_add_permission(self, request):
         """Did PaymentRequestAdmin has add permission enabled"""
@@ -44,9 +47,10 @@ class PaymentRequestAdmin(CreateUpdateAdmin):
         return False
 
 
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ReplicaAdminMixin, admin.ModelAdmin):
     """
-    Admin interface for Payments.
+    Admin interface for Payments. Read from a replica, if READ_DATABASES
+    is set.
 
     Author: Himanshu Shankar (https://himanshus.com)
     """
@@ -57,8 +61,11 @@ class PaymentAdmin(admin.ModelAdmin):
         "amount",
         "currency",
     )
-    search_fields = ("id",)
-    list_filter = ("status", "payment_request")
+    # Filter by payment request via search, as a list filter loads all
+    # the payment requests
+    search_fields = ("id", "payment_request__id")
+    list_filter = ("status",)
+    autocomplete_fields = ("payment_request",)
 
     def has_add_permission(self, request):
         """Did PaymentRequestAdmin has add permission enabled"""
@@ -8,6 +8,7 @@ class DrfInstamojoConfig(AppConfig):
     """Base AppConfig for DrfInstamojoConfig"""
 
     name = "drf_instamojo"
+    default_auto_field = "django.db.models.AutoField"
     verbose_name = "Instamojo | Django REST Framework"
 
     def ready(self):
@@ -17,7 +18,10 @@ class DrfInstamojoConfig(AppConfig):
         -------
         None
         """
+        from .signals.handlers import configuration_changed_handler  # noqa
         from .signals.handlers import payment_completed_handler  # noqa
         from .signals.handlers import payment_record_handler  # noqa
+        from .signals.handlers import payment_rollup_handler  # noqa
+        from .signals.handlers import read_sticky_handler  # noqa
 
         super(DrfInstamojoConfig, self).ready()
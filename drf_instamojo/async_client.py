@@ -0,0 +1,318 @@
+"""
+Non-blocking Instamojo API clients
+
+Async counterpart of drf_instamojo.client for ASGI deployments. Requires
+httpx, install it with ``pip install drf_instamojo[async]``.
+
+Examples
+--------
+>>> from drf_instamojo.async_client import get_async_client
+
+>>> imojo = get_async_client(ic)
+>>> await imojo.payment_request_status(id="PAYMENT_REQUEST_ID")
+"""
+import asyncio
+import threading
+import time
+import weakref
+
+from .settings import get_setting
+
+
+class AsyncInstamojo:
+    """
+    Async Instamojo wrapper over a pooled httpx.AsyncClient. Implements
+    the payment request APIs of instamojo_wrapper.Instamojo.
+
+    Network errors are raised as builtin ConnectionError and calls are
+    guarded by limiter and breaker, same as
+    drf_instamojo.client.PooledInstamojo.
+    """
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """
+        Creates client of configuration, guarded by its rate limiter and
+        circuit breaker
+
+        Parameters
+        ----------
+        configuration: InstamojoConfiguration
+
+        Returns
+        -------
+        AsyncInstamojo
+        """
+        from .throttling import get_circuit_breaker
+        from .throttling import get_rate_limiter
+
+        return cls(
+            api_key=configuration.api_key,
+            auth_token=configuration.auth_token,
+            endpoint=configuration.base_url,
+            limiter=get_rate_limiter(configuration),
+            breaker=get_circuit_breaker(configuration),
+        )
+
+    def __init__(
+        self, api_key, auth_token=None, endpoint=None, limiter=None, breaker=None
+    ):
+        """Initialize wrapper along with its http client"""
+        self.api_key = api_key
+        self.auth_token = auth_token
+        self.endpoint = endpoint
+        self.client = build_async_client()
+        self.limiter = limiter
+        self.breaker = breaker
+
+    async def _api_call(self, method, path, **kwargs):
+        """
+        Makes API call to Instamojo
+
+        Parameters
+        ----------
+        method: str
+            HTTP method
+        path: str
+            API path relative to endpoint
+        kwargs: data to be sent with the request
+
+        Returns
+        -------
+        dict: decoded JSON response
+
+        Raises
+        ------
+        ConnectionError: if request could not be completed
+        RateLimitExceeded: if rate limit is exhausted
+        CircuitOpen: if Instamojo has been failing recently
+        """
+        import httpx
+
+        from .exceptions import InstamojoUnavailable
+        from .exceptions import RateLimitExceeded
+        from .metrics import report_call
+        from .metrics import report_rejection
+
+        try:
+            if self.limiter is not None and not await self.limiter.aacquire(
+                get_setting("RATE_LIMIT_TIMEOUT")
+            ):
+                raise RateLimitExceeded()
+            if self.breaker is not None:
+                self.breaker.before_call()
+        except InstamojoUnavailable as err:
+            report_rejection(err.default_code)
+            raise
+
+        headers = {"X-Api-Key": self.api_key}
+        if self.auth_token:
+            headers["X-Auth-Token"] = self.auth_token
+
+        api_path = self.endpoint + path
+        if not api_path.endswith("/"):
+            api_path += "/"
+
+        # Encode data the same way as requests does
+        data = {k: str(v) for k, v in kwargs.items() if v is not None}
+
+        with report_call(method.lower(), path) as outcome:
+            start = time.monotonic()
+            try:
+                req = await self._send(method.upper(), api_path, data or None, headers)
+                outcome["failed"] = req.status_code >= 500
+            except httpx.HTTPError as err:
+                raise ConnectionError(str(err)) from err
+            finally:
+                if self.breaker is not None:
+                    self.breaker.record(time.monotonic() - start, outcome["failed"])
+
+        try:
+            return req.json()
+        except (TypeError, ValueError):
+            raise Exception(
+                "Unable to decode response. Expected JSON, got this: "
+                "\n\n\n {text}".format(text=req.text)
+            )
+
+    async def _send(self, method, url, data, headers):
+        """Sends request over self.client, returns httpx.Response"""
+        return await self.client.request(method, url, data=data, headers=headers)
+
+    async def payment_request_create(
+        self,
+        purpose,
+        amount,
+        buyer_name=None,
+        email=None,
+        phone=None,
+        send_email=False,
+        send_sms=False,
+        redirect_url=None,
+        webhook=None,
+        allow_repeated_payments=True,
+    ):
+        """Creates a payment request"""
+        return await self._api_call(
+            method="post",
+            path="payment-requests/",
+            purpose=purpose,
+            amount=amount,
+            buyer_name=buyer_name,
+            email=email,
+            phone=phone,
+            send_email=send_email,
+            send_sms=send_sms,
+            redirect_url=redirect_url,
+            webhook=webhook,
+            allow_repeated_payments=allow_repeated_payments,
+        )
+
+    async def payment_request_status(self, id):
+        """Gets status of a payment request along with its payments"""
+        return await self._api_call(
+            method="get", path="payment-requests/{id}/".format(id=id)
+        )
+
+    async def payment_request_payment_status(self, id, payment_id):
+        """Gets details of a payment of a payment request"""
+        return await self._api_call(
+            method="get",
+            path="payment-requests/{id}/{payment_id}/".format(
+                id=id, payment_id=payment_id
+            ),
+        )
+
+    async def close(self):
+        """Closes all the pooled connections"""
+        await self.client.aclose()
+
+
+def build_async_client():
+    """
+    Creates a httpx.AsyncClient with connection limits and timeouts as
+    per settings.
+
+    Returns
+    -------
+    httpx.AsyncClient
+
+    Raises
+    ------
+    ImproperlyConfigured: if httpx is not installed
+    """
+    from django.core.exceptions import ImproperlyConfigured
+
+    try:
+        import httpx
+    except ImportError:
+        raise ImproperlyConfigured(
+            "httpx is required for async views. Install it with "
+            "`pip install drf_instamojo[async]`."
+        )
+
+    connect, read = get_setting("TIMEOUT")
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(
+            max_connections=get_setting("ASYNC_MAX_CONNECTIONS"),
+            max_keepalive_connections=get_setting("POOL_MAXSIZE"),
+        ),
+        # httpx only retries failed connection attempts
+        transport=httpx.AsyncHTTPTransport(retries=get_setting("MAX_RETRIES")),
+    )
+
+
+# Clients of each event loop, by client key. Loops are weakly referenced,
+# so that clients of loops that are gone, e.g. of async_to_sync() calls,
+# are dropped along with them.
+_loops = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+async def _close_on_shutdown(clients: dict):
+    """
+    Async generator that closes clients once its event loop shuts down
+    its async generators, as asyncio.run() and async_to_sync() do before
+    closing the loop
+    """
+    try:
+        yield
+    finally:
+        with _lock:
+            _loops.pop(asyncio.get_running_loop(), None)
+        while clients:
+            _key, client = clients.popitem()
+            await client.close()
+
+
+def _loop_clients(loop) -> dict:
+    """Returns clients of loop, call with _lock held"""
+    entry = _loops.get(loop)
+    if entry is None:
+        # Loops closed without shutting down async generators are kept
+        # alive by their closer, drop them here
+        for closed in [other for other in _loops if other.is_closed()]:
+            del _loops[closed]
+
+        clients = {}
+        closer = _close_on_shutdown(clients)
+        # Registers closer with loop and runs it up to its yield. It is
+        # referenced here, as loop only keeps a weak reference to it.
+        asyncio.ensure_future(closer.__anext__(), loop=loop)
+        entry = _loops[loop] = (clients, closer)
+    return entry[0]
+
+
+def get_async_client(configuration) -> AsyncInstamojo:
+    """
+    Returns client for the configuration, shared by all the tasks of
+    the running event loop. Client is an instance of ASYNC_CLIENT_CLASS.
+
+    Clients are closed when their loop shuts down, and forgotten when it
+    is garbage collected.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+
+    Returns
+    -------
+    AsyncInstamojo
+    """
+    from django.utils.module_loading import import_string
+
+    from .client import _client_key
+
+    client_class = get_setting("ASYNC_CLIENT_CLASS")
+    # Connections can't be shared across event loops
+    loop = asyncio.get_running_loop()
+    key = _client_key(configuration, client_class)
+    with _lock:
+        clients = _loop_clients(loop)
+        client = clients.get(key)
+        if client is None:
+            # Drop clients built with old credentials
+            for stale in [k for k in clients if k[0] == key[0] and k != key]:
+                del clients[stale]
+            client = import_string(client_class).from_configuration(configuration)
+            clients[key] = client
+    return client
+
+
+def invalidate_async_client(configuration=None):
+    """
+    Removes registered async client(s). Connections of removed clients
+    are closed once garbage collected.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration, optional
+        Configuration whose clients are to be removed. If not provided,
+        all clients are removed.
+    """
+    with _lock:
+        for clients, _closer in list(_loops.values()):
+            for key in list(clients):
+                if configuration is None or key[0] == configuration.pk:
+                    del clients[key]
@@ -0,0 +1,54 @@
+"""
+URLs with async views, for ASGI deployments
+"""
+from django.urls import path
+
+from .async_views import AsyncListAddPaymentRequestView
+from .async_views import AsyncListAddPaymentView
+from .views import BulkAddPaymentRequestView
+from .views import ExportPaymentRequestView
+from .views import ExportPaymentView
+from .views import MetricsView
+from .views import PaymentReportExportView
+from .views import PaymentReportView
+from .views import PaymentWebhookView
+from .views import RetrievePaymentRequestView
+from .views import RetrievePaymentView
+
+
+app_name = "drf_instamojo"
+
+
+urlpatterns = [
+    path(
+        "request/",
+        AsyncListAddPaymentRequestView.as_view(),
+        name="List Add Payment Request",
+    ),
+    path(
+        "request/bulk/",
+        BulkAddPaymentRequestView.as_view(),
+        name="Bulk Add Payment Request",
+    ),
+    path(
+        "request/export/",
+        ExportPaymentRequestView.as_view(),
+        name="Export Payment Request",
+    ),
+    path(
+        "request/<str:pk>/",
+        RetrievePaymentRequestView.as_view(),
+        name="Retrieve Payment Request",
+    ),
+    path("payment/", AsyncListAddPaymentView.as_view(), name="List Add Payment"),
+    path("payment/export/", ExportPaymentView.as_view(), name="Export Payment"),
+    path("payment/<str:pk>/", RetrievePaymentView.as_view(), name="Retrieve Payment"),
+    path("webhook/", PaymentWebhookView.as_view(), name="Payment Webhook"),
+    path("report/payment/", PaymentReportView.as_view(), name="Payment Report"),
+    path(
+        "report/payment/export/",
+        PaymentReportExportView.as_view(),
+        name="Export Payment Report",
+    ),
+    path("metrics/", MetricsView.as_view(), name="Metrics"),
+]
@@ -0,0 +1,129 @@
+"""
+Async views related to drf_instamojo
+
+Counterparts of views in drf_instamojo.views for ASGI deployments.
+Authentication, permissions and parsing are same as the sync views,
+while Instamojo is called without blocking the event loop. Requires
+Django >= 4.1 and httpx.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+
+from .views import ListAddPaymentRequestView
+from .views import ListAddPaymentView
+
+
+class AsyncCreateAPIView(View):
+    """
+    Base async view that wraps a DRF view.
+
+    GET is served by the wrapped view in a thread, while POST passes the
+    request, once authenticated and parsed by the wrapped view, to
+    acreate().
+    """
+
+    view_class = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Returns view exempted from CSRF, same as DRF views"""
+        view = super(AsyncCreateAPIView, cls).as_view(**initkwargs)
+        # DRF's SessionAuthentication enforces CSRF itself
+        view.csrf_exempt = True
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        """Serves GET with the sync view"""
+        return await sync_to_async(self.view_class.as_view())(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        """Authenticates, parses and creates object"""
+        view = self.view_class()
+        view.args = args
+        view.kwargs = kwargs
+        view.format_kwarg = None
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(view, drf_request, *args, **kwargs)
+            response = await self.acreate(view, drf_request)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+
+        return view.finalize_response(drf_request, response, *args, **kwargs)
+
+    @staticmethod
+    def initial(view, request, *args, **kwargs):
+        """
+        Runs authentication, permission and throttle checks and parses
+        request data
+        """
+        view.initial(request, *args, **kwargs)
+        # Access data to parse it here, in thread
+        request.data
+
+    async def acreate(self, view, request):
+        """
+        Creates object
+
+        Parameters
+        ----------
+        view: instance of view_class
+        request: rest_framework.request.Request
+
+        Returns
+        -------
+        rest_framework.response.Response
+        """
+        raise NotImplementedError
+
+
+class AsyncListAddPaymentRequestView(AsyncCreateAPIView):
+    """
+    Async counterpart of ListAddPaymentRequestView.
+    """
+
+    view_class = ListAddPaymentRequestView
+
+    async def acreate(self, view, request):
+        """Creates payment request with Instamojo"""
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        from .idempotency import get_idempotency_key
+        from .services import acreate_payment_request
+
+        if get_idempotency_key(request):
+            # Key's row stays locked till the object is created, which
+            # needs a single transaction, i.e. a single thread
+            return await sync_to_async(view.create)(request)
+
+        serializer = view.get_serializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        instance = await acreate_payment_request(serializer, created_by=request.user)
+        return Response(
+            view.get_serializer(instance).data, status=status.HTTP_201_CREATED
+        )
+
+
+class AsyncListAddPaymentView(AsyncCreateAPIView):
+    """
+    Async counterpart of ListAddPaymentView.
+    """
+
+    view_class = ListAddPaymentView
+
+    async def acreate(self, view, request):
+        """Validates payment with Instamojo and records it"""
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        from .services import acreate_payment
+
+        serializer = view.get_serializer(data=request.data)
+        instance = await acreate_payment(serializer)
+        return Response(
+            view.get_serializer(instance).data, status=status.HTTP_201_CREATED
+        )
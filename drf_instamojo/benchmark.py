@@ -0,0 +1,230 @@
+"""
+Benchmarks of hot paths against a local stub of Instamojo
+
+Measures creating payment requests (PaymentRequestSerializer), verifying
+payments (PaymentSerializer.is_valid) and reconciling them
+(payment_record_handler) against StubInstamojo, a local HTTP server that
+answers like Instamojo after a configurable latency, see
+drf_instamojo.fake. For each operation,
+throughput, p50/p99 latency, DB queries, HTTP calls and memory are
+reported, so that N+1 queries or extra calls to Instamojo show up before
+they ship. Run it with ``python manage.py benchmark_instamojo``, which
+runs in a throwaway test database.
+"""
+import time
+
+from .fake import StubInstamojo
+
+OPERATIONS = ("create", "verify", "reconcile")
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Returns value at fraction (0 to 1) of sorted values"""
+    values = sorted(values)
+    return values[round(fraction * (len(values) - 1))] if values else 0.0
+
+
+def measure(name: str, run, args: list, stub: StubInstamojo, memory_samples: int):
+    """
+    Runs run(arg) for each of args and reports its cost
+
+    Parameters
+    ----------
+    name: str
+        Name of operation
+    run: callable
+        Operation to be measured
+    args: list
+        Argument of each run
+    stub: StubInstamojo
+        Server whose calls are counted
+    memory_samples: int
+        Number of args, from the end, that are run under tracemalloc
+
+    Returns
+    -------
+    dict: ops, ops_per_second, p50_ms, p99_ms, queries_per_op,
+    http_calls_per_op and memory_kib_per_op
+    """
+    import tracemalloc
+
+    from django.db import connections
+
+    queries = [0]
+
+    def count(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    split = len(args) - memory_samples
+    timed, sampled = args[:split], args[split:]
+    latencies = []
+    calls = stub.store.calls
+    wrappers = [connection.execute_wrapper(count) for connection in connections.all()]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    try:
+        started = time.perf_counter()
+        for arg in timed:
+            start = time.perf_counter()
+            run(arg)
+            latencies.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - started
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+    calls = stub.store.calls - calls
+
+    peak = 0
+    if sampled:
+        tracemalloc.start()
+        try:
+            for arg in sampled:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                run(arg)
+                peak += tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+
+    ops = len(timed)
+    return {
+        "operation": name,
+        "ops": ops,
+        "ops_per_second": round(ops / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "queries_per_op": round(queries[0] / ops, 2) if ops else 0.0,
+        "http_calls_per_op": round(calls / ops, 2) if ops else 0.0,
+        "memory_kib_per_op": round(peak / len(sampled) / 1024, 2) if sampled else 0.0,
+    }
+
+
+def run_benchmark(
+    operations=OPERATIONS,
+    iterations: int = 200,
+    latency: float = 0.0,
+    memory_samples=20,
+):
+    """
+    Benchmarks operations against StubInstamojo, in current database
+
+    Creates a user and an active configuration, so run it in a throwaway
+    database, as benchmark_instamojo command does. PooledInstamojo is
+    used, reconciliation is run with ImmediateBackend and rate limiter,
+    circuit breaker and failure injection are off.
+
+    Parameters
+    ----------
+    operations: iterable
+        Operations to benchmark, from OPERATIONS
+    iterations: int
+        Runs of each operation that are timed
+    latency: float
+        Seconds StubInstamojo waits before answering
+    memory_samples: int
+        Additional runs of each operation measured under tracemalloc
+
+    Returns
+    -------
+    list: result of each operation, see measure()
+    """
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+
+    from .models import InstamojoConfiguration
+    from .models import Payment
+    from .models import PaymentRequest
+    from .reconciliation import build_payment
+    from .serializers import PaymentRequestSerializer
+    from .serializers import PaymentSerializer
+    from .signals.handlers import payment_record_handler
+
+    instamojo = {
+        **getattr(settings, "INSTAMOJO", {}),
+        "RECONCILIATION_BACKEND": "drf_instamojo.queue.ImmediateBackend",
+        "RATE_LIMIT": None,
+        "CIRCUIT_BREAKER": False,
+        "CLIENT_CLASS": "drf_instamojo.client.PooledInstamojo",
+        "FAKE_FAILURE_RATE": 0,
+        "FAKE_AUTO_PAY": None,
+    }
+    count = iterations + memory_samples
+    results = []
+
+    with StubInstamojo(latency=latency) as stub, override_settings(INSTAMOJO=instamojo):
+        user_model = get_user_model()
+        user = user_model._default_manager.create(
+            **{user_model.USERNAME_FIELD: "drf_instamojo_benchmark"}
+        )
+        InstamojoConfiguration.objects.filter(is_active=True).update(is_active=False)
+        InstamojoConfiguration.objects.create(
+            api_key="benchmark",
+            auth_token="benchmark",
+            salt="benchmark",
+            base_url=stub.url,
+            is_active=True,
+            created_by=user,
+        )
+
+        def create(number):
+            serializer = PaymentRequestSerializer(
+                data={
+                    "amount": "10.00",
+                    "purpose": "Benchmark #{number}".format(number=number),
+                    "redirect_url": "https://example.com/redirect/",
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            return serializer.save(created_by=user)
+
+        def verify(payment_request):
+            serializer = PaymentSerializer(
+                data={
+                    "id": "MOJO" + payment_request.id,
+                    "payment_request": payment_request.id,
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+
+        def reconcile(payment):
+            payment_record_handler(instance=payment, sender=Payment)
+
+        payment_requests = []
+        if "create" in operations:
+            results.append(
+                measure("create", create, list(range(count)), stub, memory_samples)
+            )
+            payment_requests = list(PaymentRequest.objects.order_by("create_date"))
+        if not payment_requests and set(operations) - {"create"}:
+            payment_requests = [create(number) for number in range(count)]
+        for payment_request in payment_requests:
+            stub.store.pay(payment_request.id, payment_id="MOJO" + payment_request.id)
+
+        if "verify" in operations:
+            results.append(
+                measure("verify", verify, payment_requests, stub, memory_samples)
+            )
+
+        if "reconcile" in operations:
+            # Payment of each request is saved, as received via redirect,
+            # without its signals
+            payments = [
+                build_payment(
+                    payment_request,
+                    stub.store.payment_requests[payment_request.id]["payments"][0],
+                )
+                for payment_request in payment_requests
+            ]
+            Payment.objects.bulk_create(payments, ignore_conflicts=True)
+            # Let reconciliation find something to record
+            for payment_request in payment_requests:
+                stub.store.pay(
+                    payment_request.id, payment_id="MOJO2" + payment_request.id
+                )
+            results.append(
+                measure("reconcile", reconcile, payments, stub, memory_samples)
+            )
+
+    return results
@@ -0,0 +1,319 @@
+"""
+Caches used by drf_instamojo
+
+The active InstamojoConfiguration is cached in-process for
+CONFIGURATION_CACHE_TTL seconds and, if CONFIGURATION_CACHE is set, in
+that Django cache as well. Configurations resolved per request, see
+drf_instamojo.routing, are cached in-process. All of these are
+invalidated whenever a configuration is saved or deleted.
+
+Payment status lookups are cached in-process, and in PAYMENT_STATUS_CACHE
+if set, and concurrent lookups of the same payment share a single call to
+Instamojo. Terminal statuses (Credit / Failed) never change and are
+cached for ever, others for PAYMENT_STATUS_CACHE_TTL seconds and
+unsuccessful lookups for PAYMENT_STATUS_NEGATIVE_TTL seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .settings import get_setting
+
+ACTIVE_CONFIGURATION_KEY = "drf_instamojo:active_configuration"
+PAYMENT_STATUS_KEY = "drf_instamojo:payment_status:{pk}:{id}:{payment_id}"
+
+_local = {"configuration": None, "expires_at": 0.0}
+_lock = threading.Lock()
+
+# Resolved configurations (or None) by key, least recently used first,
+# as (configuration, expires_at)
+_configurations = OrderedDict()
+
+# Cached status responses by key, least recently used first, as
+# (expires_at or None, response)
+_statuses = OrderedDict()
+# Lookups in progress, by key in threads and by (loop, key) in tasks
+_flights = {}
+_async_flights = {}
+
+
+def _shared_cache(setting: str = "CONFIGURATION_CACHE"):
+    """Returns Django cache set in setting, if any"""
+    from django.core.cache import caches
+
+    alias = get_setting(setting)
+    if alias:
+        return caches[alias]
+    return None
+
+
+def get_active_configuration():
+    """
+    Returns the active InstamojoConfiguration, without querying the
+    database while it is cached.
+
+    Returns
+    -------
+    InstamojoConfiguration
+
+    Raises
+    ------
+    InstamojoConfiguration.DoesNotExist: if no configuration is active
+    """
+    from .models import InstamojoConfiguration
+
+    configuration = _local["configuration"]
+    if configuration is not None and _local["expires_at"] > time.monotonic():
+        return configuration
+
+    ttl = get_setting("CONFIGURATION_CACHE_TTL")
+    shared = _shared_cache()
+
+    configuration = shared.get(ACTIVE_CONFIGURATION_KEY) if shared else None
+    if configuration is None:
+        # Raises DoesNotExist, misses are not cached
+        configuration = InstamojoConfiguration.objects.get(is_active=True)
+        if shared:
+            shared.set(ACTIVE_CONFIGURATION_KEY, configuration, ttl)
+
+    with _lock:
+        _local["configuration"] = configuration
+        _local["expires_at"] = time.monotonic() + ttl
+    return configuration
+
+
+def get_configuration(key: str, load):
+    """
+    Returns configuration cached in-process under key, loading it with
+    load() if it is missing or expired. None is cached as well.
+
+    Parameters
+    ----------
+    key: str
+        e.g. "owner:<user pk>"
+    load: callable
+        Returns InstamojoConfiguration or None
+
+    Returns
+    -------
+    InstamojoConfiguration or None
+    """
+    with _lock:
+        entry = _configurations.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            _configurations.move_to_end(key)
+            return entry[0]
+
+    configuration = load()
+    with _lock:
+        _configurations[key] = (
+            configuration,
+            time.monotonic() + get_setting("CONFIGURATION_CACHE_TTL"),
+        )
+        _configurations.move_to_end(key)
+        while len(_configurations) > get_setting("CONFIGURATION_CACHE_SIZE"):
+            _configurations.popitem(last=False)
+    return configuration
+
+
+def invalidate_active_configuration():
+    """
+    Removes the active configuration from all the caches, along with
+    the resolved ones
+    """
+    with _lock:
+        _local["configuration"] = None
+        _local["expires_at"] = 0.0
+        _configurations.clear()
+
+    shared = _shared_cache()
+    if shared:
+        shared.delete(ACTIVE_CONFIGURATION_KEY)
+
+
+def _status_ttl(response: dict):
+    """Returns seconds for which status response is cached, None for ever"""
+    from .variables import CREDIT
+    from .variables import FAILED
+
+    if not response.get("success"):
+        return get_setting("PAYMENT_STATUS_NEGATIVE_TTL")
+    payment = (response.get("payment_request") or {}).get("payment") or {}
+    if payment.get("status") in (CREDIT, FAILED):
+        return None
+    return get_setting("PAYMENT_STATUS_CACHE_TTL")
+
+
+def _get_status(key: str):
+    """Returns status response cached in-process, if any"""
+    with _lock:
+        entry = _statuses.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del _statuses[key]
+            return None
+        _statuses.move_to_end(key)
+        return response
+
+
+def _set_status(key: str, response: dict):
+    """Caches status response in-process and returns its TTL"""
+    ttl = _status_ttl(response)
+    size = get_setting("PAYMENT_STATUS_CACHE_SIZE")
+    if ttl == 0 or not size:
+        return ttl
+    with _lock:
+        _statuses[key] = (None if ttl is None else time.monotonic() + ttl, response)
+        _statuses.move_to_end(key)
+        while len(_statuses) > size:
+            _statuses.popitem(last=False)
+    return ttl
+
+
+def _report_lookup(result: str):
+    """Counts a payment status lookup by its result"""
+    from .metrics import get_metrics
+
+    get_metrics().increment("drf_instamojo_payment_status_lookups_total", result=result)
+
+
+class _Flight:
+    """Lookup in progress, awaited by concurrent identical lookups"""
+
+    def __init__(self):
+        """Initialize unfinished flight"""
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def get_payment_status(configuration, payment_request_id: str, payment_id: str):
+    """
+    Returns response of payment_request_payment_status, from cache if
+    available. Concurrent lookups of the same payment in this process
+    share a single call to Instamojo.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+        Configuration of the payment request
+    payment_request_id: str
+    payment_id: str
+
+    Returns
+    -------
+    dict: decoded JSON response, to be treated as read only
+
+    Raises
+    ------
+    ConnectionError: if Instamojo could not be reached, not cached
+    """
+    from .client import get_client
+
+    key = PAYMENT_STATUS_KEY.format(
+        pk=configuration.pk, id=payment_request_id, payment_id=payment_id
+    )
+    response = _get_status(key)
+    if response is not None:
+        _report_lookup("hit")
+        return response
+
+    shared = _shared_cache("PAYMENT_STATUS_CACHE")
+    response = shared.get(key) if shared else None
+    if response is not None:
+        _set_status(key, response)
+        _report_lookup("hit")
+        return response
+
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        _report_lookup("coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    _report_lookup("miss")
+    try:
+        flight.response = get_client(configuration).payment_request_payment_status(
+            id=payment_request_id, payment_id=payment_id
+        )
+        ttl = _set_status(key, flight.response)
+        if shared and ttl != 0:
+            shared.set(key, flight.response, ttl)
+    except Exception as err:
+        flight.error = err
+        raise
+    finally:
+        with _lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.response
+
+
+async def aget_payment_status(configuration, payment_request_id: str, payment_id: str):
+    """
+    Async counterpart of get_payment_status(). Concurrent lookups of the
+    same payment in the running event loop share a single call.
+    """
+    import asyncio
+
+    from .async_client import get_async_client
+
+    key = PAYMENT_STATUS_KEY.format(
+        pk=configuration.pk, id=payment_request_id, payment_id=payment_id
+    )
+    response = _get_status(key)
+    if response is not None:
+        _report_lookup("hit")
+        return response
+
+    shared = _shared_cache("PAYMENT_STATUS_CACHE")
+    response = await shared.aget(key) if shared else None
+    if response is not None:
+        _set_status(key, response)
+        _report_lookup("hit")
+        return response
+
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), key)
+    future = _async_flights.get(flight_key)
+    if future is not None:
+        _report_lookup("coalesced")
+        return await asyncio.shield(future)
+
+    _report_lookup("miss")
+    future = _async_flights[flight_key] = loop.create_future()
+    try:
+        response = await get_async_client(configuration).payment_request_payment_status(
+            id=payment_request_id, payment_id=payment_id
+        )
+        ttl = _set_status(key, response)
+        if shared and ttl != 0:
+            await shared.aset(key, response, ttl)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as err:
+        future.set_exception(err)
+        # Mark it retrieved, in case no other lookup is waiting
+        future.exception()
+        raise
+    else:
+        future.set_result(response)
+    finally:
+        del _async_flights[flight_key]
+    return response
+
+
+def clear_payment_statuses():
+    """Removes all the payment status responses cached in-process"""
+    with _lock:
+        _statuses.clear()
@@ -0,0 +1,304 @@
+"""
+Pooled Instamojo API clients
+
+instamojo_wrapper calls module level requests functions, which opens a
+new connection (and TLS handshake) for every API call. Clients returned
+by ``get_client`` share a keep-alive session per configuration instead.
+
+Examples
+--------
+>>> from drf_instamojo.client import get_client
+>>> from drf_instamojo.models import InstamojoConfiguration
+
+>>> ic = InstamojoConfiguration.objects.get(is_active=True)
+>>> imojo = get_client(ic)
+>>> imojo.payment_request_status(id="PAYMENT_REQUEST_ID")
+"""
+import threading
+import time
+
+import requests
+from instamojo_wrapper import Instamojo
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .settings import get_setting
+from .throttling import get_circuit_breaker
+from .throttling import get_rate_limiter
+
+
+class PooledInstamojo(Instamojo):
+    """
+    Instamojo wrapper that performs API calls over a persistent
+    requests.Session with bounded connection pool, timeouts and retries.
+
+    Network errors are raised as builtin ConnectionError so that these
+    are handled by the callers. Calls are guarded by limiter and breaker,
+    if provided, see drf_instamojo.throttling.
+    """
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """
+        Creates client of configuration, guarded by its rate limiter and
+        circuit breaker
+
+        Parameters
+        ----------
+        configuration: InstamojoConfiguration
+
+        Returns
+        -------
+        PooledInstamojo
+        """
+        return cls(
+            api_key=configuration.api_key,
+            auth_token=configuration.auth_token,
+            endpoint=configuration.base_url,
+            limiter=get_rate_limiter(configuration),
+            breaker=get_circuit_breaker(configuration),
+        )
+
+    def __init__(
+        self,
+        api_key,
+        auth_token=None,
+        endpoint=None,
+        session=None,
+        limiter=None,
+        breaker=None,
+    ):
+        """Initialize wrapper along with its session"""
+        super(PooledInstamojo, self).__init__(
+            api_key=api_key, auth_token=auth_token, endpoint=endpoint
+        )
+        self.session = session or build_session()
+        self.timeout = get_setting("TIMEOUT")
+        self.limiter = limiter
+        self.breaker = breaker
+
+    def _api_call(self, method, path, **kwargs):
+        """
+        Same as Instamojo._api_call but over self.session
+
+        Parameters
+        ----------
+        method: str
+            HTTP method
+        path: str
+            API path relative to endpoint
+        kwargs: data to be sent with the request, as query parameters
+            for GET
+
+        Returns
+        -------
+        dict: decoded JSON response
+
+        Raises
+        ------
+        ConnectionError: if request could not be completed
+        RateLimitExceeded: if rate limit is exhausted
+        CircuitOpen: if Instamojo has been failing recently
+        """
+        from .exceptions import InstamojoUnavailable
+        from .exceptions import RateLimitExceeded
+        from .metrics import report_call
+        from .metrics import report_rejection
+
+        try:
+            if self.limiter is not None and not self.limiter.acquire(
+                get_setting("RATE_LIMIT_TIMEOUT")
+            ):
+                raise RateLimitExceeded()
+            if self.breaker is not None:
+                self.breaker.before_call()
+        except InstamojoUnavailable as err:
+            report_rejection(err.default_code)
+            raise
+
+        headers = {"X-Api-Key": self.api_key}
+        if self.auth_token:
+            headers["X-Auth-Token"] = self.auth_token
+
+        api_path = self.endpoint + path
+        if not api_path.endswith("/"):
+            api_path += "/"
+
+        method = method.lower()
+        if method not in ("get", "post", "delete", "put", "patch"):
+            raise Exception(
+                "Unable to make a API call for {method} method.".format(method=method)
+            )
+
+        if method == "get":
+            params, data = kwargs, None
+        else:
+            params, data = None, kwargs
+
+        with report_call(method, path) as outcome:
+            start = time.monotonic()
+            try:
+                req = self._send(method, api_path, params, data, headers)
+                outcome["failed"] = req.status_code >= 500
+                retries = getattr(req.raw, "retries", None)
+                outcome["retries"] = len(retries.history) if retries else 0
+            except requests.RequestException as err:
+                raise ConnectionError(str(err)) from err
+            finally:
+                if self.breaker is not None:
+                    self.breaker.record(time.monotonic() - start, outcome["failed"])
+
+        try:
+            return req.json()
+        except (TypeError, ValueError):
+            raise Exception(
+                "Unable to decode response. Expected JSON, got this: "
+                "\n\n\n {text}".format(text=req.text)
+            )
+
+    def _send(self, method, url, params, data, headers) -> requests.Response:
+        """Sends request over self.session"""
+        return self.session.request(
+            method,
+            url,
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=self.timeout,
+        )
+
+    def payment_requests_list(self, **filters):
+        """
+        Same as Instamojo.payment_requests_list but sends filters as
+        query parameters, instead of appending "/" to the query string.
+
+        Parameters
+        ----------
+        filters: min_created_at, max_created_at, min_modified_at,
+            max_modified_at, limit and page
+
+        Returns
+        -------
+        dict: decoded JSON response
+        """
+        from .variables import LIST_REQUEST
+
+        params = {k: v for k, v in filters.items() if v is not None}
+        return self._api_call(method="get", path=LIST_REQUEST, **params)
+
+    def payments_list(self, limit=None, page=None):
+        """
+        Same as Instamojo.payments_list but sends limit and page as query
+        parameters.
+
+        Returns
+        -------
+        dict: decoded JSON response
+        """
+        from .variables import PAYMENTS_LIST_REQUEST
+
+        params = {k: v for k, v in (("limit", limit), ("page", page)) if v}
+        return self._api_call(method="get", path=PAYMENTS_LIST_REQUEST, **params)
+
+    def close(self):
+        """Closes all the pooled connections"""
+        self.session.close()
+
+
+def build_session() -> requests.Session:
+    """
+    Creates a requests.Session mounted with pooled adapter as per
+    settings.
+
+    Returns
+    -------
+    requests.Session
+    """
+    retry = Retry(
+        total=get_setting("MAX_RETRIES"),
+        backoff_factor=get_setting("BACKOFF_FACTOR"),
+        status_forcelist=get_setting("RETRY_STATUS_CODES"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=get_setting("POOL_CONNECTIONS"),
+        pool_maxsize=get_setting("POOL_MAXSIZE"),
+        pool_block=get_setting("POOL_BLOCK"),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _client_key(configuration, client_class: str):
+    """Key under which client of a configuration is registered"""
+    return (
+        configuration.pk,
+        configuration.api_key,
+        configuration.auth_token,
+        configuration.base_url,
+        client_class,
+    )
+
+
+def get_client(configuration) -> PooledInstamojo:
+    """
+    Returns process-wide client for the configuration. Client is
+    created on first use and reused afterwards.
+
+    Client is an instance of CLIENT_CLASS, e.g.
+    drf_instamojo.fake.FakeInstamojo to run without Instamojo.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+
+    Returns
+    -------
+    PooledInstamojo
+    """
+    from django.utils.module_loading import import_string
+
+    client_class = get_setting("CLIENT_CLASS")
+    key = _client_key(configuration, client_class)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # Credentials of this configuration may have changed,
+                # drop the client built with the old ones.
+                _discard(configuration.pk)
+                client = import_string(client_class).from_configuration(configuration)
+                _clients[key] = client
+    return client
+
+
+def _discard(pk):
+    """Removes and closes clients registered for configuration pk"""
+    for key in [key for key in _clients if key[0] == pk]:
+        _clients.pop(key).close()
+
+
+def invalidate_client(configuration=None):
+    """
+    Closes and removes registered client(s).
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration, optional
+        Configuration whose client is to be removed. If not provided,
+        all clients are removed.
+    """
+    with _lock:
+        if configuration is None:
+            while _clients:
+                _clients.popitem()[1].close()
+        else:
+            _discard(configuration.pk)
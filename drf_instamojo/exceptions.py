@@ -0,0 +1,38 @@
+"""
+Exceptions raised by drf_instamojo
+"""
+from django.utils.text import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class InstamojoUnavailable(APIException):
+    """Raised when Instamojo is not called to protect it, or ourselves"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Instamojo is unavailable at the moment, try again later.")
+    default_code = "instamojo_unavailable"
+
+
+class RateLimitExceeded(InstamojoUnavailable):
+    """Raised when rate limit of calls to Instamojo is exhausted"""
+
+    default_detail = _("Too many requests to Instamojo, try again later.")
+    default_code = "instamojo_rate_limited"
+
+
+class CircuitOpen(InstamojoUnavailable):
+    """Raised while circuit breaker of Instamojo calls is open"""
+
+    default_detail = _(
+        "Instamojo is failing or responding slowly, try again in a while."
+    )
+    default_code = "instamojo_circuit_open"
+
+
+class IdempotencyKeyMismatch(APIException):
+    """Raised when an idempotency key is reused for a different request"""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _("Idempotency key has already been used for another request.")
+    default_code = "idempotency_key_mismatch"
@@ -0,0 +1,279 @@
+"""
+Streaming exports of rows
+
+Rows are read as tuples with values_list(), EXPORT_CHUNK_SIZE at a time
+via QuerySet.iterator(), and written out as CSV or NDJSON (a JSON object
+per line) while the response is being streamed, so memory use stays the
+same whatever the size of an export.
+
+Archived raw responses of Instamojo are left out unless asked for, as
+they are much larger than the rows. Then the latest one of each row is
+exported as text in raw_response column.
+
+Examples
+--------
+>>> payments = Payment.objects.order_by("create_date")
+>>> return export_response(payments, export_fields(Payment), "payments", NDJSON)
+
+>>> with open("payments.csv", "w", newline="") as file:
+>>>     write_export(file, payments, export_fields(Payment), raw=True)
+"""
+import csv
+import json
+
+from .settings import get_setting
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+CONTENT_TYPES = {CSV: "text/csv; charset=utf-8", NDJSON: "application/x-ndjson"}
+
+# Leading characters that make spreadsheets read a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+RAW_RESPONSE = "raw_response"
+# Columns of RawResponse that hold raw response, as annotated on rows
+RAW_COLUMNS = {"raw_text": "text", "raw_compressed": "compressed", "raw_data": "data"}
+
+
+class Echo:
+    """File-like object whose write() returns what is written"""
+
+    def write(self, value):
+        """Returns value"""
+        return value
+
+
+def escape_formula(value):
+    """
+    Returns value prefixed with ' if it is text that a spreadsheet would
+    run as a formula, to guard against CSV injection
+
+    Parameters
+    ----------
+    value: any value of a cell
+
+    Returns
+    -------
+    value, or str
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_fields(model, exclude=()) -> tuple:
+    """
+    Returns names of columns of model, except exclude
+
+    Parameters
+    ----------
+    model: Model class
+    exclude: iterable
+        Names of columns to leave out
+
+    Returns
+    -------
+    tuple: e.g. ("id", "payment_request_id", ...)
+    """
+    return tuple(
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname not in exclude
+    )
+
+
+def with_raw_responses(queryset):
+    """
+    Annotates payment requests or payments with RAW_COLUMNS of their
+    latest raw response, i.e. of creation for payment requests
+
+    Parameters
+    ----------
+    queryset: QuerySet
+        Of PaymentRequest or Payment
+
+    Returns
+    -------
+    QuerySet
+    """
+    from django.db.models import OuterRef
+    from django.db.models import Subquery
+
+    from .models import Payment
+    from .models import RawResponse
+
+    responses = RawResponse.objects.order_by("-pk")
+    if queryset.model is Payment:
+        responses = responses.filter(payment=OuterRef("pk"))
+    else:
+        responses = responses.filter(payment_request=OuterRef("pk"), payment=None)
+
+    return queryset.annotate(
+        **{
+            name: Subquery(responses.values(column)[:1])
+            for name, column in RAW_COLUMNS.items()
+        }
+    )
+
+
+def decode_raw_response(text, compressed, data):
+    """
+    Returns raw response stored in any of RawResponse's columns as text
+
+    Parameters
+    ----------
+    text: str or None
+    compressed: bytes or None
+        zlib compressed text
+    data: JSON or None
+
+    Returns
+    -------
+    str or None
+    """
+    import zlib
+
+    if data is not None:
+        return json.dumps(data)
+    if compressed is not None:
+        return zlib.decompress(bytes(compressed)).decode("utf-8")
+    return text
+
+
+def iter_rows(queryset, fields, raw: bool = False, chunk_size: int = None):
+    """
+    Yields fields of each row of queryset as a tuple, fetching
+    chunk_size rows at a time
+
+    Parameters
+    ----------
+    queryset: QuerySet
+    fields: iterable
+        Names of columns
+    raw: bool
+        Whether to add latest raw response of each row as last value,
+        queryset must be of PaymentRequest or Payment
+    chunk_size: int, optional
+        Defaults to EXPORT_CHUNK_SIZE setting
+
+    Yields
+    ------
+    tuple
+    """
+    chunk_size = chunk_size or get_setting("EXPORT_CHUNK_SIZE")
+    if not raw:
+        yield from queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+        return
+
+    count = len(fields)
+    rows = with_raw_responses(queryset).values_list(*fields, *RAW_COLUMNS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield row[:count] + (decode_raw_response(*row[count:]),)
+
+
+def stream_export(
+    queryset, fields, format: str = CSV, raw: bool = False, chunk_size: int = None
+):
+    """
+    Yields rows of queryset as lines of CSV, after a header, or NDJSON.
+    Text cells of CSV that start like a formula are escaped.
+
+    Parameters
+    ----------
+    queryset: QuerySet
+    fields: iterable
+        Names of columns
+    format: str
+        CSV or NDJSON
+    raw: bool
+        Whether to add raw_response column, see iter_rows()
+    chunk_size: int, optional
+        Defaults to EXPORT_CHUNK_SIZE setting
+
+    Yields
+    ------
+    str
+    """
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    columns = tuple(fields) + ((RAW_RESPONSE,) if raw else ())
+    rows = iter_rows(queryset, fields, raw=raw, chunk_size=chunk_size)
+
+    if format == NDJSON:
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(columns, row))) + "\n"
+        return
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(map(escape_formula, row))
+
+
+def export_response(
+    queryset, fields, filename: str, format: str = CSV, raw: bool = False
+):
+    """
+    Returns a response that streams rows of queryset as an attachment
+
+    Parameters
+    ----------
+    queryset: QuerySet
+    fields: iterable
+        Names of columns
+    filename: str
+        Name of attachment, without extension
+    format: str
+        CSV or NDJSON
+    raw: bool
+        Whether to add raw_response column, see iter_rows()
+
+    Returns
+    -------
+    StreamingHttpResponse
+    """
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(
+        stream_export(queryset, fields, format=format, raw=raw),
+        content_type=CONTENT_TYPES[format],
+    )
+    response["Content-Disposition"] = 'attachment; filename="{name}.{ext}"'.format(
+        name=filename, ext=format
+    )
+    return response
+
+
+def write_export(
+    file, queryset, fields, format: str = CSV, raw: bool = False, chunk_size=None
+) -> int:
+    """
+    Writes rows of queryset to file
+
+    Parameters
+    ----------
+    file: file-like object opened for writing text, with newline=""
+    queryset: QuerySet
+    fields: iterable
+        Names of columns
+    format: str
+        CSV or NDJSON
+    raw: bool
+        Whether to add raw_response column, see iter_rows()
+    chunk_size: int, optional
+        Defaults to EXPORT_CHUNK_SIZE setting
+
+    Returns
+    -------
+    int: number of rows written
+    """
+    lines = stream_export(
+        queryset, fields, format=format, raw=raw, chunk_size=chunk_size
+    )
+    count = -1 if format == CSV else 0
+    for line in lines:
+        file.write(line)
+        count += 1
+    return count
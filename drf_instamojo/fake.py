@@ -0,0 +1,513 @@
+"""
+Fake Instamojo for load testing and offline development
+
+FakeStore keeps payment requests and payments in memory and answers the
+APIs used by drf_instamojo like Instamojo does. It is served either
+in-process, by FakeInstamojo and AsyncFakeInstamojo, or over HTTP, by
+StubInstamojo. Payment requests are paid via FakeStore.pay(), or
+FAKE_AUTO_PAY seconds after creation, and a signed webhook is delivered
+to their webhook URL, if any.
+
+Fake clients go through the same rate limiter, circuit breaker and
+metrics as the real ones, with FAKE_LATENCY seconds per call and
+FAKE_FAILURE_RATE of calls failing with 503.
+
+Examples
+--------
+>>> INSTAMOJO = {
+>>>     "CLIENT_CLASS": "drf_instamojo.fake.FakeInstamojo",
+>>>     "ASYNC_CLIENT_CLASS": "drf_instamojo.fake.AsyncFakeInstamojo",
+>>>     "FAKE_LATENCY": 0.2,
+>>>     "FAKE_FAILURE_RATE": 0.01,
+>>>     "FAKE_AUTO_PAY": 5,
+>>> }
+
+>>> from drf_instamojo.fake import get_store
+>>> get_store().pay("PAYMENT_REQUEST_ID")
+"""
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+from .async_client import AsyncInstamojo
+from .client import PooledInstamojo
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+LIST_LIMIT = 50
+
+
+class FakeStore:
+    """
+    In-memory Instamojo, safe to share across threads
+
+    Attributes
+    ----------
+    payment_requests: dict
+        Payment requests by ID, each with its list of payments
+    calls: int
+        Number of API calls handled
+    """
+
+    def __init__(self):
+        """Initialize empty store"""
+        self.payment_requests = {}
+        self.salts = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def handle(self, method: str, path: str, data: dict = None, salt: str = None):
+        """
+        Answers an API call
+
+        Parameters
+        ----------
+        method: str
+            HTTP method
+        path: str
+            API path relative to endpoint, e.g. "payment-requests/"
+        data: dict, optional
+            Query parameters or form data, as strings
+        salt: str, optional
+            Private salt of caller's configuration, used to sign webhooks
+            of payment requests it creates
+
+        Returns
+        -------
+        tuple: (HTTP status, decoded JSON body)
+        """
+        with self.lock:
+            self.calls += 1
+
+        failure_rate = get_setting("FAKE_FAILURE_RATE")
+        if failure_rate and random.random() < failure_rate:
+            return 503, {"success": False, "message": "Service unavailable"}
+
+        method = method.lower()
+        data = data or {}
+        segments = [s for s in path.split("/") if s]
+
+        if segments == ["payment-requests"] and method == "post":
+            return 201, {
+                "success": True,
+                "payment_request": self._without_payments(
+                    self.create_payment_request(data, salt=salt)
+                ),
+            }
+        if segments == ["payment-requests"] and method == "get":
+            return 200, {
+                "success": True,
+                "payment_requests": self.list_payment_requests(data),
+            }
+        if segments == ["payments"] and method == "get":
+            return 200, {"success": True, "payments": self.list_payments(data)}
+
+        payment_request = (
+            self.payment_requests.get(segments[1])
+            if method == "get"
+            and len(segments) in (2, 3)
+            and segments[0] == "payment-requests"
+            else None
+        )
+        if payment_request is None:
+            return 404, {"success": False, "message": "Not found."}
+        if len(segments) == 2:
+            return 200, {"success": True, "payment_request": payment_request}
+
+        payment = next(
+            (p for p in payment_request["payments"] if p["payment_id"] == segments[2]),
+            None,
+        )
+        if payment is None:
+            return 404, {"success": False, "message": "Not found."}
+        data = self._without_payments(payment_request)
+        data["payment"] = payment
+        return 200, {"success": True, "payment_request": data}
+
+    def create_payment_request(self, data: dict, salt: str = None) -> dict:
+        """Creates and returns payment request from form data"""
+        from django.utils import timezone
+
+        now = timezone.now().isoformat()
+        pr_id = uuid.uuid4().hex
+        payment_request = {
+            "id": pr_id,
+            "phone": data.get("phone"),
+            "email": data.get("email"),
+            "buyer_name": data.get("buyer_name"),
+            "amount": data.get("amount"),
+            "purpose": data.get("purpose"),
+            "status": "Pending",
+            "send_sms": data.get("send_sms") == "True",
+            "send_email": data.get("send_email") == "True",
+            "sms_status": None,
+            "email_status": None,
+            "shorturl": None,
+            "longurl": "https://www.instamojo.com/@fake/" + pr_id,
+            "redirect_url": data.get("redirect_url"),
+            "webhook": data.get("webhook"),
+            "allow_repeated_payments": data.get("allow_repeated_payments") == "True",
+            "customer_id": None,
+            "created_at": now,
+            "modified_at": now,
+            "payments": [],
+        }
+        with self.lock:
+            self.payment_requests[pr_id] = payment_request
+            if salt:
+                self.salts[pr_id] = salt
+
+        auto_pay = get_setting("FAKE_AUTO_PAY")
+        if auto_pay is not None:
+            timer = threading.Timer(auto_pay, self.pay, args=(pr_id,))
+            timer.daemon = True
+            timer.start()
+        return payment_request
+
+    def pay(
+        self, payment_request_id: str, status: str = None, payment_id: str = None
+    ) -> dict:
+        """
+        Adds a payment to payment request, as if buyer paid it, and
+        delivers its webhook
+
+        Parameters
+        ----------
+        payment_request_id: str
+        status: str, optional
+            Status of payment, "Credit" (default) completes payment request
+        payment_id: str, optional
+            Defaults to a random "MOJO" ID
+
+        Returns
+        -------
+        dict: payment
+        """
+        from django.utils import timezone
+
+        from .variables import COMPLETED
+        from .variables import CREDIT
+
+        status = status or CREDIT
+        payment_id = payment_id or "MOJO" + uuid.uuid4().hex[:16].upper()
+        with self.lock:
+            payment_request = self.payment_requests[payment_request_id]
+            payment = self.build_payment(payment_request_id, payment_id, status)
+            payment_request["payments"].append(payment)
+            if status == CREDIT:
+                payment_request["status"] = COMPLETED
+            payment_request["modified_at"] = timezone.now().isoformat()
+
+        self.deliver_webhook(payment_request, payment)
+        return payment
+
+    def build_payment(
+        self, payment_request_id: str, payment_id: str, status: str = None
+    ) -> dict:
+        """Returns a payment of payment request, credited by default"""
+        from django.utils import timezone
+
+        from .variables import CREDIT
+
+        payment_request = self.payment_requests[payment_request_id]
+        return {
+            "payment_id": payment_id,
+            "quantity": 1,
+            "status": status or CREDIT,
+            "buyer_name": payment_request["buyer_name"],
+            "buyer_phone": payment_request["phone"],
+            "buyer_email": payment_request["email"],
+            "currency": "INR",
+            "unit_price": payment_request["amount"],
+            "amount": payment_request["amount"],
+            "fees": "0.20",
+            "shipping_address": None,
+            "shipping_city": None,
+            "shipping_state": None,
+            "shipping_zip": None,
+            "shipping_country": None,
+            "affiliate_commission": "0",
+            "created_at": timezone.now().isoformat(),
+            "instrument_type": "CARD",
+            "billing_instrument": "Domestic",
+            "tax_invoice_id": "",
+            "failure": None,
+            "payout": None,
+        }
+
+    def deliver_webhook(self, payment_request: dict, payment: dict):
+        """
+        POSTs payment to webhook URL of payment request, signed like
+        Instamojo does. Skipped if payment request has no webhook or its
+        salt is unknown.
+
+        Returns
+        -------
+        int or None: HTTP status of webhook response, if delivered
+        """
+        import requests
+
+        from .webhooks import compute_mac
+
+        salt = self.salts.get(payment_request["id"])
+        if not payment_request["webhook"] or not salt:
+            return None
+
+        data = {
+            "amount": payment["amount"],
+            "buyer": payment["buyer_email"] or "",
+            "buyer_name": payment["buyer_name"] or "",
+            "buyer_phone": payment["buyer_phone"] or "",
+            "currency": payment["currency"],
+            "fees": payment["fees"],
+            "longurl": payment_request["longurl"],
+            "payment_id": payment["payment_id"],
+            "payment_request_id": payment_request["id"],
+            "purpose": payment_request["purpose"],
+            "shorturl": payment_request["shorturl"] or "",
+            "status": payment["status"],
+        }
+        data["mac"] = compute_mac(data, salt)
+        try:
+            response = requests.post(
+                payment_request["webhook"], data=data, timeout=get_setting("TIMEOUT")
+            )
+        except requests.RequestException:
+            logger.exception(
+                "Delivery of webhook of payment %s failed.", payment["payment_id"]
+            )
+            return None
+        return response.status_code
+
+    def list_payment_requests(self, filters: dict) -> list:
+        """Returns a page of payment requests, latest first"""
+        from django.utils.dateparse import parse_datetime
+
+        bounds = [
+            (name, parse_datetime(filters[prefix + name]), prefix == "min_")
+            for name in ("created_at", "modified_at")
+            for prefix in ("min_", "max_")
+            if filters.get(prefix + name)
+        ]
+
+        def matches(payment_request):
+            for name, bound, is_min in bounds:
+                value = parse_datetime(payment_request[name])
+                if (value < bound) if is_min else (value > bound):
+                    return False
+            return True
+
+        items = [
+            self._without_payments(pr)
+            for pr in list(self.payment_requests.values())
+            if matches(pr)
+        ]
+        items.sort(key=lambda pr: pr["created_at"], reverse=True)
+        return self._page(items, filters)
+
+    def list_payments(self, filters: dict) -> list:
+        """Returns a page of payments, latest first"""
+        items = [
+            dict(
+                payment,
+                payment_request="https://www.instamojo.com/api/1.1/"
+                "payment-requests/{id}/".format(id=pr["id"]),
+            )
+            for pr in list(self.payment_requests.values())
+            for payment in list(pr["payments"])
+        ]
+        items.sort(key=lambda payment: payment["created_at"], reverse=True)
+        return self._page(items, filters)
+
+    @staticmethod
+    def _page(items: list, filters: dict) -> list:
+        """Returns page of items as per limit and page in filters"""
+        limit = int(filters.get("limit") or LIST_LIMIT)
+        end = int(filters.get("page") or 1) * limit
+        start = end - limit
+        return items[start:end]
+
+    @staticmethod
+    def _without_payments(payment_request: dict) -> dict:
+        """Returns payment request as returned on creation"""
+        return {k: v for k, v in payment_request.items() if k != "payments"}
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store() -> FakeStore:
+    """Returns process-wide FakeStore used by fake clients"""
+    global _store
+
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = FakeStore()
+    return _store
+
+
+def _form(params: dict, data: dict) -> dict:
+    """Returns query parameters or form data as sent over the wire"""
+    return {k: str(v) for k, v in (params or data or {}).items() if v is not None}
+
+
+def _path(url: str, endpoint: str) -> str:
+    """Returns API path of url relative to endpoint"""
+    return url.split(endpoint, 1)[-1]
+
+
+class FakeInstamojo(PooledInstamojo):
+    """
+    PooledInstamojo that is answered by FakeStore, in-process, instead
+    of Instamojo. Set CLIENT_CLASS to "drf_instamojo.fake.FakeInstamojo"
+    to use it.
+    """
+
+    salt = None
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Creates client that signs webhooks with configuration's salt"""
+        client = super(FakeInstamojo, cls).from_configuration(configuration)
+        client.salt = configuration.salt
+        return client
+
+    def _send(self, method, url, params, data, headers):
+        """Answers request from FakeStore after FAKE_LATENCY"""
+        import requests
+
+        latency = get_setting("FAKE_LATENCY")
+        if latency:
+            time.sleep(latency)
+
+        status, body = get_store().handle(
+            method, _path(url, self.endpoint), _form(params, data), salt=self.salt
+        )
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(body).encode("utf-8")
+        return response
+
+
+class AsyncFakeInstamojo(AsyncInstamojo):
+    """
+    Async counterpart of FakeInstamojo. Set ASYNC_CLIENT_CLASS to
+    "drf_instamojo.fake.AsyncFakeInstamojo" to use it.
+    """
+
+    salt = None
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Creates client that signs webhooks with configuration's salt"""
+        client = super(AsyncFakeInstamojo, cls).from_configuration(configuration)
+        client.salt = configuration.salt
+        return client
+
+    async def _send(self, method, url, data, headers):
+        """Answers request from FakeStore after FAKE_LATENCY"""
+        import asyncio
+
+        import httpx
+
+        latency = get_setting("FAKE_LATENCY")
+        if latency:
+            await asyncio.sleep(latency)
+
+        status, body = get_store().handle(
+            method, _path(url, self.endpoint), _form(None, data), salt=self.salt
+        )
+        return httpx.Response(
+            status, json=body, request=httpx.Request(method, url, headers=headers)
+        )
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers API calls from server's FakeStore"""
+
+    protocol_version = "HTTP/1.1"
+    # Send headers and body together, without waiting for delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self, data: dict = None):
+        """Answers request with data, as JSON"""
+        url = urlsplit(self.path)
+        if data is None:
+            data = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status, body = self.server.store.handle(self.command, url.path, data)
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Payment request status, payment status and listings"""
+        self._handle()
+
+    def do_POST(self):
+        """Creates payment request"""
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        self._handle({k: v[0] for k, v in parse_qs(body).items()})
+
+    def log_message(self, format, *args):
+        """Keeps console quiet"""
+
+
+class StubInstamojo(ThreadingHTTPServer):
+    """
+    Local HTTP server that answers like Instamojo from its own FakeStore.
+    Webhooks are not delivered, as salt of caller is unknown.
+
+    Parameters
+    ----------
+    latency: float
+        Seconds to wait before answering each call
+
+    Examples
+    --------
+    >>> with StubInstamojo(latency=0.05) as stub:
+    >>>     configuration.base_url = stub.url
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        """Binds to a free local port"""
+        super(StubInstamojo, self).__init__(("127.0.0.1", 0), _StubHandler)
+        self.latency = latency
+        self.store = FakeStore()
+
+    @property
+    def url(self) -> str:
+        """Base URL to be used as base_url of configuration"""
+        return "http://127.0.0.1:{port}/".format(port=self.server_port)
+
+    def __enter__(self):
+        """Starts serving in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        """Stops serving"""
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,48 @@
+"""
+Filters for list views
+"""
+from django_filters import rest_framework as filters
+
+
+class PaymentRequestFilter(filters.FilterSet):
+    """
+    Filters payment requests by status, is_enabled, configuration and
+    create date range, e.g. ?status=Completed&created_after=2020-01-01
+    """
+
+    created_after = filters.IsoDateTimeFilter(
+        field_name="create_date", lookup_expr="gte"
+    )
+    created_before = filters.IsoDateTimeFilter(
+        field_name="create_date", lookup_expr="lt"
+    )
+
+    class Meta:
+        """Passing model metadata"""
+
+        from .models import PaymentRequest
+
+        model = PaymentRequest
+        fields = ("status", "is_enabled", "configuration")
+
+
+class PaymentFilter(filters.FilterSet):
+    """
+    Filters payments by payment request, status and create date range,
+    e.g. ?payment_request=ID&status=Credit
+    """
+
+    created_after = filters.IsoDateTimeFilter(
+        field_name="create_date", lookup_expr="gte"
+    )
+    created_before = filters.IsoDateTimeFilter(
+        field_name="create_date", lookup_expr="lt"
+    )
+
+    class Meta:
+        """Passing model metadata"""
+
+        from .models import Payment
+
+        model = Payment
+        fields = ("payment_request", "status")
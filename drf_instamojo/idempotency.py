@@ -0,0 +1,116 @@
+"""
+Idempotent creation of objects
+
+Clients may send an ``Idempotency-Key`` header (or ``idempotency_key``
+field) with a create request. Response of the first successful request
+is stored against the key and replayed for its retries, so a retried
+request neither calls Instamojo nor writes again. Keys are scoped per
+user and expire after IDEMPOTENCY_KEY_TTL seconds.
+"""
+import hashlib
+import json
+
+from .settings import get_setting
+
+HEADER = "Idempotency-Key"
+FIELD = "idempotency_key"
+
+
+def get_idempotency_key(request):
+    """
+    Returns idempotency key sent with request, if any
+
+    Parameters
+    ----------
+    request: rest_framework.request.Request
+
+    Returns
+    -------
+    str or None
+    """
+    key = request.headers.get(HEADER) or request.data.get(FIELD)
+    return str(key) if key else None
+
+
+def hash_request(request) -> str:
+    """
+    Returns SHA-256 of request data, except idempotency key, to detect
+    reuse of a key for a different request
+
+    Parameters
+    ----------
+    request: rest_framework.request.Request
+
+    Returns
+    -------
+    str: hex digest
+    """
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    data = {k: v for k, v in data.items() if k != FIELD}
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Mixin for ListAddPaymentRequestView that makes create() idempotent
+    with Idempotency-Key.
+
+    The key's row is created and locked in the same transaction as the
+    object, so a concurrent retry waits for the first request to finish
+    and then replays its response. If the first request fails, its row
+    is rolled back and the retry is processed afresh.
+    """
+
+    def create(self, request, *args, **kwargs):
+        """Creates object, or replays response of an earlier request"""
+        from django.db import transaction
+        from django.utils import timezone
+        from rest_framework.exceptions import ValidationError
+        from rest_framework.response import Response
+
+        from .exceptions import IdempotencyKeyMismatch
+        from .models import IdempotencyKey
+
+        key = get_idempotency_key(request)
+        if key is None:
+            return super(IdempotentCreateMixin, self).create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({FIELD: "Idempotency key is too long."})
+
+        request_hash = hash_request(request)
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+                created_by=request.user,
+                key=key,
+                defaults={"request_hash": request_hash},
+            )
+            expired = (
+                timezone.now() - record.create_date
+            ).total_seconds() > get_setting("IDEMPOTENCY_KEY_TTL")
+
+            if not created and not expired:
+                if record.request_hash != request_hash:
+                    raise IdempotencyKeyMismatch()
+                if record.response_status is not None:
+                    return Response(
+                        record.response_data,
+                        status=record.response_status,
+                        headers={"Idempotent-Replayed": "true"},
+                    )
+
+            response = super(IdempotentCreateMixin, self).create(
+                request, *args, **kwargs
+            )
+
+            record.request_hash = request_hash
+            record.response_status = response.status_code
+            record.response_data = response.data
+            record.payment_request_id = response.data.get("id")
+            if expired:
+                record.create_date = timezone.now()
+            record.save()
+
+        return response
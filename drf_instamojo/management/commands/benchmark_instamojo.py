@@ -0,0 +1,136 @@
+"""
+Benchmarks hot paths of drf_instamojo via drf_instamojo.benchmark
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+# Per operation metrics that must not grow over baseline
+CHECKED_METRICS = ("queries_per_op", "http_calls_per_op")
+
+
+class Command(BaseCommand):
+    """Benchmarks create, verify and reconcile against a stub Instamojo"""
+
+    help = (
+        "Benchmarks creating payment requests, verifying and reconciling payments "
+        "against a local stub of Instamojo, in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        from drf_instamojo.benchmark import OPERATIONS
+
+        parser.add_argument(
+            "operations",
+            nargs="*",
+            help="Operations to benchmark, out of {operations}. Defaults to "
+            "all.".format(operations=", ".join(OPERATIONS)),
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=200, help="Timed runs per operation."
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Seconds the stub waits before answering each call.",
+        )
+        parser.add_argument(
+            "--memory-samples",
+            type=int,
+            default=20,
+            help="Extra runs per operation measured for memory.",
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true", help="Keep the test database."
+        )
+        parser.add_argument(
+            "--output", help="File to save results in, as JSON, to compare later."
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON results of an earlier run. Fails if queries or HTTP calls "
+            "per operation have increased.",
+        )
+
+    def handle(self, *args, **options):
+        """Runs benchmark in test database"""
+        from django.db import connection
+
+        from drf_instamojo.benchmark import OPERATIONS
+        from drf_instamojo.benchmark import run_benchmark
+
+        operations = options["operations"] or OPERATIONS
+        unknown = set(operations) - set(OPERATIONS)
+        if unknown:
+            raise CommandError(
+                "Unknown operation(s): {unknown}".format(unknown=", ".join(unknown))
+            )
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            results = run_benchmark(
+                operations=operations,
+                iterations=options["iterations"],
+                latency=options["latency"],
+                memory_samples=options["memory_samples"],
+            )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+
+        self.report(results)
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+
+        if options["baseline"]:
+            self.compare(results, options["baseline"])
+
+    def report(self, results):
+        """Writes results as a table"""
+        columns = (
+            "operation",
+            "ops_per_second",
+            "p50_ms",
+            "p99_ms",
+            "queries_per_op",
+            "http_calls_per_op",
+            "memory_kib_per_op",
+        )
+        rows = [columns] + [
+            tuple(str(result[column]) for column in columns) for result in results
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+        for row in rows:
+            self.stdout.write(
+                "  ".join(value.ljust(width) for value, width in zip(row, widths))
+            )
+
+    def compare(self, results, path):
+        """Raises CommandError if results regressed over baseline"""
+        with open(path) as baseline_file:
+            baseline = {r["operation"]: r for r in json.load(baseline_file)}
+
+        regressions = [
+            "{operation}: {metric} {old} -> {new}".format(
+                operation=result["operation"],
+                metric=metric,
+                old=baseline[result["operation"]][metric],
+                new=result[metric],
+            )
+            for result in results
+            if result["operation"] in baseline
+            for metric in CHECKED_METRICS
+            if result[metric] > baseline[result["operation"]][metric]
+        ]
+        if regressions:
+            raise CommandError("Regressed over baseline:\n" + "\n".join(regressions))
+        self.stdout.write("No regression over baseline.")
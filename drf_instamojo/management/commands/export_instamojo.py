@@ -0,0 +1,102 @@
+"""
+Exports payment requests or payments as CSV or NDJSON, via
+drf_instamojo.exports
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+
+class Command(BaseCommand):
+    """Streams payment requests or payments to a file or stdout"""
+
+    help = "Exports payment requests or payments as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        parser.add_argument(
+            "model", choices=("payment_requests", "payments"), help="What to export."
+        )
+        parser.add_argument(
+            "--format", choices=("csv", "ndjson"), default="csv", help="Default: csv."
+        )
+        parser.add_argument(
+            "--output", help="Path of file to write to. Defaults to stdout."
+        )
+        parser.add_argument(
+            "--raw",
+            action="store_true",
+            help="Include latest archived raw response of Instamojo of each row.",
+        )
+        parser.add_argument(
+            "--user", help="Username whose payment requests or payments to export."
+        )
+        parser.add_argument(
+            "--created-after",
+            help="Export rows created at or after this ISO 8601 date/time.",
+        )
+        parser.add_argument(
+            "--created-before",
+            help="Export rows created before this ISO 8601 date/time.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Rows read at a time. Defaults to EXPORT_CHUNK_SIZE setting.",
+        )
+        parser.add_argument(
+            "--database",
+            help="Database to read from. Defaults to a replica in READ_DATABASES, "
+            "if any.",
+        )
+
+    def handle(self, *args, **options):
+        """Writes rows, oldest first"""
+        from django.contrib.auth import get_user_model
+
+        from drf_instamojo.exports import export_fields
+        from drf_instamojo.exports import write_export
+        from drf_instamojo.models import Payment
+        from drf_instamojo.models import PaymentRequest
+        from drf_instamojo.replicas import read_database
+        from drf_instamojo.utils import parse_datetime
+
+        model = PaymentRequest if options["model"] == "payment_requests" else Payment
+        owner = (
+            "created_by" if model is PaymentRequest else "payment_request__created_by"
+        )
+        database = options["database"] or read_database()
+        queryset = model.objects.using(database).order_by("create_date")
+
+        if options["user"]:
+            user_model = get_user_model()
+            try:
+                user = user_model.objects.get_by_natural_key(options["user"])
+            except user_model.DoesNotExist:
+                raise CommandError("User does not exist.")
+            queryset = queryset.filter(**{owner: user})
+        for option, lookup in (
+            ("created_after", "create_date__gte"),
+            ("created_before", "create_date__lt"),
+        ):
+            if options[option]:
+                value = parse_datetime(options[option])
+                if value is None:
+                    raise CommandError(
+                        "Invalid date/time: {value}".format(value=options[option])
+                    )
+                queryset = queryset.filter(**{lookup: value})
+
+        arguments = {
+            "queryset": queryset,
+            "fields": export_fields(model),
+            "format": options["format"],
+            "raw": options["raw"],
+            "chunk_size": options["chunk_size"],
+        }
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as file:
+                count = write_export(file, **arguments)
+        else:
+            count = write_export(self.stdout, **arguments)
+
+        self.stderr.write("Exported {count} row(s).".format(count=count))
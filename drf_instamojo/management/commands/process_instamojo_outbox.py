@@ -0,0 +1,46 @@
+"""
+Dispatches payment_done outbox rows left undispatched, see
+drf_instamojo.outbox
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Dispatches pending payment_done outbox rows"""
+
+    help = "Sends payment_done for payment requests pending in outbox."
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of rows to dispatch in a transaction.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new rows instead of exiting when none is left.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls when none is left.",
+        )
+
+    def handle(self, *args, **options):
+        """Dispatches rows batch by batch"""
+        from drf_instamojo.outbox import dispatch_payment_done
+
+        total = 0
+        while True:
+            total += dispatch_payment_done(batch_size=options["batch_size"])
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write("Dispatched {total} row(s).".format(total=total))
@@ -0,0 +1,58 @@
+"""
+Processes reconciliation jobs queued by
+drf_instamojo.queue.DatabaseBackend
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Processes queued reconciliation jobs"""
+
+    help = "Processes queued Instamojo reconciliation jobs."
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of jobs to process per batch.",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=5,
+            help="Skip jobs that have failed these many times.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls when queue is empty.",
+        )
+
+    def handle(self, *args, **options):
+        """Processes jobs batch by batch"""
+        from drf_instamojo.queue import DatabaseBackend
+
+        backend = DatabaseBackend()
+        total = 0
+        while True:
+            processed = backend.process(
+                batch_size=options["batch_size"], max_attempts=options["max_attempts"]
+            )
+            total += processed
+            if processed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write("Processed {total} job(s).".format(total=total))
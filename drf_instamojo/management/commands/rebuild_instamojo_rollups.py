@@ -0,0 +1,32 @@
+"""
+Recomputes daily rollups of payments, see drf_instamojo.rollups
+"""
+import datetime
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Recomputes daily rollups of payments"""
+
+    help = "Recomputes daily rollups of payments from payments."
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        parser.add_argument(
+            "--start",
+            type=datetime.date.fromisoformat,
+            help="First day to rebuild, as YYYY-MM-DD. Defaults to the first.",
+        )
+        parser.add_argument(
+            "--end",
+            type=datetime.date.fromisoformat,
+            help="Last day to rebuild, as YYYY-MM-DD. Defaults to the last.",
+        )
+
+    def handle(self, *args, **options):
+        """Rebuilds rollups"""
+        from drf_instamojo.rollups import rebuild_rollups
+
+        created = rebuild_rollups(start=options["start"], end=options["end"])
+        self.stdout.write("Rebuilt {created} rollup(s).".format(created=created))
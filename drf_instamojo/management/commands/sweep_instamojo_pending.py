@@ -0,0 +1,57 @@
+"""
+Polls Instamojo for stale pending payment requests via
+drf_instamojo.sweeper
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Updates stale pending payment requests"""
+
+    help = "Polls Instamojo for stale pending payment requests and updates them."
+
+    def add_arguments(self, parser):
+        """Adds command arguments, all defaulting to SWEEP_* settings"""
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            help="Seconds after which a pending payment request is polled.",
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            help="Seconds after which a pending payment request is not polled.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Payment requests polled and updated together.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, help="Concurrent calls to Instamojo."
+        )
+        parser.add_argument(
+            "--rate", type=float, help="Maximum calls to Instamojo per second."
+        )
+        parser.add_argument(
+            "--time-budget",
+            type=float,
+            help="Seconds after which no further payment request is polled.",
+        )
+
+    def handle(self, *args, **options):
+        """Runs sweeper"""
+        from drf_instamojo.sweeper import sweep_pending
+
+        result = sweep_pending(
+            stale_after=options["stale_after"],
+            max_age=options["max_age"],
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            rate=options["rate"],
+            time_budget=options["time_budget"],
+        )
+        self.stdout.write(
+            "Checked {checked} payment request(s), updated {updated} and "
+            "{completed} got completed.".format(**result)
+        )
@@ -0,0 +1,79 @@
+"""
+Syncs payment requests and payments from Instamojo via
+drf_instamojo.sync
+"""
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+
+class Command(BaseCommand):
+    """Syncs payment requests and payments from Instamojo"""
+
+    help = "Syncs payment requests and payments from Instamojo incrementally."
+
+    def add_arguments(self, parser):
+        """Adds command arguments"""
+        parser.add_argument(
+            "--configuration",
+            type=int,
+            help="ID of InstamojoConfiguration to sync. Defaults to active one.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username of owner of new payment requests. "
+            "Defaults to owner of configuration.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Records per page. Defaults to SYNC_BATCH_SIZE setting.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Sync all records, ignoring progress of previous runs.",
+        )
+        parser.add_argument(
+            "--skip-payments",
+            action="store_true",
+            help="Sync payment requests only.",
+        )
+
+    def handle(self, *args, **options):
+        """Runs sync"""
+        from django.contrib.auth import get_user_model
+        from rest_framework.exceptions import APIException
+
+        from drf_instamojo.models import InstamojoConfiguration
+        from drf_instamojo.sync import sync
+
+        configuration = created_by = None
+        if options["configuration"]:
+            try:
+                configuration = InstamojoConfiguration.objects.get(
+                    pk=options["configuration"]
+                )
+            except InstamojoConfiguration.DoesNotExist:
+                raise CommandError("Configuration does not exist.")
+        if options["user"]:
+            user_model = get_user_model()
+            try:
+                created_by = user_model.objects.get_by_natural_key(options["user"])
+            except user_model.DoesNotExist:
+                raise CommandError("User does not exist.")
+
+        try:
+            result = sync(
+                configuration=configuration,
+                created_by=created_by,
+                batch_size=options["batch_size"],
+                full=options["full"],
+                payments=not options["skip_payments"],
+            )
+        except (APIException, ConnectionError) as err:
+            raise CommandError(str(err))
+
+        self.stdout.write(
+            "Synced {payment_requests} payment request(s) and "
+            "{payments} payment(s).".format(**result)
+        )
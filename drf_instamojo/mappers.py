@@ -0,0 +1,244 @@
+"""
+Mapping of Instamojo's data to model fields
+
+Instamojo sends amounts as strings, timestamps as ISO 8601 strings and a
+few fields under names other than the model's. A FieldMapper resolves
+its model's fields once, on first use, into a frozenset of accepted keys
+and a converter per key, so that each record is mapped in a single pass
+over its keys, straight to Decimal / datetime values. Keys that are not
+mapped are reported back instead of reaching the model.
+
+PAYMENT_REQUEST, PAYMENT and WEBHOOK_PAYMENT are shared by serializers,
+reconciliation, sync and webhooks.
+
+Examples
+--------
+>>> from drf_instamojo.mappers import PAYMENT
+>>> values, unknown = PAYMENT.map(response["payment_request"]["payment"])
+>>> Payment(payment_request=pr, **values)
+"""
+import decimal
+import logging
+import threading
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class Mapped(NamedTuple):
+    """Result of FieldMapper.map()"""
+
+    values: dict
+    unknown: frozenset
+
+
+def to_decimal(value):
+    """Converts value to Decimal, None if empty"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, decimal.Decimal):
+        return value
+    try:
+        return decimal.Decimal(str(value))
+    except decimal.InvalidOperation:
+        raise ValueError("Invalid decimal value: {value!r}".format(value=value))
+
+
+def to_bool(value):
+    """Converts value, e.g. "True" of form data, to bool"""
+    if value is None or isinstance(value, bool):
+        return value
+    return str(value).lower() in ("true", "1")
+
+
+def to_str(value):
+    """Converts non-empty value to str"""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+class FieldMapper:
+    """
+    Maps Instamojo's data to keyword arguments of a model
+
+    Relations and fields set by Django (auto_now etc.) are never mapped.
+
+    Parameters
+    ----------
+    model: str
+        Label of model, e.g. "drf_instamojo.Payment", resolved on first use
+    renames: dict, optional
+        Model field of keys named differently by Instamojo, e.g.
+        {"payment_id": "id"}
+    nested: dict, optional
+        Model field of each key of nested dicts, e.g.
+        {"failure": {"reason": "failure_reason"}}
+    exclude: iterable, optional
+        Model fields never mapped
+    ignore: iterable, optional
+        Keys, not mapped, that are not reported as unknown
+    """
+
+    def __init__(
+        self,
+        model: str,
+        renames: dict = None,
+        nested: dict = None,
+        exclude=(),
+        ignore=(),
+    ):
+        """Initialize mapper, fields are resolved on first use"""
+        self.model = model
+        self.renames = dict(renames or {})
+        self.nested = dict(nested or {})
+        self.exclude = frozenset(exclude)
+        self.ignore = frozenset(ignore)
+        self._converters = None
+        self._fields = None
+        self._keys = frozenset()
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def _compile(self):
+        """Resolves converter of each accepted key from model's fields"""
+        from django.apps import apps
+        from django.db import models
+
+        from .utils import parse_datetime
+
+        by_type = (
+            (models.DecimalField, to_decimal),
+            (models.DateTimeField, parse_datetime),
+            (models.BooleanField, to_bool),
+        )
+        key_of = {attname: key for key, attname in self.renames.items()}
+
+        fields = {}
+        for field in apps.get_model(self.model)._meta.concrete_fields:
+            if (
+                field.is_relation
+                or field.attname in self.exclude
+                or getattr(field, "auto_now", False)
+                or getattr(field, "auto_now_add", False)
+            ):
+                continue
+            convert = next((c for t, c in by_type if isinstance(field, t)), to_str)
+            fields[field.attname] = (convert, field.null)
+
+        converters = {}
+        for attname, (convert, null) in fields.items():
+            converters[key_of.get(attname, attname)] = (attname, convert, null)
+        for key, attnames in self.nested.items():
+            converters[key] = {
+                sub: (attname,) + fields[attname] for sub, attname in attnames.items()
+            }
+
+        self._fields = fields
+        self._keys = frozenset(converters)
+        self._converters = converters
+
+    def _compiled(self) -> tuple:
+        """Returns (converter and nullability by field, converters by key)"""
+        if self._converters is None:
+            with self._lock:
+                if self._converters is None:
+                    self._compile()
+        return self._fields, self._converters
+
+    @property
+    def converters(self) -> dict:
+        """(field, converter, nullable) of each accepted key"""
+        return self._compiled()[1]
+
+    @property
+    def keys(self) -> frozenset:
+        """Keys of Instamojo's data that are mapped"""
+        self._compiled()
+        return self._keys
+
+    def convert(self, field: str, value):
+        """
+        Converts a value of model field, as map() does
+
+        Parameters
+        ----------
+        field: str
+            Name of model field, e.g. "modified_at"
+        value: value sent by Instamojo
+
+        Returns
+        -------
+        converted value
+        """
+        return self._compiled()[0][field][0](value)
+
+    def map(self, data: dict) -> Mapped:
+        """
+        Maps data to values of model fields
+
+        Values that are None are left out for fields that are not
+        nullable, so that model defaults apply.
+
+        Parameters
+        ----------
+        data: dict
+            Record sent by Instamojo
+
+        Returns
+        -------
+        Mapped: values by model field and keys of data that are unknown
+
+        Raises
+        ------
+        ValueError: if a value cannot be converted
+        """
+        converters = self.converters
+        values = {}
+        unknown = []
+        for key, value in data.items():
+            entry = converters.get(key)
+            if entry is None:
+                if key not in self.ignore:
+                    unknown.append(key)
+                continue
+            if isinstance(entry, dict):
+                for sub, sub_value in (value or {}).items():
+                    if sub in entry:
+                        self._set(values, entry[sub], sub_value)
+                continue
+            self._set(values, entry, value)
+
+        unknown = frozenset(unknown)
+        if unknown - self._reported:
+            self._reported.update(unknown)
+            logger.debug("Unknown fields of %s: %s", self.model, sorted(unknown))
+        return Mapped(values, unknown)
+
+    @staticmethod
+    def _set(values: dict, entry: tuple, value):
+        """Converts and sets value of field in values"""
+        attname, convert, null = entry
+        value = convert(value)
+        if value is not None or null:
+            values[attname] = value
+
+
+PAYMENT_REQUEST = FieldMapper(
+    "drf_instamojo.PaymentRequest",
+    exclude=("is_enabled",),
+    ignore=("payments", "payment"),
+)
+PAYMENT = FieldMapper(
+    "drf_instamojo.Payment",
+    renames={"payment_id": "id"},
+    nested={"failure": {"reason": "failure_reason", "message": "failure_message"}},
+    exclude=("webhook_verified",),
+    ignore=("payment_request",),
+)
+WEBHOOK_PAYMENT = FieldMapper(
+    "drf_instamojo.Payment",
+    renames={"payment_id": "id", "buyer": "buyer_email"},
+    exclude=("webhook_verified",),
+    ignore=("payment_request_id", "longurl", "shorturl", "purpose"),
+)
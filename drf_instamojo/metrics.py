@@ -0,0 +1,466 @@
+"""
+Metrics and tracing of Instamojo calls
+
+Calls to Instamojo, signal handlers and (with QueryCountMiddleware) DB
+queries per request are reported to the backend selected via
+METRICS_BACKEND setting. Available backends:
+
+* ``drf_instamojo.metrics.NullMetrics`` (default): Discards everything.
+  Call sites check ``enabled`` first, so it costs nothing.
+* ``drf_instamojo.metrics.InMemoryMetrics``: Aggregates counters and
+  histograms in process memory. Useful in tests, and exported in
+  Prometheus format by ``drf_instamojo.views.MetricsView``.
+* ``drf_instamojo.metrics.OpenTelemetryMetrics``: Reports to
+  OpenTelemetry's global meter and tracer provider. Requires
+  ``opentelemetry-api``.
+
+Reported metrics:
+
+* ``instamojo_request_duration_seconds`` (histogram): latency of calls
+  to Instamojo, labelled with method, endpoint and outcome.
+* ``instamojo_requests_total`` (counter): calls to Instamojo, labelled
+  with method, endpoint and outcome, i.e. success or failure.
+* ``instamojo_retries_total`` (counter): retries made by calls.
+* ``instamojo_rejected_total`` (counter): calls not made, labelled with
+  reason, i.e. rate_limited or circuit_open.
+* ``drf_instamojo_signal_duration_seconds`` (histogram): time taken by
+  signal handlers, labelled with handler.
+* ``drf_instamojo_db_queries`` (histogram) and
+  ``drf_instamojo_db_duration_seconds`` (histogram): DB queries made and
+  time spent on them per request, labelled with view.
+
+Custom backends should subclass BaseMetrics.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+from .settings import get_setting
+
+# Segments of Instamojo API paths that are not IDs
+STATIC_SEGMENTS = frozenset(
+    ("payment-requests", "payments", "refunds", "enable", "disable", "links")
+)
+
+# Buckets of histograms that are not in seconds, e.g. query counts
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class BaseMetrics:
+    """Base class for metrics backends"""
+
+    # Call sites skip instrumentation when False
+    enabled = True
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Increments a counter
+
+        Parameters
+        ----------
+        name: str
+        value: float
+        labels: label values
+        """
+        raise NotImplementedError
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Records a value in a histogram
+
+        Parameters
+        ----------
+        name: str
+        value: float
+        labels: label values
+        """
+        raise NotImplementedError
+
+    def span(self, name: str, **attributes):
+        """
+        Returns context manager that traces the enclosed block
+
+        Parameters
+        ----------
+        name: str
+        attributes: span attributes
+        """
+        return nullcontext()
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        """Records time taken by the enclosed block in a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+
+class NullMetrics(BaseMetrics):
+    """Discards all metrics"""
+
+    enabled = False
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Does nothing"""
+
+    def observe(self, name: str, value: float, **labels):
+        """Does nothing"""
+
+    def timed(self, name: str, **labels):
+        """Does nothing"""
+        return nullcontext()
+
+
+class InMemoryMetrics(BaseMetrics):
+    """
+    Aggregates metrics in memory. Histograms are kept as bucket counts,
+    as per METRICS_BUCKETS for the ones in seconds and COUNT_BUCKETS for
+    others, so memory doesn't grow with number of calls.
+    Latest spans are kept in ``spans`` as (name, attributes, duration).
+    """
+
+    def __init__(self):
+        """Initialize empty collector"""
+        self.lock = threading.Lock()
+        self.seconds_buckets = tuple(get_setting("METRICS_BUCKETS"))
+        self.reset()
+
+    def buckets_of(self, name: str) -> tuple:
+        """Returns upper bounds of buckets of histogram"""
+        if name.endswith("_seconds"):
+            return self.seconds_buckets
+        return COUNT_BUCKETS
+
+    def reset(self):
+        """Clears all metrics"""
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.spans = deque(maxlen=1000)
+
+    @staticmethod
+    def _key(name, labels):
+        """Key of a series"""
+        return name, tuple(sorted(labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Increments counter"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Adds value to histogram"""
+        key = self._key(name, labels)
+        buckets = self.buckets_of(name)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": [0] * len(buckets),
+                    "count": 0,
+                    "sum": 0.0,
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Records span once the block exits"""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            with self.lock:
+                self.spans.append((name, attributes, time.perf_counter() - start))
+
+    def counter(self, name: str, **labels) -> float:
+        """Returns value of a counter"""
+        return self.counters.get(self._key(name, labels), 0)
+
+    def histogram(self, name: str, **labels) -> dict:
+        """Returns histogram as dict of buckets, count and sum, if any"""
+        return self.histograms.get(self._key(name, labels))
+
+    def export(self) -> str:
+        """
+        Renders metrics in Prometheus text exposition format
+
+        Returns
+        -------
+        str
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, dict(value, buckets=list(value["buckets"])))
+                for key, value in self.histograms.items()
+            )
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                declared.add(name)
+                lines.append("# TYPE {name} counter".format(name=name))
+            lines.append(_sample(name, labels, value))
+
+        for (name, labels), histogram in histograms:
+            if name not in declared:
+                declared.add(name)
+                lines.append("# TYPE {name} histogram".format(name=name))
+            for bound, count in zip(self.buckets_of(name), histogram["buckets"]):
+                le = (("le", repr(float(bound))),)
+                lines.append(_sample(name + "_bucket", labels + le, count))
+            inf = (("le", "+Inf"),)
+            lines.append(_sample(name + "_bucket", labels + inf, histogram["count"]))
+            lines.append(_sample(name + "_count", labels, histogram["count"]))
+            lines.append(_sample(name + "_sum", labels, histogram["sum"]))
+
+        return "\n".join(lines) + "\n"
+
+
+def _sample(name, labels, value):
+    """Renders a sample in Prometheus text format"""
+    if not labels:
+        return "{name} {value}".format(name=name, value=value)
+    rendered = ",".join(
+        '{key}="{value}"'.format(
+            key=key,
+            value=str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for key, value in labels
+    )
+    return "{name}{{{labels}}} {value}".format(name=name, labels=rendered, value=value)
+
+
+class OpenTelemetryMetrics(BaseMetrics):
+    """
+    Reports to OpenTelemetry via its API. Configure the SDK and exporters
+    as per OpenTelemetry documentation.
+    """
+
+    def __init__(self):
+        """Initialize meter and tracer"""
+        from django.core.exceptions import ImproperlyConfigured
+
+        try:
+            from opentelemetry import metrics
+            from opentelemetry import trace
+        except ImportError:
+            raise ImproperlyConfigured(
+                "opentelemetry-api is required for OpenTelemetryMetrics. Install "
+                "it with `pip install drf_instamojo[opentelemetry]`."
+            )
+
+        self.meter = metrics.get_meter("drf_instamojo")
+        self.tracer = trace.get_tracer("drf_instamojo")
+        self.instruments = {}
+        self.lock = threading.Lock()
+
+    def _instrument(self, name, create):
+        """Returns instrument of name, creating it on first use"""
+        instrument = self.instruments.get(name)
+        if instrument is None:
+            with self.lock:
+                instrument = self.instruments.get(name)
+                if instrument is None:
+                    instrument = self.instruments[name] = create(name)
+        return instrument
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Adds value to counter"""
+        self._instrument(name, self.meter.create_counter).add(value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        """Records value in histogram"""
+        self._instrument(name, self.meter.create_histogram).record(value, labels)
+
+    def span(self, name: str, **attributes):
+        """Starts span as current span"""
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+_backend = {}
+_lock = threading.Lock()
+
+
+def get_metrics() -> BaseMetrics:
+    """
+    Returns instance of configured METRICS_BACKEND
+
+    Returns
+    -------
+    BaseMetrics
+    """
+    from django.utils.module_loading import import_string
+
+    path = get_setting("METRICS_BACKEND")
+    backend = _backend.get(path)
+    if backend is None:
+        with _lock:
+            backend = _backend.get(path)
+            if backend is None:
+                backend = import_string(path)()
+                _backend[path] = backend
+    return backend
+
+
+def endpoint_of(path: str) -> str:
+    """
+    Returns API path with IDs replaced, to be used as a label
+
+    Parameters
+    ----------
+    path: str
+        e.g. "payment-requests/ID/PAYMENT_ID/"
+
+    Returns
+    -------
+    str: e.g. "payment-requests/{id}/{id}/"
+    """
+    path = path.split("?", 1)[0]
+    return "/".join(
+        segment if not segment or segment in STATIC_SEGMENTS else "{id}"
+        for segment in path.split("/")
+    )
+
+
+def report_call(method: str, path: str):
+    """
+    Returns context manager that reports a call to Instamojo, made in
+    the enclosed block, as per the dict it yields: set "failed" and
+    "retries" in it.
+
+    Parameters
+    ----------
+    method: str
+        HTTP method
+    path: str
+        API path relative to endpoint
+
+    Examples
+    --------
+    >>> with report_call("get", path) as outcome:
+    >>>     response = session.get(url)
+    >>>     outcome["failed"] = response.status_code >= 500
+    """
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return nullcontext({"failed": True, "retries": 0})
+    return _report_call(metrics, method, path)
+
+
+@contextmanager
+def _report_call(metrics, method, path):
+    """Reports call to Instamojo, see report_call()"""
+    endpoint = endpoint_of(path)
+    outcome = {"failed": True, "retries": 0}
+    start = time.perf_counter()
+    with metrics.span("instamojo.request", method=method, endpoint=endpoint):
+        try:
+            yield outcome
+        finally:
+            labels = {
+                "method": method,
+                "endpoint": endpoint,
+                "outcome": "failure" if outcome["failed"] else "success",
+            }
+            metrics.observe(
+                "instamojo_request_duration_seconds",
+                time.perf_counter() - start,
+                **labels
+            )
+            metrics.increment("instamojo_requests_total", **labels)
+            if outcome["retries"]:
+                metrics.increment(
+                    "instamojo_retries_total",
+                    outcome["retries"],
+                    method=method,
+                    endpoint=endpoint,
+                )
+
+
+def report_rejection(reason: str):
+    """
+    Reports a call to Instamojo that was not made
+
+    Parameters
+    ----------
+    reason: str
+        e.g. code of the exception raised instead
+    """
+    metrics = get_metrics()
+    if metrics.enabled:
+        metrics.increment("instamojo_rejected_total", reason=reason)
+
+
+def handler_timer(handler: str):
+    """
+    Returns context manager that reports time taken by a signal handler
+
+    Parameters
+    ----------
+    handler: str
+        Name of the handler
+    """
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return nullcontext()
+    return metrics.timed("drf_instamojo_signal_duration_seconds", handler=handler)
+
+
+class QueryCountMiddleware:
+    """
+    Reports DB queries made, and time spent on them, by each request.
+    Does nothing if metrics are disabled.
+
+    Add ``drf_instamojo.metrics.QueryCountMiddleware`` to MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        """Initialize middleware"""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Counts queries of request"""
+        from contextlib import ExitStack
+
+        from django.db import connections
+
+        metrics = get_metrics()
+        if not metrics.enabled:
+            return self.get_response(request)
+
+        stats = {"queries": 0, "duration": 0.0}
+
+        def count(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats["queries"] += 1
+                stats["duration"] += time.perf_counter() - start
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else ""
+        metrics.observe("drf_instamojo_db_queries", stats["queries"], view=view)
+        metrics.observe(
+            "drf_instamojo_db_duration_seconds", stats["duration"], view=view
+        )
+        return response
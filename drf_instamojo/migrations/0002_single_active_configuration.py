@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:12
+
+from django.db import migrations, models
+
+
+def keep_single_active(apps, schema_editor):
+    """Keeps only the latest updated configuration active"""
+    InstamojoConfiguration = apps.get_model('drf_instamojo', 'InstamojoConfiguration')
+    db_alias = schema_editor.connection.alias
+    active = (
+        InstamojoConfiguration.objects.using(db_alias)
+        .filter(is_active=True)
+        .order_by('-update_date')
+    )
+    latest = active.first()
+    if latest is not None:
+        active.exclude(pk=latest.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_single_active, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='instamojoconfiguration',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='drf_instamojo_single_active_configuration'),
+        ),
+    ]
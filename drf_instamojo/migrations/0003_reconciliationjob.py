@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0002_single_active_configuration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Failed Attempts')),
+                ('create_date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Create Date/Time')),
+                ('payment_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation_job', to='drf_instamojo.paymentrequest', verbose_name='Payment Request')),
+            ],
+            options={
+                'verbose_name': 'Reconciliation Job',
+                'verbose_name_plural': 'Reconciliation Jobs',
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def archive_raw_responses(apps, schema_editor):
+    """Moves raw responses of payment requests and payments to RawResponse"""
+    PaymentRequest = apps.get_model('drf_instamojo', 'PaymentRequest')
+    Payment = apps.get_model('drf_instamojo', 'Payment')
+    RawResponse = apps.get_model('drf_instamojo', 'RawResponse')
+    db_alias = schema_editor.connection.alias
+
+    batch = []
+    for pk, text in (
+        PaymentRequest.objects.using(db_alias).exclude(instamojo_raw_response=None)
+        .values_list('pk', 'instamojo_raw_response')
+        .iterator(chunk_size=2000)
+    ):
+        batch.append(RawResponse(payment_request_id=pk, source='create', text=text))
+        if len(batch) >= 2000:
+            RawResponse.objects.using(db_alias).bulk_create(batch)
+            batch = []
+
+    for pk, payment_request_id, text in (
+        Payment.objects.using(db_alias).exclude(instamojo_raw_response=None)
+        .values_list('pk', 'payment_request_id', 'instamojo_raw_response')
+        .iterator(chunk_size=2000)
+    ):
+        batch.append(
+            RawResponse(
+                payment_request_id=payment_request_id, payment_id=pk, source='status', text=text
+            )
+        )
+        if len(batch) >= 2000:
+            RawResponse.objects.using(db_alias).bulk_create(batch)
+            batch = []
+
+    RawResponse.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0003_reconciliationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawResponse',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('create', 'CREATE'), ('status', 'STATUS'), ('webhook', 'WEBHOOK')], max_length=16, verbose_name='Source')),
+                ('text', models.TextField(blank=True, null=True, verbose_name='Raw Response')),
+                ('compressed', models.BinaryField(blank=True, null=True, verbose_name='Compressed Raw Response')),
+                ('data', models.JSONField(blank=True, null=True, verbose_name='Raw Response JSON')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='Create Date/Time')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='raw_responses', to='drf_instamojo.payment', verbose_name='Payment')),
+                ('payment_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='raw_responses', to='drf_instamojo.paymentrequest', verbose_name='Payment Request')),
+            ],
+            options={
+                'verbose_name': 'Raw Response',
+                'verbose_name_plural': 'Raw Responses',
+            },
+        ),
+        migrations.RunPython(archive_raw_responses, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='payment',
+            name='instamojo_raw_response',
+        ),
+        migrations.RemoveField(
+            model_name='paymentrequest',
+            name='instamojo_raw_response',
+        ),
+    ]
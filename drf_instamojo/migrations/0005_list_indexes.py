@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 12:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0004_rawresponse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='create_date',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Create Date/Time'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='paymentrequest',
+            index=models.Index(fields=['created_by', 'create_date'], name='drf_imojo_pr_owner_date'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_request', 'status'], name='drf_imojo_pay_pr_status'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_request', 'create_date'], name='drf_imojo_pay_pr_date'),
+        ),
+    ]
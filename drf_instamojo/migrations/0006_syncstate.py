@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0005_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='Name')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='Synced Till')),
+                ('cursor', models.PositiveIntegerField(blank=True, null=True, verbose_name='Next Page')),
+                ('pending_watermark', models.DateTimeField(blank=True, null=True, verbose_name='Synced Till (In Progress)')),
+                ('update_date', models.DateTimeField(auto_now=True, verbose_name='Date/Time Modified')),
+            ],
+            options={
+                'verbose_name': 'Sync State',
+                'verbose_name_plural': 'Sync States',
+            },
+        ),
+    ]
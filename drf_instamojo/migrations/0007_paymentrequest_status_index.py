@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0006_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrequest',
+            index=models.Index(fields=['status', 'modified_at'], name='drf_imojo_pr_status_mod'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 13:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.core.serializers.json
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('drf_instamojo', '0007_paymentrequest_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='Create Date/Time')),
+                ('update_date', models.DateTimeField(auto_now=True, verbose_name='Date/Time Modified')),
+                ('key', models.CharField(max_length=255, verbose_name='Idempotency Key')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Request Hash')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Response Status')),
+                ('response_data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Response Data')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+                ('payment_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='drf_instamojo.paymentrequest', verbose_name='Payment Request')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('created_by', 'key'), name='drf_imojo_idem_owner_key'),
+        ),
+    ]
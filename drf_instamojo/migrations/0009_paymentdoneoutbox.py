@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0008_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentDoneOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Dispatched At')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='Create Date/Time')),
+                ('payment_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment_done_outbox', to='drf_instamojo.paymentrequest', verbose_name='Payment Request')),
+            ],
+            options={
+                'verbose_name': 'Payment Done Outbox',
+                'verbose_name_plural': 'Payment Done Outbox',
+                'indexes': [models.Index(fields=['dispatched_at', 'create_date'], name='drf_imojo_outbox_pending')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0009_paymentdoneoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrequest',
+            index=models.Index(fields=['configuration', 'create_date'], name='drf_imojo_pr_config_date'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0010_paymentrequest_configuration_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('status', models.CharField(choices=[('Credit', 'CREDIT'), ('Failed', 'FAILED')], max_length=12, verbose_name='Status')),
+                ('instrument_type', models.CharField(blank=True, default='', max_length=64, verbose_name='Instrument Type')),
+                ('count', models.IntegerField(default=0, verbose_name='Payments')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Amount')),
+                ('fees', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Fees by Instamojo')),
+                ('affiliate_commission', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Affiliate Commission')),
+                ('update_date', models.DateTimeField(auto_now=True, verbose_name='Date/Time Modified')),
+            ],
+            options={
+                'verbose_name': 'Payment Rollup',
+                'verbose_name_plural': 'Payment Rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['create_date'], name='drf_imojo_pay_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'status', 'instrument_type'), name='drf_imojo_rollup_bucket'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+def clear_rollups(apps, schema_editor):
+    """Drops rollups, which were bucketed by local insert time"""
+    PaymentRollup = apps.get_model('drf_instamojo', 'PaymentRollup')
+    PaymentRollup.objects.using(schema_editor.connection.alias).all().delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_instamojo', '0011_paymentrollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='drf_imojo_pay_date',
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='created_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Created At by Instamojo'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['created_at'], name='drf_imojo_pay_created'),
+        ),
+        migrations.RunPython(clear_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drf_instamojo", "0012_payment_created_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="paymentdoneoutbox",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0, verbose_name="Attempts"),
+        ),
+        migrations.AddField(
+            model_name="paymentdoneoutbox",
+            name="last_error",
+            field=models.TextField(blank=True, null=True, verbose_name="Last Error"),
+        ),
+        migrations.AddField(
+            model_name="paymentdoneoutbox",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Next Attempt At"
+            ),
+        ),
+    ]
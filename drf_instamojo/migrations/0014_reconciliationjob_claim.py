@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drf_instamojo", "0013_outbox_retries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reconciliationjob",
+            name="locked_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Locked Until"
+            ),
+        ),
+        migrations.AddField(
+            model_name="reconciliationjob",
+            name="version",
+            field=models.PositiveIntegerField(default=0, verbose_name="Version"),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 16:10
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Coalesce
+
+
+def spread_create_dates(apps, schema_editor):
+    """
+    Gives distinct create_date to payments that share one, as all payments
+    existing before 0005 got the date it was applied at: Instamojo's
+    created_at where known, else that of the payment request, a
+    microsecond apart within what still ties
+    """
+    Payment = apps.get_model("drf_instamojo", "Payment")
+    payments = Payment.objects.using(schema_editor.connection.alias)
+
+    tied = (
+        payments.order_by()
+        .values("create_date")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("create_date", flat=True)
+    )
+    rows = (
+        payments.filter(create_date__in=list(tied))
+        .annotate(backfill=Coalesce("created_at", "payment_request__create_date"))
+        .order_by("backfill", "id")
+        .values_list("id", "backfill")
+    )
+    spread, previous, offset = [], None, 0
+    for pk, backfill in rows:
+        offset = offset + 1 if backfill == previous else 0
+        previous = backfill
+        spread.append(
+            Payment(id=pk, create_date=backfill + timedelta(microseconds=offset))
+        )
+    payments.bulk_update(spread, ["create_date"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("drf_instamojo", "0014_reconciliationjob_claim"),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_create_dates, migrations.RunPython.noop),
+    ]
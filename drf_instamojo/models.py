@@ -3,6 +3,7 @@ Models for Instamojo Application
 
 Author: Himanshu Shankar (https://himanshus.com)
 """
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.text import gettext_lazy as _
 from drfaddons.models import CreateUpdateModel
@@ -12,7 +13,10 @@ class InstamojoConfiguration(CreateUpdateModel):
     """
     Represents Instamojo's configurations.
 
-    Only one of the configuration can have is_active set to True.
+    Only one of the configuration can have is_active set to True. This
+    is enforced by a partial unique constraint on is_active. Active
+    configuration is used unless CONFIGURATION_RESOLVER selects another
+    one for a request, see drf_instamojo.routing.
 
     Author: Himanshu Shankar (https://himanshus.com)
     """
@@ -33,56 +37,18 @@ class InstamojoConfiguration(CreateUpdateModel):
         """String representation of model"""
         return str(self.api_key)
 
-    def clean_fields(self, exclude=None):
-        """
-        Used to validate the value of is_active
-        Parameters
-        ----------
-        exclude: list of fields that is to be excluded while checking
-
-        Returns
-        -------
-        None
-
-        Raises
-        ------
-        ValidationError: for is_active field.
-
-        Author: Himanshu Shankar (https://himanshus.com)
-        """
-        from django.core.exceptions import ValidationError
-
-        if "is_active" not in exclude:
-            try:
-                ic = InstamojoConfiguration.objects.get(is_active=True)
-            except InstamojoConfiguration.DoesNotExist:
-                pass
-            except InstamojoConfiguration.MultipleObjectsReturned:
-                raise ValidationError(
-                    {
-                        "is_active": _(
-                            "Multiple configuration is active. Keep "
-                            "only 1 configuration active at a time."
-                        )
-                    }
-                )
-            else:
-                if ic.api_key is not self.api_key:
-                    raise ValidationError(
-                        {
-                            "is_active": _(
-                                "Another configuration is active. "
-                                "Deactivate it first."
-                            )
-                        }
-                    )
-        super(InstamojoConfiguration, self).clean_fields(exclude=exclude)
-
     class Meta:
         """Passing model metadata"""
 
         verbose_name = _("Instamojo Configuration")
         verbose_name_plural = _("Instamojo Configurations")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("is_active",),
+                condition=models.Q(is_active=True),
+                name="drf_instamojo_single_active_configuration",
+            ),
+        )
 
 
 class PaymentRequest(CreateUpdateModel):
@@ -137,10 +103,6 @@ class PaymentRequest(CreateUpdateModel):
         verbose_name=_("Allow Repeated Payment"), default=True
     )
 
-    instamojo_raw_response = models.TextField(
-        verbose_name=_("Payment Request Raw Response"), null=True, blank=True
-    )
-
     longurl = models.URLField(verbose_name=_("Long URL"))
     shorturl = models.URLField(verbose_name=_("Long URL"), null=True, blank=True)
 
@@ -174,11 +136,35 @@ class PaymentRequest(CreateUpdateModel):
 
         verbose_name = _("Payment Request")
         verbose_name_plural = _("Payment Request")
+        indexes = (
+            models.Index(
+                fields=("created_by", "create_date"),
+                name="drf_imojo_pr_owner_date",
+            ),
+            models.Index(
+                fields=("status", "modified_at"),
+                name="drf_imojo_pr_status_mod",
+            ),
+            models.Index(
+                fields=("configuration", "create_date"),
+                name="drf_imojo_pr_config_date",
+            ),
+        )
+
+    # Status as loaded from database, to detect its transitions on save
+    _loaded_status = None
 
     def __str__(self):
         """String representation of model"""
         return self.id
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers status as loaded, unless it is deferred"""
+        instance = super(PaymentRequest, cls).from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
 
 class Payment(models.Model):
     """
@@ -193,10 +179,6 @@ class Payment(models.Model):
         verbose_name=_("Payment ID"), max_length=254, primary_key=True
     )
 
-    instamojo_raw_response = models.TextField(
-        null=True, blank=True, verbose_name=_("Payment Raw Response")
-    )
-
     payment_request = models.ForeignKey(
         to=PaymentRequest, on_delete=models.PROTECT, verbose_name=_("Payment Request")
     )
@@ -296,12 +278,361 @@ class Payment(models.Model):
         verbose_name=_("Verified via " "WebHook?"), default=False
     )
 
+    created_at = models.DateTimeField(
+        verbose_name=_("Created At by " "Instamojo"), blank=True, null=True
+    )
+    create_date = models.DateTimeField(
+        verbose_name=_("Create Date/Time"), auto_now_add=True
+    )
+
+    # Values that rollups depend on, as loaded from database, to update
+    # rollups on save
+    _loaded_rollup = None
+
     def __str__(self):
         """String representation of model"""
         return self.id
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers values that rollups depend on, unless deferred"""
+        from .rollups import rollup_values
+
+        instance = super(Payment, cls).from_db(db, field_names, values)
+        instance._loaded_rollup = rollup_values(instance)
+        return instance
+
     class Meta:
         """Passing model metadata"""
 
         verbose_name = _("Instamojo Payment")
         verbose_name_plural = _("Instamojo Payment")
+        indexes = (
+            models.Index(
+                fields=("payment_request", "status"),
+                name="drf_imojo_pay_pr_status",
+            ),
+            models.Index(
+                fields=("payment_request", "create_date"),
+                name="drf_imojo_pay_pr_date",
+            ),
+            models.Index(fields=("created_at",), name="drf_imojo_pay_created"),
+        )
+
+
+class PaymentRollup(models.Model):
+    """
+    Count and sums of payments of a day, by status and instrument type,
+    see drf_instamojo.rollups.
+
+    Updated in the same transaction as the payments, so that reports
+    read a row per bucket instead of scanning payments.
+    """
+
+    from .variables import PAYMENT_STATUS_CHOICES
+
+    date = models.DateField(verbose_name=_("Date"))
+    status = models.CharField(
+        verbose_name=_("Status"), max_length=12, choices=PAYMENT_STATUS_CHOICES
+    )
+    instrument_type = models.CharField(
+        verbose_name=_("Instrument Type"), max_length=64, blank=True, default=""
+    )
+    count = models.IntegerField(verbose_name=_("Payments"), default=0)
+    amount = models.DecimalField(
+        verbose_name=_("Amount"), decimal_places=2, max_digits=16, default=0
+    )
+    fees = models.DecimalField(
+        verbose_name=_("Fees by Instamojo"), decimal_places=3, max_digits=16, default=0
+    )
+    affiliate_commission = models.DecimalField(
+        verbose_name=_("Affiliate Commission"),
+        decimal_places=3,
+        max_digits=16,
+        default=0,
+    )
+    update_date = models.DateTimeField(
+        verbose_name=_("Date/Time Modified"), auto_now=True
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return "{date} {status} {instrument_type}".format(
+            date=self.date, status=self.status, instrument_type=self.instrument_type
+        )
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Payment Rollup")
+        verbose_name_plural = _("Payment Rollups")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("date", "status", "instrument_type"),
+                name="drf_imojo_rollup_bucket",
+            ),
+        )
+
+
+class ReconciliationJob(models.Model):
+    """
+    Represents a queued reconciliation of a payment request, used by
+    drf_instamojo.queue.DatabaseBackend.
+
+    A payment request can have only one queued job at a time.
+    """
+
+    payment_request = models.OneToOneField(
+        to=PaymentRequest,
+        on_delete=models.CASCADE,
+        verbose_name=_("Payment Request"),
+        related_name="reconciliation_job",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name=_("Failed Attempts"), default=0
+    )
+    # Bumped each time job is queued again, so that a worker deletes it
+    # only if it wasn't queued again while being processed
+    version = models.PositiveIntegerField(verbose_name=_("Version"), default=0)
+    locked_until = models.DateTimeField(
+        verbose_name=_("Locked Until"), null=True, blank=True
+    )
+    create_date = models.DateTimeField(
+        verbose_name=_("Create Date/Time"), auto_now_add=True, db_index=True
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return str(self.payment_request_id)
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Reconciliation Job")
+        verbose_name_plural = _("Reconciliation Jobs")
+
+
+class PaymentDoneOutbox(models.Model):
+    """
+    Transactional outbox of payment_done signal, see drf_instamojo.outbox.
+
+    A row is created in the transaction that completes a payment request
+    and is dispatched after it commits. A payment request can have only
+    one row, which is marked dispatched once all receivers of
+    payment_done succeed, and retried till then.
+    """
+
+    payment_request = models.OneToOneField(
+        to=PaymentRequest,
+        on_delete=models.CASCADE,
+        verbose_name=_("Payment Request"),
+        related_name="payment_done_outbox",
+    )
+    dispatched_at = models.DateTimeField(
+        verbose_name=_("Dispatched At"), null=True, blank=True
+    )
+    attempts = models.PositiveIntegerField(verbose_name=_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(
+        verbose_name=_("Next Attempt At"), null=True, blank=True
+    )
+    last_error = models.TextField(verbose_name=_("Last Error"), null=True, blank=True)
+    create_date = models.DateTimeField(
+        verbose_name=_("Create Date/Time"), auto_now_add=True
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return str(self.payment_request_id)
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Payment Done Outbox")
+        verbose_name_plural = _("Payment Done Outbox")
+        indexes = (
+            models.Index(
+                fields=("dispatched_at", "create_date"),
+                name="drf_imojo_outbox_pending",
+            ),
+        )
+
+
+class RawResponse(models.Model):
+    """
+    Append-only archive of raw data received from Instamojo, i.e. API
+    responses and webhooks, of a payment request and its payments.
+
+    Data is stored as per RAW_RESPONSE_STORAGE setting: as text, as
+    zlib compressed text or in a JSONField.
+    """
+
+    from .variables import RAW_RESPONSE_SOURCE_CHOICES
+
+    payment_request = models.ForeignKey(
+        to=PaymentRequest,
+        on_delete=models.CASCADE,
+        verbose_name=_("Payment Request"),
+        related_name="raw_responses",
+    )
+    payment = models.ForeignKey(
+        to=Payment,
+        on_delete=models.CASCADE,
+        verbose_name=_("Payment"),
+        related_name="raw_responses",
+        null=True,
+        blank=True,
+    )
+    source = models.CharField(
+        verbose_name=_("Source"), max_length=16, choices=RAW_RESPONSE_SOURCE_CHOICES
+    )
+
+    text = models.TextField(verbose_name=_("Raw Response"), null=True, blank=True)
+    compressed = models.BinaryField(
+        verbose_name=_("Compressed Raw Response"), null=True, blank=True
+    )
+    data = models.JSONField(verbose_name=_("Raw Response JSON"), null=True, blank=True)
+
+    create_date = models.DateTimeField(
+        verbose_name=_("Create Date/Time"), auto_now_add=True
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return "{source}: {payment_request_id}".format(
+            source=self.source, payment_request_id=self.payment_request_id
+        )
+
+    @classmethod
+    def build(cls, response: dict, source: str, payment_request, payment=None):
+        """
+        Builds an unsaved RawResponse for a response
+
+        Parameters
+        ----------
+        response: dict
+            Data received from Instamojo
+        source: str
+            One of RAW_RESPONSE_SOURCE_CHOICES
+        payment_request: PaymentRequest
+        payment: Payment, optional
+
+        Returns
+        -------
+        RawResponse
+        """
+        import json
+        import zlib
+
+        from .settings import get_setting
+        from .variables import COMPRESSED_STORAGE
+        from .variables import JSON_STORAGE
+
+        instance = cls(source=source, payment_request=payment_request, payment=payment)
+        storage = get_setting("RAW_RESPONSE_STORAGE")
+        if storage == JSON_STORAGE:
+            instance.data = response
+        elif storage == COMPRESSED_STORAGE:
+            instance.compressed = zlib.compress(json.dumps(response).encode("utf-8"))
+        else:
+            instance.text = json.dumps(response)
+        return instance
+
+    @property
+    def response(self) -> dict:
+        """Stored data, decoded"""
+        import json
+        import zlib
+
+        if self.data is not None:
+            return self.data
+        if self.compressed is not None:
+            return json.loads(zlib.decompress(self.compressed).decode("utf-8"))
+        if self.text is not None:
+            return json.loads(self.text)
+        return None
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Raw Response")
+        verbose_name_plural = _("Raw Responses")
+
+
+class SyncState(models.Model):
+    """
+    Progress of incremental sync with Instamojo, used by
+    sync_instamojo command.
+
+    watermark is the latest modified_at synced by a completed run. While
+    a run is in progress, cursor holds the next page to be fetched and
+    pending_watermark the latest modified_at seen, so that an
+    interrupted run resumes from where it stopped.
+    """
+
+    name = models.CharField(verbose_name=_("Name"), max_length=64, unique=True)
+    watermark = models.DateTimeField(
+        verbose_name=_("Synced Till"), null=True, blank=True
+    )
+    cursor = models.PositiveIntegerField(
+        verbose_name=_("Next Page"), null=True, blank=True
+    )
+    pending_watermark = models.DateTimeField(
+        verbose_name=_("Synced Till (In Progress)"), null=True, blank=True
+    )
+    update_date = models.DateTimeField(
+        verbose_name=_("Date/Time Modified"), auto_now=True
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return self.name
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Sync State")
+        verbose_name_plural = _("Sync States")
+
+
+class IdempotencyKey(CreateUpdateModel):
+    """
+    Result of a create request made with an Idempotency-Key, replayed
+    for retries of the request with same key by same user.
+
+    Row is locked while the request is being processed, so concurrent
+    retries wait for its result instead of creating again.
+    """
+
+    key = models.CharField(verbose_name=_("Idempotency Key"), max_length=255)
+    request_hash = models.CharField(verbose_name=_("Request Hash"), max_length=64)
+    payment_request = models.ForeignKey(
+        to=PaymentRequest,
+        on_delete=models.CASCADE,
+        verbose_name=_("Payment Request"),
+        null=True,
+        blank=True,
+    )
+    response_status = models.PositiveSmallIntegerField(
+        verbose_name=_("Response Status"), null=True, blank=True
+    )
+    response_data = models.JSONField(
+        verbose_name=_("Response Data"),
+        null=True,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+    )
+
+    def __str__(self):
+        """String representation of model"""
+        return self.key
+
+    class Meta:
+        """Passing model metadata"""
+
+        verbose_name = _("Idempotency Key")
+        verbose_name_plural = _("Idempotency Keys")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("created_by", "key"), name="drf_imojo_idem_owner_key"
+            ),
+        )
@@ -0,0 +1,173 @@
+"""
+Transactional outbox of payment_done signal
+
+payment_done is not sent from the transaction that completes a payment
+request. Instead, a PaymentDoneOutbox row is created in that transaction
+and these rows are dispatched once it commits. A payment request
+has a single row, so payment_done is sent once per payment request
+however many times it is saved, reconciled or synced as completed.
+
+Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED in a short
+transaction, which hides them from other dispatchers for
+OUTBOX_CLAIM_TIMEOUT seconds, and the signal is sent after it commits. A
+row is marked dispatched only if no receiver raised. Otherwise its error
+is recorded and it is retried after OUTBOX_RETRY_DELAY seconds times its
+attempts, up to OUTBOX_MAX_ATTEMPTS. If a process dies while sending,
+its rows are sent again once their claim times out. Receivers may so
+see a payment request more than once and should be idempotent.
+
+Rows left undispatched, e.g. to be retried, are dispatched in batches by
+``python manage.py process_instamojo_outbox``.
+"""
+from .settings import get_setting
+
+
+def enqueue_payment_done(payment_requests, using: str = None):
+    """
+    Adds payment requests to outbox, unless these are already there, and
+    dispatches their rows once the current transaction is committed. The
+    rest of outbox is left to process_instamojo_outbox.
+
+    Parameters
+    ----------
+    payment_requests: iterable
+        Completed PaymentRequest instances
+    using: str, optional
+        Database alias
+    """
+    from django.db import transaction
+
+    from .models import PaymentDoneOutbox
+
+    rows = [PaymentDoneOutbox(payment_request=pr) for pr in payment_requests]
+    if not rows:
+        return
+    PaymentDoneOutbox.objects.using(using).bulk_create(rows, ignore_conflicts=True)
+    ids = [row.payment_request_id for row in rows]
+    transaction.on_commit(
+        lambda: dispatch_payment_done(payment_request_ids=ids, using=using),
+        using=using,
+    )
+
+
+def _claim(outbox, batch_size: int, using: str = None) -> list:
+    """
+    Claims undispatched rows that are due, oldest first, skipping rows
+    locked by other dispatchers
+
+    Returns
+    -------
+    list: claimed PaymentDoneOutbox instances, attempts as before claim
+    """
+    import datetime
+
+    from django.db import transaction
+    from django.db.models import F
+    from django.db.models import Q
+    from django.utils import timezone
+
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        rows = list(
+            outbox.select_for_update(skip_locked=True)
+            .filter(
+                Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+                dispatched_at__isnull=True,
+                attempts__lt=get_setting("OUTBOX_MAX_ATTEMPTS"),
+            )
+            .order_by("create_date")[:batch_size]
+        )
+        if rows:
+            timeout = datetime.timedelta(seconds=get_setting("OUTBOX_CLAIM_TIMEOUT"))
+            outbox.filter(pk__in=[row.pk for row in rows]).update(
+                attempts=F("attempts") + 1, next_attempt_at=now + timeout
+            )
+    return rows
+
+
+def _errors(responses) -> str:
+    """Returns errors of receivers in responses of send_robust(), if any"""
+    return "\n".join(
+        "{receiver}: {error!r}".format(
+            receiver=getattr(receiver, "__qualname__", receiver), error=response
+        )
+        for receiver, response in responses
+        if isinstance(response, Exception)
+    )
+
+
+def dispatch_payment_done(
+    batch_size: int = None, payment_request_ids=None, using: str = None
+) -> int:
+    """
+    Sends payment_done for undispatched outbox rows that are due, oldest
+    first, batch by batch, till none is left. Rows claimed by other
+    dispatchers are skipped.
+
+    Receivers are called outside of any transaction of the dispatcher.
+    Errors raised by them are logged by Signal.send_robust() and recorded
+    on the row, which is retried later.
+
+    Parameters
+    ----------
+    batch_size: int, optional
+        Rows claimed at a time, defaults to OUTBOX_BATCH_SIZE
+    payment_request_ids: iterable, optional
+        Dispatches rows of these payment requests only
+    using: str, optional
+        Database alias
+
+    Returns
+    -------
+    int: number of rows dispatched
+    """
+    import datetime
+
+    from django.utils import timezone
+
+    from .models import PaymentDoneOutbox
+    from .models import PaymentRequest
+    from .signals import payment_done
+
+    batch_size = batch_size or get_setting("OUTBOX_BATCH_SIZE")
+    retry_delay = get_setting("OUTBOX_RETRY_DELAY")
+    outbox = PaymentDoneOutbox.objects.using(using)
+    if payment_request_ids is not None:
+        outbox = outbox.filter(payment_request_id__in=list(payment_request_ids))
+    total = 0
+    while True:
+        rows = _claim(outbox, batch_size, using=using)
+        if not rows:
+            break
+        payment_requests = PaymentRequest.objects.using(using).in_bulk(
+            [row.payment_request_id for row in rows]
+        )
+
+        dispatched = []
+        for row in rows:
+            payment_request = payment_requests.get(row.payment_request_id)
+            if payment_request is None:
+                # Deleted along with its row
+                continue
+            errors = _errors(
+                payment_done.send_robust(
+                    sender=PaymentRequest, instance=payment_request
+                )
+            )
+            if not errors:
+                dispatched.append(row.pk)
+                continue
+            attempts = row.attempts + 1
+            outbox.filter(pk=row.pk).update(
+                last_error=errors,
+                next_attempt_at=timezone.now()
+                + datetime.timedelta(seconds=retry_delay * attempts),
+            )
+
+        outbox.filter(pk__in=dispatched).update(
+            dispatched_at=timezone.now(), next_attempt_at=None, last_error=None
+        )
+        total += len(dispatched)
+        if len(rows) < batch_size:
+            break
+    return total
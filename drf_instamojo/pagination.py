@@ -0,0 +1,143 @@
+"""
+Pagination classes for list views
+
+Cursor (keyset) pagination serves deep pages with an indexed range
+query instead of OFFSET, which scans all the skipped rows.
+"""
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+from .settings import get_setting
+
+
+class CreateDateCursorPagination(CursorPagination):
+    """
+    Cursor pagination on create_date (latest first), with id as
+    tie-breaker.
+
+    The cursor holds both create_date and id of the last row of a page,
+    so rows sharing a create_date are paged through with a composite
+    keyset filter rather than DRF's capped offset.
+
+    Page size can be changed with page_size query parameter, up to
+    MAX_PAGE_SIZE.
+    """
+
+    ordering = ("-create_date", "-id")
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        """Page size as per PAGE_SIZE and MAX_PAGE_SIZE settings"""
+        self.page_size = get_setting("PAGE_SIZE")
+        self.max_page_size = get_setting("MAX_PAGE_SIZE")
+        return super(CreateDateCursorPagination, self).get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Same as DRF's, but filters on every ordering field after the
+        cursor position instead of on the first one only.
+
+        Positions are unique, so links never need an offset.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(
+                *(
+                    order[1:] if order.startswith("-") else "-" + order
+                    for order in self.ordering
+                )
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(queryset.model, current_position, reverse)
+            )
+
+        # Fetch an extra row to know whether a page follows this one
+        end = offset + self.page_size + 1
+        results = list(queryset[offset:end])
+        self.page = results[: self.page_size]
+
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_position_filter(self, model, position: str, reverse: bool) -> Q:
+        """
+        Returns the filter of rows that follow the cursor position, i.e.
+        (a < x) OR (a = x AND b < y) for ordering ("-a", "-b")
+        """
+        try:
+            values = json.loads(position)
+            assert len(values) == len(self.ordering)
+            values = [
+                model._meta.get_field(order.lstrip("-")).to_python(value)
+                for order, value in zip(self.ordering, values)
+            ]
+        except (AssertionError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        conditions = []
+        for index, order in enumerate(self.ordering):
+            field = order.lstrip("-")
+            # Test for: (cursor reversed) XOR (field reversed)
+            lookup = "lt" if reverse != order.startswith("-") else "gt"
+            equal = {
+                ordered.lstrip("-"): value
+                for ordered, value in zip(self.ordering[:index], values)
+            }
+            conditions.append(Q(**equal, **{field + "__" + lookup: values[index]}))
+        return reduce(or_, conditions)
+
+    def _get_position_from_instance(self, instance, ordering):
+        """Returns values of all ordering fields of instance as position"""
+        values = []
+        for order in ordering:
+            field_name = order.lstrip("-")
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            values.append(str(attr))
+        return json.dumps(values)
@@ -0,0 +1,27 @@
+"""
+Permissions related to drf_instamojo
+"""
+from rest_framework.permissions import BasePermission
+
+
+class CanViewMetrics(BasePermission):
+    """
+    Allows staff users, and requests with ``Authorization: Bearer
+    <METRICS_TOKEN>`` header if METRICS_TOKEN setting is set, e.g. for
+    Prometheus scrapers.
+    """
+
+    def has_permission(self, request, view):
+        """Checks user or metrics token"""
+        import hmac
+
+        from .settings import get_setting
+
+        if request.user and request.user.is_staff:
+            return True
+
+        token = get_setting("METRICS_TOKEN")
+        if not token:
+            return False
+        header = request.headers.get("Authorization", "")
+        return hmac.compare_digest(header, "Bearer {token}".format(token=token))
@@ -0,0 +1,253 @@
+"""
+Background queue for reconciliation jobs
+
+Backend is selected via RECONCILIATION_BACKEND setting. Available
+backends:
+
+* ``drf_instamojo.queue.ThreadPoolBackend`` (default): Runs jobs in an
+  in-process thread pool.
+* ``drf_instamojo.queue.DatabaseBackend``: Stores jobs in
+  ReconciliationJob table, to be processed by
+  ``python manage.py process_instamojo_reconciliation``.
+* ``drf_instamojo.queue.ImmediateBackend``: Runs jobs right away in the
+  calling thread.
+
+Every backend deduplicates jobs per payment request, i.e. a payment
+request that is already waiting in queue is not queued again.
+
+Custom backends should subclass BaseBackend and implement enqueue().
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class BaseBackend:
+    """Base class for reconciliation backends"""
+
+    def enqueue(self, payment_request_id: str):
+        """
+        Queues reconciliation of a payment request
+
+        Parameters
+        ----------
+        payment_request_id: str
+        """
+        raise NotImplementedError
+
+    def run(self, payment_request_id: str):
+        """
+        Reconciles a payment request, logging any error.
+
+        Parameters
+        ----------
+        payment_request_id: str
+
+        Returns
+        -------
+        bool: True, if job succeeded
+        """
+        from .reconciliation import reconcile_payment_request
+
+        try:
+            reconcile_payment_request(payment_request_id)
+        except Exception:
+            logger.exception(
+                "Reconciliation of payment request %s failed.", payment_request_id
+            )
+            return False
+        return True
+
+
+class ImmediateBackend(BaseBackend):
+    """Runs reconciliation in the calling thread"""
+
+    def enqueue(self, payment_request_id: str):
+        """Runs reconciliation right away"""
+        self.run(payment_request_id)
+
+
+class ThreadPoolBackend(BaseBackend):
+    """
+    Runs reconciliation in an in-process pool of RECONCILIATION_WORKERS
+    threads. Queued jobs are lost if the process exits.
+    """
+
+    def __init__(self):
+        """Initialize executor and set of queued payment requests"""
+        self.executor = ThreadPoolExecutor(
+            max_workers=get_setting("RECONCILIATION_WORKERS"),
+            thread_name_prefix="drf_instamojo",
+        )
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def enqueue(self, payment_request_id: str):
+        """Submits job to pool, unless it's already waiting there"""
+        with self.lock:
+            if payment_request_id in self.queued:
+                return
+            self.queued.add(payment_request_id)
+        self.executor.submit(self._work, payment_request_id)
+
+    def _work(self, payment_request_id: str):
+        """Runs job in worker thread"""
+        from django.db import close_old_connections
+
+        # Changes made after this point need another job
+        with self.lock:
+            self.queued.discard(payment_request_id)
+
+        close_old_connections()
+        try:
+            self.run(payment_request_id)
+        finally:
+            close_old_connections()
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Stores jobs in ReconciliationJob table. Jobs survive restarts and
+    are processed by process_instamojo_reconciliation command.
+    """
+
+    def enqueue(self, payment_request_id: str):
+        """
+        Creates a job, unless payment request has one already. A job
+        that is being processed is queued again instead.
+        """
+        from django.db import IntegrityError
+        from django.db import transaction
+        from django.db.models import F
+
+        from .models import ReconciliationJob
+
+        jobs = ReconciliationJob.objects.filter(payment_request_id=payment_request_id)
+        if jobs.filter(locked_until__isnull=False).update(version=F("version") + 1):
+            return
+        try:
+            with transaction.atomic():
+                ReconciliationJob.objects.get_or_create(
+                    payment_request_id=payment_request_id
+                )
+        except IntegrityError:
+            # Concurrently queued by someone else
+            pass
+
+    def claim(self, max_attempts: int = 5):
+        """
+        Claims the oldest job that is neither claimed by another worker
+        nor failed max_attempts times, in a short transaction
+
+        Parameters
+        ----------
+        max_attempts: int
+
+        Returns
+        -------
+        ReconciliationJob or None: with version as claimed
+        """
+        import datetime
+
+        from django.db import transaction
+        from django.db.models import Q
+        from django.utils import timezone
+
+        from .models import ReconciliationJob
+
+        now = timezone.now()
+        with transaction.atomic():
+            job = (
+                ReconciliationJob.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+                    attempts__lt=max_attempts,
+                )
+                .order_by("create_date")
+                .first()
+            )
+            if job is None:
+                return None
+            job.locked_until = now + datetime.timedelta(
+                seconds=get_setting("RECONCILIATION_CLAIM_TIMEOUT")
+            )
+            job.save(update_fields=["locked_until"])
+        return job
+
+    def process(self, batch_size: int = 100, max_attempts: int = 5):
+        """
+        Processes a batch of queued jobs. Jobs claimed by other workers
+        are skipped, so multiple workers can run in parallel.
+
+        Each job is claimed in its own transaction and reconciled outside
+        of it. A job is deleted only if it wasn't queued again meanwhile,
+        otherwise it is released to be processed again. A failed job is
+        left locked for RECONCILIATION_RETRY_DELAY seconds times its
+        attempts so far.
+
+        Parameters
+        ----------
+        batch_size: int
+            Maximum number of jobs to process
+        max_attempts: int
+            Jobs that failed these many times are not picked anymore
+
+        Returns
+        -------
+        int: number of jobs processed
+        """
+        import datetime
+
+        from django.utils import timezone
+
+        from .models import ReconciliationJob
+
+        retry_delay = get_setting("RECONCILIATION_RETRY_DELAY")
+        processed = 0
+        while processed < batch_size:
+            job = self.claim(max_attempts=max_attempts)
+            if job is None:
+                break
+
+            claimed = ReconciliationJob.objects.filter(pk=job.pk)
+            if not self.run(job.payment_request_id):
+                attempts = job.attempts + 1
+                claimed.update(
+                    attempts=attempts,
+                    locked_until=timezone.now()
+                    + datetime.timedelta(seconds=retry_delay * attempts),
+                )
+            elif not claimed.filter(version=job.version).delete()[0]:
+                # Queued again while being reconciled
+                claimed.update(locked_until=None)
+            processed += 1
+        return processed
+
+
+_backend = {}
+_lock = threading.Lock()
+
+
+def get_backend() -> BaseBackend:
+    """
+    Returns instance of configured RECONCILIATION_BACKEND
+
+    Returns
+    -------
+    BaseBackend
+    """
+    from django.utils.module_loading import import_string
+
+    path = get_setting("RECONCILIATION_BACKEND")
+    backend = _backend.get(path)
+    if backend is None:
+        with _lock:
+            backend = _backend.get(path)
+            if backend is None:
+                backend = import_string(path)()
+                _backend[path] = backend
+    return backend
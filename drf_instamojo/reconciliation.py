@@ -0,0 +1,235 @@
+"""
+Reconciliation of payment requests with Instamojo
+
+Fetches status of a payment request from Instamojo, updates the local
+payment request and records its payments that are not yet saved.
+Reconciliation is run in background via drf_instamojo.queue; use
+``enqueue_reconciliation`` to schedule it.
+"""
+
+# Fields of PaymentRequest that are updated by Instamojo
+SYNCED_FIELDS = ("status", "sms_status", "email_status")
+
+
+def reconcile_payment_request(payment_request_id: str):
+    """
+    Updates payment request and records its missing payments as per
+    Instamojo.
+
+    Parameters
+    ----------
+    payment_request_id: str
+        ID of PaymentRequest to be reconciled
+
+    Returns
+    -------
+    None
+    """
+    from .client import get_client
+    from .models import PaymentRequest
+
+    pr = PaymentRequest.objects.select_related("configuration").get(
+        id=payment_request_id
+    )
+
+    imojo = get_client(pr.configuration)
+
+    pr_status = imojo.payment_request_status(id=pr.id)
+
+    # Check if payment status request is successful
+    if not pr_status.get("success"):
+        return
+
+    payment_request_imojo = pr_status.get("payment_request")
+
+    update_payment_request(pr, payment_request_imojo)
+
+    record_payments(pr, payment_request_imojo.get("payments") or [])
+
+
+def update_payment_request(payment_request, data: dict):
+    """
+    Updates payment request as per data from Instamojo, if it has been
+    modified since last sync.
+
+    Instamojo's modified_at is the sync watermark of a payment request:
+    data that is not newer than it is skipped without any write, and
+    only the changed columns are saved otherwise.
+
+    Parameters
+    ----------
+    payment_request: PaymentRequest
+    data: dict
+        Payment request as returned by Instamojo
+
+    Returns
+    -------
+    list: names of updated fields, empty if nothing was updated
+    """
+    changed = apply_payment_request_data(payment_request, data)
+    if changed:
+        payment_request.save(update_fields=changed + ["update_date"])
+    return changed
+
+
+def apply_payment_request_data(payment_request, data: dict):
+    """
+    Sets synced fields of payment request as per data from Instamojo,
+    without saving it. See update_payment_request.
+
+    Parameters
+    ----------
+    payment_request: PaymentRequest
+    data: dict
+        Payment request as returned by Instamojo
+
+    Returns
+    -------
+    list: names of changed fields, empty if data is not newer
+    """
+    from .mappers import PAYMENT_REQUEST
+
+    modified_at = PAYMENT_REQUEST.convert("modified_at", data.get("modified_at"))
+    if modified_at is None or (
+        payment_request.modified_at is not None
+        and modified_at <= payment_request.modified_at
+    ):
+        return []
+
+    changed = ["modified_at"]
+    payment_request.modified_at = modified_at
+    for field in SYNCED_FIELDS:
+        if field not in data:
+            continue
+        value = PAYMENT_REQUEST.convert(field, data[field])
+        if getattr(payment_request, field) != value:
+            setattr(payment_request, field, value)
+            changed.append(field)
+    return changed
+
+
+def build_payment(payment_request, data: dict, mapper=None):
+    """
+    Builds an unsaved Payment from payment data returned by Instamojo
+
+    Parameters
+    ----------
+    payment_request: PaymentRequest
+        Payment request of the payment
+    data: dict
+        Payment as returned by Instamojo
+    mapper: FieldMapper, optional
+        Mapper of data, defaults to drf_instamojo.mappers.PAYMENT
+
+    Returns
+    -------
+    Payment
+    """
+    from .mappers import PAYMENT
+    from .models import Payment
+
+    values = (mapper or PAYMENT).map(data).values
+    return Payment(payment_request=payment_request, **values)
+
+
+def record_payments(payment_request, payments: list):
+    """
+    Saves payments of a payment request that are not yet saved, in a
+    single query, adds them to daily rollups and sends payments_recorded
+    signal with them.
+
+    post_save is not sent for these payments, so no further
+    reconciliation is queued. Payments saved concurrently are left to
+    whoever saved them: only the ones inserted here are rolled up,
+    archived and signalled.
+
+    Parameters
+    ----------
+    payment_request: PaymentRequest
+    payments: list
+        List of payments data as returned by Instamojo
+
+    Returns
+    -------
+    list: newly saved Payment instances
+    """
+    from django.db import IntegrityError
+    from django.db import transaction
+
+    from .models import Payment
+    from .models import RawResponse
+    from .rollups import apply_rollups
+    from .rollups import rollup_values
+    from .signals import payments_recorded
+    from .variables import STATUS
+
+    ids = [payment.get("payment_id") for payment in payments]
+    if not ids:
+        return []
+
+    existing = set(Payment.objects.filter(id__in=ids).values_list("id", flat=True))
+    new = {
+        payment.id: (payment, data)
+        for payment, data in (
+            (build_payment(payment_request, data), data)
+            for data in payments
+            if data.get("payment_id") not in existing
+        )
+    }
+
+    with transaction.atomic():
+        while new:
+            try:
+                with transaction.atomic():
+                    Payment.objects.bulk_create([p for p, _ in new.values()])
+                break
+            except IntegrityError:
+                # Some got saved concurrently, insert the others
+                saved = set(
+                    Payment.objects.filter(id__in=new).values_list("id", flat=True)
+                )
+                if not saved:
+                    raise
+                new = {pk: item for pk, item in new.items() if pk not in saved}
+        if not new:
+            return []
+
+        recorded = [payment for payment, _ in new.values()]
+        apply_rollups(added=[rollup_values(payment) for payment in recorded])
+        RawResponse.objects.bulk_create(
+            [
+                RawResponse.build(
+                    data, source=STATUS, payment_request=payment_request, payment=p
+                )
+                for p, data in new.values()
+            ]
+        )
+        transaction.on_commit(
+            lambda: payments_recorded.send(sender=Payment, instances=recorded)
+        )
+    return recorded
+
+
+def enqueue_reconciliation(payment_request_id: str, using=None):
+    """
+    Schedules reconciliation of a payment request with the configured
+    RECONCILIATION_BACKEND once current transaction is committed.
+
+    Parameters
+    ----------
+    payment_request_id: str
+        ID of PaymentRequest to be reconciled
+    using: str, optional
+        Database alias whose transaction is to be waited for
+
+    Returns
+    -------
+    None
+    """
+    from django.db import transaction
+
+    from .queue import get_backend
+
+    transaction.on_commit(
+        lambda: get_backend().enqueue(payment_request_id), using=using
+    )
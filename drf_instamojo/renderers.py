@@ -0,0 +1,70 @@
+"""
+Renderers of export views
+
+Exports are streamed by drf_instamojo.exports, these renderers let DRF
+negotiate their format, via Accept header or ?format=csv / ?format=ndjson,
+and render responses that are not streamed, e.g. errors.
+"""
+from rest_framework.renderers import BaseRenderer
+
+
+def _records(data) -> list:
+    """Returns data as a list of dicts"""
+    if isinstance(data, dict):
+        return [data]
+    return [item if isinstance(item, dict) else {"detail": item} for item in data]
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a dict, or a list of dicts, as CSV with a header. Text that
+    starts like a formula is escaped.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders data"""
+        import csv
+        import io
+
+        from .exports import escape_formula
+
+        if data is None:
+            return b""
+        # Lists, e.g. of errors of a field, are joined in a cell
+        records = [
+            {
+                key: escape_formula(
+                    "; ".join(map(str, value)) if isinstance(value, list) else value
+                )
+                for key, value in record.items()
+            }
+            for record in _records(data)
+        ]
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(records)
+        return output.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a dict, or a list of dicts, as a JSON object per line"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders data"""
+        from django.core.serializers.json import DjangoJSONEncoder
+
+        if data is None:
+            return b""
+        encoder = DjangoJSONEncoder()
+        lines = (encoder.encode(record) + "\n" for record in _records(data))
+        return "".join(lines).encode(self.charset)
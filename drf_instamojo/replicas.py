@@ -0,0 +1,249 @@
+"""
+Reads from read replicas
+
+List views, the admin's change lists and reporting can read from the
+databases in READ_DATABASES, aliases of replicas of the primary
+("default") database, so that they don't load the primary during peak
+checkout. Creation and reconciliation always use the primary.
+
+Replicas lag behind the primary, so a user reads from the primary for
+READ_STICKY_SECONDS after a write of theirs: creation of payment
+requests via views and saves of their payment requests and payments.
+The window is kept in-process and, if READ_STICKY_CACHE is set, in that
+Django cache as well, so that it holds across processes.
+
+Reads are routed by ReplicaReadMixin (views), ReplicaAdminMixin (admin)
+and read_database() / replica_reads(). ReplicaRouter makes replica_reads()
+effective for querysets that don't choose a database, keeps migrations
+off the replicas and allows relations across them.
+
+Examples
+--------
+>>> DATABASES = {"default": {...}, "replica": {...}}
+>>> DATABASE_ROUTERS = ["drf_instamojo.replicas.ReplicaRouter"]
+>>> INSTAMOJO = {"READ_DATABASES": ("replica",), "READ_STICKY_CACHE": "default"}
+
+>>> with replica_reads(request.user):
+>>>     totals = PaymentRequest.objects.values("status").annotate(Count("id"))
+"""
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from .settings import get_setting
+
+STICKY_KEY = "drf_instamojo:read_sticky:{pk}"
+
+# End of window of users that read from the primary, by pk, earliest
+# first
+_sticky = OrderedDict()
+_lock = threading.Lock()
+
+# Database of reads routed by ReplicaRouter in current context
+_read_database = contextvars.ContextVar("drf_instamojo_read_database", default=None)
+
+
+def _shared_cache():
+    """Returns Django cache set in READ_STICKY_CACHE, if any"""
+    from .cache import _shared_cache
+
+    return _shared_cache("READ_STICKY_CACHE")
+
+
+def replicas_enabled() -> bool:
+    """Whether any read replica is configured"""
+    return bool(get_setting("READ_DATABASES"))
+
+
+def mark_write(user_pk):
+    """
+    Makes user read from the primary for READ_STICKY_SECONDS
+
+    Parameters
+    ----------
+    user_pk: pk of user that wrote, None is ignored
+    """
+    window = get_setting("READ_STICKY_SECONDS")
+    if user_pk is None or not window or not replicas_enabled():
+        return
+
+    now = time.monotonic()
+    with _lock:
+        _sticky[user_pk] = now + window
+        _sticky.move_to_end(user_pk)
+        # Entries expire in order, as window is fixed
+        while _sticky and next(iter(_sticky.values())) <= now:
+            _sticky.popitem(last=False)
+
+    shared = _shared_cache()
+    if shared:
+        shared.set(STICKY_KEY.format(pk=user_pk), True, window)
+
+
+def is_sticky(user_pk) -> bool:
+    """
+    Whether user wrote within READ_STICKY_SECONDS
+
+    Parameters
+    ----------
+    user_pk: pk of user, None for anonymous
+
+    Returns
+    -------
+    bool
+    """
+    if user_pk is None:
+        return False
+    with _lock:
+        expires_at = _sticky.get(user_pk)
+    if expires_at is not None and expires_at > time.monotonic():
+        return True
+
+    shared = _shared_cache()
+    return bool(shared and shared.get(STICKY_KEY.format(pk=user_pk)))
+
+
+def read_database(user=None) -> str:
+    """
+    Returns alias of database that reads of user should use
+
+    Parameters
+    ----------
+    user: User, optional
+        User whose data is read, if any
+
+    Returns
+    -------
+    str: a random one of READ_DATABASES, or "default" if none is
+    configured or user has written recently
+    """
+    from django.db import DEFAULT_DB_ALIAS
+
+    aliases = get_setting("READ_DATABASES")
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    if user is not None and is_sticky(getattr(user, "pk", None)):
+        return DEFAULT_DB_ALIAS
+    return random.choice(aliases)
+
+
+@contextlib.contextmanager
+def replica_reads(user=None):
+    """
+    Routes reads of drf_instamojo's models to read_database(user) via
+    ReplicaRouter, within the block
+
+    Parameters
+    ----------
+    user: User, optional
+        User whose data is read, if any
+
+    Yields
+    ------
+    str: alias of database read from
+    """
+    alias = read_database(user)
+    token = _read_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router for READ_DATABASES
+
+    Reads of drf_instamojo's models within replica_reads() go to its
+    database, all other reads and writes are left to other routers.
+    Replicas are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        """Database of replica_reads(), if any"""
+        if model._meta.app_label != "drf_instamojo":
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        """Writes are left to other routers"""
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Objects of primary and replicas are related freely"""
+        from django.db import DEFAULT_DB_ALIAS
+
+        aliases = {DEFAULT_DB_ALIAS, *get_setting("READ_DATABASES")}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Replicas are migrated by replication"""
+        if db in get_setting("READ_DATABASES"):
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Mixin for generic views that reads from a replica on GET / HEAD /
+    OPTIONS, unless current user wrote recently. Successful requests of
+    other methods make current user read from the primary for
+    READ_STICKY_SECONDS.
+    """
+
+    def get_queryset(self):
+        """Queryset that reads from read_database() on safe methods"""
+        from rest_framework.permissions import SAFE_METHODS
+
+        queryset = super(ReplicaReadMixin, self).get_queryset()
+        if self.request.method not in SAFE_METHODS or not replicas_enabled():
+            return queryset
+        return queryset.using(read_database(self.request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Marks write of current user"""
+        from rest_framework.permissions import SAFE_METHODS
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_write(getattr(request.user, "pk", None))
+        return super(ReplicaReadMixin, self).finalize_response(
+            request, response, *args, **kwargs
+        )
+
+
+class ReplicaAdminMixin:
+    """
+    Mixin for ModelAdmin that reads from a replica on GET, unless current
+    user wrote recently. Actions and deletes (POST) use the primary and
+    make current user read from the primary for READ_STICKY_SECONDS.
+    """
+
+    def get_queryset(self, request):
+        """Queryset that reads from read_database() on GET"""
+        queryset = super(ReplicaAdminMixin, self).get_queryset(request)
+        if request.method != "GET" or not replicas_enabled():
+            return queryset
+        return queryset.using(read_database(request.user))
+
+    def save_model(self, request, obj, form, change):
+        """Marks write of current user"""
+        super(ReplicaAdminMixin, self).save_model(request, obj, form, change)
+        mark_write(request.user.pk)
+
+    def delete_model(self, request, obj):
+        """Marks write of current user"""
+        super(ReplicaAdminMixin, self).delete_model(request, obj)
+        mark_write(request.user.pk)
+
+    def delete_queryset(self, request, queryset):
+        """Marks write of current user"""
+        super(ReplicaAdminMixin, self).delete_queryset(request, queryset)
+        mark_write(request.user.pk)
@@ -0,0 +1,370 @@
+"""
+Daily rollups of payments
+
+PaymentRollup holds count and sums of amount, fees and affiliate
+commission of payments per day (of created_at, i.e. when Instamojo
+created the payment, in current time zone), status and instrument type.
+Rollups are updated by difference in the transaction that writes
+payments: on post_save / post_delete of a payment and by the bulk writes
+of reconciliation, webhooks and sync. So reports read a row per bucket,
+whatever the number of payments.
+
+Payments whose created_at is unknown, e.g. those recorded before it was
+stored, are not rolled up till sync fills it in. Payments changed
+otherwise, e.g. with QuerySet.update(), are not rolled up either.
+Recompute rollups of such days with rebuild_rollups(), or
+``python manage.py rebuild_instamojo_rollups``.
+
+Examples
+--------
+>>> report_rollups(start=date(2024, 4, 1), group_by=("month", "status"))
+[{"month": date(2024, 4, 1), "status": "Credit", "payment_count": 120, ...}]
+"""
+import datetime
+import decimal
+import logging
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Fields of Payment that rollups depend on
+FIELDS = (
+    "created_at",
+    "status",
+    "instrument_type",
+    "amount",
+    "fees",
+    "affiliate_commission",
+)
+BUCKET = ("date", "status", "instrument_type")
+TOTALS = ("count", "amount", "fees", "affiliate_commission")
+
+ZERO = decimal.Decimal(0)
+
+
+def rollup_values(payment):
+    """
+    Returns values of FIELDS of payment
+
+    Parameters
+    ----------
+    payment: Payment
+
+    Returns
+    -------
+    tuple or None: None if a field is deferred
+    """
+    values = payment.__dict__
+    try:
+        return tuple(values[field] for field in FIELDS)
+    except KeyError:
+        return None
+
+
+def _bucket_date(created_at) -> datetime.date:
+    """Returns date of created_at in current time zone"""
+    from django.utils import timezone
+
+    if timezone.is_aware(created_at):
+        return timezone.localdate(created_at)
+    return created_at.date()
+
+
+def apply_rollups(added=(), removed=(), using: str = None):
+    """
+    Adds payments to and removes them from their rollups, with an update
+    per bucket. Does nothing if PAYMENT_ROLLUPS is off.
+
+    Call it in the transaction that writes the payments.
+
+    Parameters
+    ----------
+    added: iterable
+        rollup_values() of payments that are saved, those without
+        created_at are skipped
+    removed: iterable
+        rollup_values() of payments, as they were before being changed or
+        deleted
+    using: str, optional
+        Alias of database
+    """
+    from django.db import IntegrityError
+    from django.db import transaction
+    from django.db.models import F
+    from django.utils import timezone
+
+    from .mappers import to_decimal
+    from .models import PaymentRollup
+
+    if not get_setting("PAYMENT_ROLLUPS"):
+        return
+
+    deltas = {}
+    for sign, items in ((1, added), (-1, removed)):
+        for values in items:
+            if values is None or values[0] is None:
+                continue
+            created_at, status, instrument_type, *amounts = values
+            key = (_bucket_date(created_at), status, instrument_type or "")
+            delta = deltas.setdefault(key, [0, ZERO, ZERO, ZERO])
+            delta[0] += sign
+            for index, amount in enumerate(amounts, start=1):
+                delta[index] += sign * (to_decimal(amount) or ZERO)
+
+    rollups = PaymentRollup.objects.using(using)
+    # Buckets are locked in the same order by every writer, so that
+    # concurrent transactions don't deadlock
+    for key in sorted(deltas):
+        delta = deltas[key]
+        if not any(delta):
+            continue
+        bucket = dict(zip(BUCKET, key))
+        changes = {name: F(name) + value for name, value in zip(TOTALS, delta)}
+        if rollups.filter(**bucket).update(update_date=timezone.now(), **changes):
+            if delta[0] < 0:
+                # Drop bucket left without payments
+                rollups.filter(**bucket, **dict.fromkeys(TOTALS, 0)).delete()
+            continue
+        try:
+            with transaction.atomic(using=using):
+                rollups.create(**bucket, **dict(zip(TOTALS, delta)))
+        except IntegrityError:
+            # Created concurrently
+            rollups.filter(**bucket).update(update_date=timezone.now(), **changes)
+
+
+def record_saved_payment(payment, created: bool, using: str = None):
+    """
+    Updates rollups of a payment that is saved, as per its values as
+    loaded. Its day is rebuilt if they are unknown.
+
+    Parameters
+    ----------
+    payment: Payment
+    created: bool
+        Whether payment is inserted
+    using: str, optional
+        Alias of database
+    """
+    previous = None if created else payment._loaded_rollup
+    current = rollup_values(payment)
+    if current is None or (previous is None and not created):
+        if payment.created_at is not None:
+            day = _bucket_date(payment.created_at)
+            rebuild_rollups(start=day, end=day, using=using)
+    elif current != previous:
+        apply_rollups(added=[current], removed=[previous], using=using)
+    payment._loaded_rollup = current
+
+
+def _day_start(day: datetime.date):
+    """Returns start of day in current time zone"""
+    from django.conf import settings
+    from django.utils import timezone
+
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def filter_payments(
+    payments,
+    start: datetime.date = None,
+    end: datetime.date = None,
+    statuses=(),
+    instrument_type: str = None,
+):
+    """
+    Filters payments as rollups are, by day of created_at, using its
+    index. Payments without created_at are left out.
+
+    Parameters
+    ----------
+    payments: QuerySet
+        Payments to be filtered
+    start: datetime.date, optional
+        First day included
+    end: datetime.date, optional
+        Last day included
+    statuses: iterable
+        Statuses to be included, all if empty
+    instrument_type: str, optional
+        Instrument type to be included, "" for payments without one
+
+    Returns
+    -------
+    QuerySet
+    """
+    from django.db.models import Q
+
+    payments = payments.filter(created_at__isnull=False)
+    if start is not None:
+        payments = payments.filter(created_at__gte=_day_start(start))
+    if end is not None:
+        end_of_day = _day_start(end + datetime.timedelta(days=1))
+        payments = payments.filter(created_at__lt=end_of_day)
+    if statuses:
+        payments = payments.filter(status__in=statuses)
+    if instrument_type == "":
+        payments = payments.filter(Q(instrument_type="") | Q(instrument_type=None))
+    elif instrument_type is not None:
+        payments = payments.filter(instrument_type=instrument_type)
+    return payments
+
+
+def rebuild_rollups(
+    start: datetime.date = None, end: datetime.date = None, using: str = None
+) -> int:
+    """
+    Recomputes rollups of days from start to end, both included, from
+    payments. Does nothing if PAYMENT_ROLLUPS is off.
+
+    Runs in a single transaction. Payments saved concurrently may be
+    missed, so prefer short ranges while payments are being received.
+
+    Parameters
+    ----------
+    start: datetime.date, optional
+        First day, defaults to that of the first payment
+    end: datetime.date, optional
+        Last day, defaults to that of the last payment
+    using: str, optional
+        Alias of database
+
+    Returns
+    -------
+    int: number of rollups created
+    """
+    from django.db import transaction
+    from django.db.models import Count
+    from django.db.models import Sum
+    from django.db.models import Value
+    from django.db.models.functions import Coalesce
+    from django.db.models.functions import TruncDate
+
+    from .models import Payment
+    from .models import PaymentRollup
+
+    if not get_setting("PAYMENT_ROLLUPS"):
+        return 0
+
+    payments = filter_payments(Payment.objects.using(using), start=start, end=end)
+    rollups = PaymentRollup.objects.using(using)
+    if start is not None:
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        rollups = rollups.filter(date__lte=end)
+
+    rows = (
+        payments.order_by()
+        .annotate(
+            date=TruncDate("created_at"),
+            instrument=Coalesce("instrument_type", Value("")),
+        )
+        .values("date", "status", "instrument")
+        .annotate(
+            payment_count=Count("id"),
+            total_amount=Sum("amount"),
+            total_fees=Sum("fees"),
+            total_affiliate_commission=Sum("affiliate_commission"),
+        )
+    )
+    batch_size = get_setting("EXPORT_CHUNK_SIZE")
+
+    created = 0
+    with transaction.atomic(using=using):
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(
+                PaymentRollup(
+                    date=row["date"],
+                    status=row["status"],
+                    instrument_type=row["instrument"],
+                    count=row["payment_count"],
+                    amount=row["total_amount"] or ZERO,
+                    fees=row["total_fees"] or ZERO,
+                    affiliate_commission=row["total_affiliate_commission"] or ZERO,
+                )
+            )
+            if len(batch) >= batch_size:
+                created += len(rollups.bulk_create(batch))
+                batch = []
+        created += len(rollups.bulk_create(batch))
+
+    logger.info("Rebuilt %d payment rollup(s).", created)
+    missing = Payment.objects.using(using).filter(created_at=None).count()
+    if missing:
+        logger.warning(
+            "%d payment(s) without created_at are not rolled up, run "
+            "sync_instamojo --full to fill it in.",
+            missing,
+        )
+    return created
+
+
+def report_rollups(
+    start: datetime.date = None,
+    end: datetime.date = None,
+    group_by=(),
+    statuses=(),
+    instrument_type: str = None,
+    using: str = None,
+) -> list:
+    """
+    Returns count and sums of payments, from rollups
+
+    Parameters
+    ----------
+    start: datetime.date, optional
+        First day included
+    end: datetime.date, optional
+        Last day included
+    group_by: iterable
+        Any of "date", "month", "status" and "instrument_type", totals
+        of whole range if empty
+    statuses: iterable
+        Statuses to be included, all if empty
+    instrument_type: str, optional
+        Instrument type to be included, "" for payments without one
+    using: str, optional
+        Alias of database
+
+    Returns
+    -------
+    list: a dict per group, of its values of group_by and payment_count,
+    total_amount, total_fees and total_affiliate_commission, ordered by
+    group_by
+    """
+    from django.db.models import Sum
+    from django.db.models.functions import TruncMonth
+
+    from .models import PaymentRollup
+    from .variables import REPORT_GROUP_CHOICES
+
+    rows = PaymentRollup.objects.using(using)
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lte=end)
+    if statuses:
+        rows = rows.filter(status__in=statuses)
+    if instrument_type is not None:
+        rows = rows.filter(instrument_type=instrument_type)
+
+    groups = [group for group, _ in REPORT_GROUP_CHOICES if group in group_by]
+    if "month" in groups:
+        rows = rows.annotate(month=TruncMonth("date"))
+    totals = {
+        "payment_count": Sum("count"),
+        "total_amount": Sum("amount"),
+        "total_fees": Sum("fees"),
+        "total_affiliate_commission": Sum("affiliate_commission"),
+    }
+    if not groups:
+        result = rows.aggregate(**totals)
+        result["payment_count"] = result["payment_count"] or 0
+        return [
+            {name: ZERO if value is None else value for name, value in result.items()}
+        ]
+    return list(rows.values(*groups).annotate(**totals).order_by(*groups))
@@ -0,0 +1,111 @@
+"""
+Selection of InstamojoConfiguration per request
+
+Payment requests are created with the configuration returned by
+CONFIGURATION_RESOLVER, dotted path of a callable that takes the request
+(None outside of views) and returns an InstamojoConfiguration, or None
+to fall back to the active configuration. So one deployment can serve
+many merchant accounts, each with its own configuration.
+
+Resolved configurations are cached in-process for
+CONFIGURATION_CACHE_TTL seconds and each configuration has its own
+pooled client, so routing a request needs neither a query nor a new
+client. Available resolvers:
+
+* ``active_configuration`` (default): Always the active configuration.
+* ``owner_configuration``: Configuration created by the current user.
+* ``header_configuration``: Configuration whose ID is sent in
+  CONFIGURATION_HEADER. The header must be set by a trusted proxy, not by
+  clients.
+
+Examples
+--------
+>>> def tenant_configuration(request):
+>>>     return get_configuration(
+>>>         "tenant:{}".format(request.tenant.pk),
+>>>         lambda: request.tenant.instamojo_configuration,
+>>>     )
+
+>>> INSTAMOJO = {"CONFIGURATION_RESOLVER": "myapp.routing.tenant_configuration"}
+"""
+from .cache import get_configuration
+from .settings import get_setting
+
+
+def active_configuration(request):
+    """Leaves it to the active configuration"""
+    return None
+
+
+def owner_configuration(request):
+    """
+    Returns configuration created by current user, if any. If user has
+    many, the active or else the latest updated one is used.
+    """
+    from .models import InstamojoConfiguration
+
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    return get_configuration(
+        "owner:{pk}".format(pk=user.pk),
+        lambda: InstamojoConfiguration.objects.filter(created_by_id=user.pk)
+        .order_by("-is_active", "-update_date")
+        .first(),
+    )
+
+
+def header_configuration(request):
+    """
+    Returns configuration whose ID is sent in CONFIGURATION_HEADER, if
+    the header is sent
+
+    Raises
+    ------
+    ValidationError: if no configuration has the ID
+    """
+    from django.utils.text import gettext_lazy as _
+    from rest_framework.exceptions import ValidationError
+
+    from .models import InstamojoConfiguration
+
+    value = (
+        request.headers.get(get_setting("CONFIGURATION_HEADER")) if request else None
+    )
+    if not value:
+        return None
+    configuration = get_configuration(
+        "pk:{value}".format(value=value),
+        lambda: InstamojoConfiguration.objects.filter(pk=value).first()
+        if value.isdigit()
+        else None,
+    )
+    if configuration is None:
+        raise ValidationError(_("Unknown Instamojo configuration."))
+    return configuration
+
+
+def resolve_configuration(request=None):
+    """
+    Returns configuration to be used for request, as per
+    CONFIGURATION_RESOLVER
+
+    Parameters
+    ----------
+    request: rest_framework.request.Request, optional
+
+    Returns
+    -------
+    InstamojoConfiguration
+
+    Raises
+    ------
+    InstamojoConfiguration.DoesNotExist: if resolver returns None and no
+    configuration is active
+    """
+    from django.utils.module_loading import import_string
+
+    from .cache import get_active_configuration
+
+    resolver = import_string(get_setting("CONFIGURATION_RESOLVER"))
+    return resolver(request) or get_active_configuration()
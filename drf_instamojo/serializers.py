@@ -6,8 +6,6 @@ from other apps in Django. Check Examples for reference.
 
 Author: Himanshu Shankar (https://himanshus.com)
 """
-import json
-
 from django.utils.text import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import APIException
@@ -92,7 +90,8 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         """
-        Attach configuration with attribute
+        Attach configuration of request, as per CONFIGURATION_RESOLVER,
+        with attribute
         Parameters
         ----------
         attrs: dict
@@ -105,9 +104,10 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
         """
 
         from .models import InstamojoConfiguration
+        from .routing import resolve_configuration
 
         try:
-            ic = InstamojoConfiguration.objects.get(is_active=True)
+            ic = resolve_configuration(self.context.get("request"))
         except InstamojoConfiguration.DoesNotExist:
             raise APIException(_("No default configuration present in the " "system."))
         attrs["configuration"] = ic
@@ -128,9 +128,62 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
 
         Author: Himanshu Shankar (https://himanshus.com)
         """
-        from instamojo_wrapper import Instamojo
-
         from django.db.utils import IntegrityError
+
+        from .client import get_client
+        from .models import RawResponse
+        from .variables import CREATE
+
+        ic, created_by, validated_data = self.split_validated_data(validated_data)
+
+        # Get pooled instamojo wrapper
+        imojo = get_client(ic)
+
+        # Try to create a payment request with processed validated_data
+        try:
+            response = imojo.payment_request_create(**validated_data)
+        except ConnectionError as err:
+            raise APIException(
+                _(
+                    "Server error occurred while creating "
+                    "payment request with Instamojo: {err}".format(err=str(err))
+                )
+            )
+
+        data = self.get_instance_data(response, ic, created_by)
+
+        # Call super function to save data
+        try:
+            instance = super(PaymentRequestSerializer, self).create(validated_data=data)
+
+        # Saving may throw error related to created_by, handle it and
+        # throw APIException as this needs to handled at coding level
+        # while calling .save()
+        except IntegrityError as err:
+            raise APIException(_("Server error: {}".format(str(err))))
+
+        # Archive original response
+        RawResponse.build(response, source=CREATE, payment_request=instance).save()
+        return instance
+
+    @staticmethod
+    def split_validated_data(validated_data):
+        """
+        Separates configuration and creator from the data that is to be
+        sent to Instamojo.
+
+        Parameters
+        ----------
+        validated_data: OrderedDict
+
+        Returns
+        -------
+        tuple: (configuration, created_by, validated_data)
+
+        Raises
+        ------
+        serializers.ValidationError: if created_by_id is not a valid user
+        """
         from django.contrib.auth import get_user_model
 
         # Extract configuration (Also, it's not required by
@@ -155,22 +208,29 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     _(f"User with ID: {id} does " "not exists.")
                 )
+        return ic, created_by, validated_data
 
-        # Initialize instamojo wrapper
-        imojo = Instamojo(
-            api_key=ic.api_key, auth_token=ic.auth_token, endpoint=ic.base_url
-        )
+    @staticmethod
+    def get_instance_data(response, ic, created_by):
+        """
+        Prepares data to be saved from Instamojo's response
 
-        # Try to create a payment request with processed validated_data
-        try:
-            response = imojo.payment_request_create(**validated_data)
-        except ConnectionError as err:
-            raise APIException(
-                _(
-                    "Server error occurred while creating "
-                    "payment request with Instamojo: {err}".format(err=str(err))
-                )
-            )
+        Parameters
+        ----------
+        response: dict
+            Response of payment_request_create
+        ic: InstamojoConfiguration
+        created_by: User instance or None
+
+        Returns
+        -------
+        dict
+
+        Raises
+        ------
+        APIException: if Instamojo couldn't create the payment request
+        """
+        from .mappers import PAYMENT_REQUEST
 
         if not response["success"]:
             raise APIException(
@@ -182,26 +242,14 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
                 )
             )
 
-        # Make a copy of successful payment_request
-        data = response["payment_request"].copy()
+        # Map successful payment_request to model fields
+        data = PAYMENT_REQUEST.map(response["payment_request"]).values
 
         # Set created_by and configuration again
         if created_by:
             data["created_by"] = created_by
         data["configuration"] = ic
-
-        # Create json dump of original response
-        data["instamojo_raw_response"] = json.dumps(response)
-
-        # Call super function to save data
-        try:
-            return super(PaymentRequestSerializer, self).create(validated_data=data)
-
-        # Saving may throw error related to created_by, handle it and
-        # throw APIException as this needs to handled at coding level
-        # while calling .save()
-        except IntegrityError as err:
-            raise APIException(_("Server error: {}".format(str(err))))
+        return data
 
     class Meta:
         """Passing model metadata"""
@@ -226,7 +274,6 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
             "sms_status",
             "shorturl",
             "status",
-            "instamojo_raw_response",
             "longurl",
             "is_enabled",
         )
@@ -236,7 +283,6 @@ class PaymentRequestSerializer(serializers.ModelSerializer):
             "sms_status",
             "shorturl",
             "status",
-            "instamojo_raw_response",
             "longurl",
             "is_enabled",
         )
@@ -253,16 +299,6 @@ class PaymentSerializer(serializers.ModelSerializer):
     Example
     -------
     >>> from drf_instamojo.serializers import PaymentSerializer
-    >>> from drf_instamojo.models import InstamojoConfiguration
-
-    >>> from instamojo_wrapper import Instamojo
-
-    Get the active Instamojo Configuration
-    >>> ic = InstamojoConfiguration.objects.get(is_active=True)
-
-    Create an Instamojo object (from instamojo_wrapper)
-    >>> imojo = Instamojo(api_key=ic.api_key, auth_token=ic.auth_token,
-    >>>                   endpoint=ic.base_url)
 
     Initialize serializer with proper data
     >>> ps = PaymentSerializer(data={'id': 'PAYMENT_ID',
@@ -292,23 +328,16 @@ class PaymentSerializer(serializers.ModelSerializer):
         Author: Himanshu Shankar (https://himanshus.com)
         """
 
-        from instamojo_wrapper import Instamojo
-
+        from .cache import get_payment_status
         from .models import PaymentRequest, InstamojoConfiguration
 
         # Initialize required variables
         pr: PaymentRequest = attrs.get("payment_request")
         ic: InstamojoConfiguration = pr.configuration
 
-        imojo = Instamojo(
-            api_key=ic.api_key, auth_token=ic.auth_token, endpoint=ic.base_url
-        )
-
-        # Try to fetch payment status
+        # Try to fetch payment status, cached for repeated lookups
         try:
-            response = imojo.payment_request_payment_status(
-                id=pr.id, payment_id=attrs.get("id")
-            )
+            response = get_payment_status(ic, pr.id, attrs.get("id"))
         except ConnectionError as err:
             err = str(err)
             raise APIException(
@@ -317,49 +346,77 @@ class PaymentSerializer(serializers.ModelSerializer):
                     f"payment status from Instamojo: {err}"
                 )
             )
-        if not response["success"]:
-            # Instamojo server returned with False success flag.
-            raise serializers.ValidationError(_("Could not validate payment!"))
+        return self.get_payment_data(response, pr)
 
-        # Initialize data with payment information
-        data = response["payment_request"]["payment"].copy()
+    def get_payment_data(self, response, pr):
+        """
+        Prepares payment data as per model from Instamojo's response
 
-        # Set variables as per model
-        data["id"] = data.pop("payment_id")
-        data["instamojo_raw_response"] = json.dumps(response)
-        data["payment_request"] = pr
+        Parameters
+        ----------
+        response: dict
+            Response of payment_request_payment_status
+        pr: PaymentRequest
 
-        # Extract and set failure variables as per model
-        if "failure" in data and data.get("failure"):
-            data["failure_reason"] = data.get("failure").get("reason")
-            data["failure_message"] = data.get("failure").get("message")
+        Returns
+        -------
+        data: dict
 
-        # Convert possible non-str data to str as per model fields
-        non_str_fields = ("payment_request",)
+        Raises
+        ------
+        serializers.ValidationError: if Instamojo couldn't validate payment
+        """
+        from .mappers import PAYMENT
 
-        for k, v in data.copy().items():
+        if not response["success"]:
+            # Instamojo server returned with False success flag.
+            raise serializers.ValidationError(_("Could not validate payment!"))
 
-            # If key is not in fields, delete it
-            if k not in self.Meta.fields:
-                del data[k]
+        # Map payment to model fields, converting amounts and timestamps
+        data = PAYMENT.map(response["payment_request"]["payment"]).values
+        data["payment_request"] = pr
 
-            # If key is not a non-string field and is not None and is
-            # not an instance of string, convert it to string
-            elif k not in non_str_fields and v and not isinstance(v, str):
-                data[k] = str(v)
+        # Original response is archived on save
+        data["raw_response"] = response
 
         # Return data
         return data
 
+    def create(self, validated_data):
+        """
+        Save payment and archive Instamojo's response
+
+        Parameters
+        ----------
+        validated_data: dict
+
+        Returns
+        -------
+        instance
+        """
+        from .models import RawResponse
+        from .variables import STATUS
+
+        response = validated_data.pop("raw_response", None)
+        instance = super(PaymentSerializer, self).create(validated_data)
+        if response is not None:
+            RawResponse.build(
+                response,
+                source=STATUS,
+                payment_request=instance.payment_request,
+                payment=instance,
+            ).save()
+        return instance
+
     class Meta:
         """Passing model metadata"""
 
         from .models import Payment
+        from .models import PaymentRequest
 
         model = Payment
         fields = (
             "id",
-            "instamojo_raw_response",
             "payment_request",
             "mac",
             "status",
@@ -386,7 +443,6 @@ class PaymentSerializer(serializers.ModelSerializer):
             "webhook_verified",
         )
         read_only_fields = (
-            "instamojo_raw_response",
             "status",
             "fees",
             "currency",
@@ -411,3 +467,86 @@ class PaymentSerializer(serializers.ModelSerializer):
             "billing_instrument",
             "failure_message",
         )
+        extra_kwargs = {
+            # Configuration is needed while validating payment
+            "payment_request": {
+                "queryset": PaymentRequest.objects.select_related("configuration")
+            }
+        }
+
+
+class RawResponseSerializer(serializers.ModelSerializer):
+    """
+    Serializer for archived raw responses
+    """
+
+    response = serializers.JSONField(read_only=True)
+
+    class Meta:
+        """Passing model metadata"""
+
+        from .models import RawResponse
+
+        model = RawResponse
+        fields = ("id", "source", "payment", "response", "create_date")
+        read_only_fields = fields
+
+
+class PaymentRequestDetailSerializer(PaymentRequestSerializer):
+    """
+    Payment Request Serializer along with archived raw responses. Use
+    for retrieving a single payment request.
+    """
+
+    raw_responses = RawResponseSerializer(many=True, read_only=True)
+
+    class Meta(PaymentRequestSerializer.Meta):
+        """Passing model metadata"""
+
+        fields = PaymentRequestSerializer.Meta.fields + ("raw_responses",)
+        read_only_fields = fields
+
+
+class PaymentDetailSerializer(PaymentSerializer):
+    """
+    Payment Serializer along with archived raw responses. Use for
+    retrieving a single payment.
+    """
+
+    raw_responses = RawResponseSerializer(many=True, read_only=True)
+
+    class Meta(PaymentSerializer.Meta):
+        """Passing model metadata"""
+
+        fields = PaymentSerializer.Meta.fields + ("raw_responses",)
+        read_only_fields = fields
+        extra_kwargs = {}
+
+
+class PaymentReportQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of payment reports. Repeat status and group_by to
+    pass many, e.g. ?group_by=month&group_by=status
+    """
+
+    from .variables import PAYMENT_STATUS_CHOICES
+    from .variables import REPORT_GROUP_CHOICES
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.MultipleChoiceField(
+        choices=PAYMENT_STATUS_CHOICES, required=False
+    )
+    instrument_type = serializers.CharField(
+        required=False, allow_blank=True, max_length=64
+    )
+    group_by = serializers.MultipleChoiceField(
+        choices=REPORT_GROUP_CHOICES, required=False
+    )
+
+    def validate(self, attrs):
+        """Checks that start is not after end"""
+        start, end = attrs.get("start"), attrs.get("end")
+        if start and end and start > end:
+            raise serializers.ValidationError(_("start can not be after end."))
+        return attrs
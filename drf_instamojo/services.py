@@ -0,0 +1,316 @@
+"""
+Services to create payment requests and record payments
+
+These can be used from other apps, as an alternative to calling
+.save() on serializers.
+"""
+import logging
+
+from django.utils.text import gettext_lazy as _
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+async def acreate_payment_request(serializer, **kwargs):
+    """
+    Async counterpart of PaymentRequestSerializer.save(). Calls
+    Instamojo without blocking the event loop.
+
+    Parameters
+    ----------
+    serializer: PaymentRequestSerializer
+        Serializer on which is_valid() has already been called
+    kwargs: created_by or created_by_id
+
+    Returns
+    -------
+    PaymentRequest
+
+    Examples
+    --------
+    >>> prs = PaymentRequestSerializer(data=data)
+    >>> await sync_to_async(prs.is_valid)(raise_exception=True)
+    >>> instance = await acreate_payment_request(prs, created_by=user)
+    """
+    from asgiref.sync import sync_to_async
+    from django.db.utils import IntegrityError
+
+    from .async_client import get_async_client
+    from .models import PaymentRequest
+    from .models import RawResponse
+    from .variables import CREATE
+
+    validated_data = {**serializer.validated_data, **kwargs}
+    ic, created_by, validated_data = await sync_to_async(
+        serializer.split_validated_data
+    )(validated_data)
+
+    imojo = get_async_client(ic)
+    try:
+        response = await imojo.payment_request_create(**validated_data)
+    except ConnectionError as err:
+        raise APIException(
+            _(
+                "Server error occurred while creating "
+                "payment request with Instamojo: {err}".format(err=str(err))
+            )
+        )
+
+    data = serializer.get_instance_data(response, ic, created_by)
+    try:
+        instance = await PaymentRequest.objects.acreate(**data)
+    except IntegrityError as err:
+        raise APIException(_("Server error: {}".format(str(err))))
+    await RawResponse.build(response, source=CREATE, payment_request=instance).asave()
+
+    serializer.instance = instance
+    return instance
+
+
+async def acreate_payment(serializer):
+    """
+    Async counterpart of PaymentSerializer.is_valid() and .save().
+    Validates payment with Instamojo without blocking the event loop.
+
+    Parameters
+    ----------
+    serializer: PaymentSerializer
+        Serializer initialized with data
+
+    Returns
+    -------
+    Payment
+
+    Raises
+    ------
+    serializers.ValidationError: if data or payment is not valid
+    """
+    from asgiref.sync import sync_to_async
+
+    from .cache import aget_payment_status
+    from .models import Payment
+    from .models import RawResponse
+    from .variables import STATUS
+
+    # Validate fields only, serializer's validate() is sync
+    attrs = await sync_to_async(serializer.to_internal_value)(serializer.initial_data)
+
+    pr = attrs.get("payment_request")
+    ic = await sync_to_async(lambda: pr.configuration)()
+
+    try:
+        response = await aget_payment_status(ic, pr.id, attrs.get("id"))
+    except ConnectionError as err:
+        raise APIException(
+            _(
+                "Server error occurred while getting "
+                "payment status from Instamojo: {err}".format(err=str(err))
+            )
+        )
+
+    data = serializer.get_payment_data(response, pr)
+    data.pop("raw_response")
+    instance = await Payment.objects.acreate(**data)
+    await RawResponse.build(
+        response, source=STATUS, payment_request=pr, payment=instance
+    ).asave()
+    serializer.instance = instance
+    return instance
+
+
+def bulk_create_payment_requests(
+    items: list, created_by, concurrency: int = None, request=None
+):
+    """
+    Creates many payment requests at once. Items are validated together,
+    created with Instamojo concurrently and saved as they are created, a
+    batch of up to concurrency payment requests per query.
+
+    If a batch can't be saved, its payment requests are saved one by one,
+    and those that still fail are logged with their Instamojo ID, for
+    sync_instamojo to recover them.
+
+    Parameters
+    ----------
+    items: list
+        List of dicts, each as accepted by PaymentRequestSerializer
+    created_by: User instance
+        Owner of all the payment requests
+    concurrency: int, optional
+        Maximum concurrent calls to Instamojo. Defaults to
+        BULK_CONCURRENCY setting.
+    request: rest_framework.request.Request, optional
+        Request for which configuration is resolved, see
+        drf_instamojo.routing
+
+    Returns
+    -------
+    list: Result for each item, in same order as items. Each result is
+    either {"success": True, "payment_request": data} or
+    {"success": False, "errors": {field: [message, ...]}}, where errors
+    that aren't of a field, e.g. of Instamojo, are under
+    "non_field_errors"
+
+    Raises
+    ------
+    Exception: unexpected error of any item, once the others are saved
+
+    Examples
+    --------
+    >>> from drf_instamojo.services import bulk_create_payment_requests
+    >>> results = bulk_create_payment_requests(
+    >>>     [{'amount': 120.00, 'purpose': 'Invoice #1',
+    >>>       'redirect_url': 'http://127.0.0.1/api/test/'}], created_by=user)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+
+    from rest_framework.exceptions import ValidationError
+
+    from .serializers import PaymentRequestSerializer
+    from .settings import get_setting
+
+    results = [None] * len(items)
+    prepared = {}
+
+    for index, item in enumerate(items):
+        serializer = PaymentRequestSerializer(data=item, context={"request": request})
+        try:
+            serializer.is_valid(raise_exception=True)
+            # Split here, as workers don't use the database
+            prepared[index] = serializer.split_validated_data(
+                {**serializer.validated_data, "created_by": created_by}
+            )
+        except (ValidationError, APIException) as err:
+            results[index] = {"success": False, "errors": _errors(err.detail)}
+
+    concurrency = concurrency or get_setting("BULK_CONCURRENCY")
+    created = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(_create_payment_request, *prepared[index]): index
+            for index in prepared
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                created[index] = future.result()
+            except (ValidationError, APIException) as err:
+                results[index] = {"success": False, "errors": _errors(err.detail)}
+            except Exception as err:
+                # Raised once payment requests already created are saved
+                error = error or err
+            if len(created) >= concurrency:
+                _save_payment_requests(created, results)
+                created = {}
+        _save_payment_requests(created, results)
+
+    if error is not None:
+        raise error
+    return results
+
+
+def _errors(detail) -> dict:
+    """
+    Returns detail of an exception as {field: [message, ...]}, i.e. as
+    serializers report errors, with other messages as non field errors
+    """
+    from rest_framework.settings import api_settings
+
+    if isinstance(detail, dict):
+        return detail
+    if not isinstance(detail, list):
+        detail = [detail]
+    return {api_settings.NON_FIELD_ERRORS_KEY: detail}
+
+
+def _create_payment_request(ic, created_by, data: dict):
+    """
+    Creates a payment request with Instamojo, in a worker thread of
+    bulk_create_payment_requests
+
+    Returns
+    -------
+    tuple: (PaymentRequest, response), PaymentRequest is unsaved
+    """
+    from django.db import close_old_connections
+
+    from .client import get_client
+    from .models import PaymentRequest
+    from .serializers import PaymentRequestSerializer
+
+    try:
+        response = get_client(ic).payment_request_create(**data)
+    except ConnectionError as err:
+        raise APIException(
+            _(
+                "Server error occurred while creating "
+                "payment request with Instamojo: {err}".format(err=str(err))
+            )
+        )
+    finally:
+        close_old_connections()
+
+    data = PaymentRequestSerializer.get_instance_data(response, ic, created_by)
+    return PaymentRequest(**data), response
+
+
+def _save_payment_requests(created: dict, results: list):
+    """
+    Saves payment requests created with Instamojo along with their
+    responses, in a single query, or one by one if that fails
+
+    Parameters
+    ----------
+    created: dict
+        (PaymentRequest, response) by index of item
+    results: list
+        Results of items, set for the saved ones
+    """
+    from django.db import DatabaseError
+    from django.db import transaction
+
+    from .models import PaymentRequest
+    from .models import RawResponse
+    from .serializers import PaymentRequestSerializer
+    from .variables import CREATE
+
+    def save(batch):
+        with transaction.atomic():
+            PaymentRequest.objects.bulk_create([pr for pr, _response in batch.values()])
+            RawResponse.objects.bulk_create(
+                [
+                    RawResponse.build(response, source=CREATE, payment_request=pr)
+                    for pr, response in batch.values()
+                ]
+            )
+        for index, (instance, _response) in batch.items():
+            results[index] = {
+                "success": True,
+                "payment_request": PaymentRequestSerializer(instance).data,
+            }
+
+    if not created:
+        return
+    try:
+        save(created)
+        return
+    except DatabaseError:
+        # Save the others
+        pass
+
+    for index, item in created.items():
+        try:
+            save({index: item})
+        except DatabaseError:
+            logger.exception(
+                "Payment request %s, created with Instamojo, couldn't be saved.",
+                item[0].id,
+            )
+            message = _(
+                "Payment request {id} was created with Instamojo but "
+                "couldn't be saved."
+            ).format(id=item[0].id)
+            results[index] = {"success": False, "errors": _errors(message)}
@@ -0,0 +1,145 @@
+"""
+Settings for drf_instamojo
+
+All the settings can be overridden via ``INSTAMOJO`` dict in project's
+settings.py, e.g.
+
+>>> INSTAMOJO = {"POOL_MAXSIZE": 20, "TIMEOUT": (3.05, 15)}
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # Number of host pools to keep per client
+    "POOL_CONNECTIONS": 1,
+    # Maximum number of keep-alive connections kept per host pool
+    "POOL_MAXSIZE": 10,
+    # Whether to block (instead of opening a throwaway connection) when
+    # all connections in pool are in use
+    "POOL_BLOCK": False,
+    # (connect timeout, read timeout) in seconds
+    "TIMEOUT": (3.05, 10),
+    # Retries for failed connections and retryable status codes. Only
+    # idempotent requests (GET, HEAD etc.) are retried.
+    "MAX_RETRIES": 2,
+    "BACKOFF_FACTOR": 0.3,
+    "RETRY_STATUS_CODES": (502, 503, 504),
+    # Maximum concurrent connections per async client
+    "ASYNC_MAX_CONNECTIONS": 100,
+    # Seconds for which active configuration is cached in-process
+    "CONFIGURATION_CACHE_TTL": 300,
+    # Alias of Django cache to share active configuration across
+    # processes. None disables the shared cache.
+    "CONFIGURATION_CACHE": None,
+    # Dotted path of callable that selects configuration of a request,
+    # see drf_instamojo.routing, and header used by header_configuration
+    "CONFIGURATION_RESOLVER": "drf_instamojo.routing.active_configuration",
+    "CONFIGURATION_HEADER": "X-Instamojo-Configuration",
+    # Maximum configurations resolved per request cached in-process
+    "CONFIGURATION_CACHE_SIZE": 10000,
+    # Aliases of read replicas used by list views, admin and reporting,
+    # see drf_instamojo.replicas. Users read from the primary for
+    # READ_STICKY_SECONDS after they write, tracked in-process and in
+    # Django cache READ_STICKY_CACHE, if set.
+    "READ_DATABASES": (),
+    "READ_STICKY_SECONDS": 5,
+    "READ_STICKY_CACHE": None,
+    # Seconds for which non-terminal and unsuccessful payment status
+    # lookups are cached, terminal (Credit / Failed) ones are cached for
+    # ever. Size is the maximum lookups cached in-process, 0 disables it.
+    # Alias of Django cache to share them across processes, if any.
+    "PAYMENT_STATUS_CACHE_TTL": 5,
+    "PAYMENT_STATUS_NEGATIVE_TTL": 2,
+    "PAYMENT_STATUS_CACHE_SIZE": 10000,
+    "PAYMENT_STATUS_CACHE": None,
+    # Dotted path of backend that runs reconciliation jobs
+    "RECONCILIATION_BACKEND": "drf_instamojo.queue.ThreadPoolBackend",
+    # Number of threads used by ThreadPoolBackend
+    "RECONCILIATION_WORKERS": 4,
+    # Seconds a job claimed by DatabaseBackend is left to its worker
+    "RECONCILIATION_CLAIM_TIMEOUT": 300,
+    # Seconds, times attempts so far, before a failed job is retried
+    "RECONCILIATION_RETRY_DELAY": 60,
+    # Maximum concurrent Instamojo calls while creating payment requests
+    # in bulk. Keep POOL_MAXSIZE at least this much.
+    "BULK_CONCURRENCY": 10,
+    # Maximum payment requests accepted in a bulk request
+    "BULK_MAX_ITEMS": 1000,
+    # How raw responses are archived: "text", "compressed" (zlib) or
+    # "json" (JSONField)
+    "RAW_RESPONSE_STORAGE": "text",
+    # Default and maximum page size of list views
+    "PAGE_SIZE": 50,
+    "MAX_PAGE_SIZE": 500,
+    # Whether daily rollups of payments are maintained, see
+    # drf_instamojo.rollups
+    "PAYMENT_ROLLUPS": True,
+    # Rows fetched per query while exporting or rebuilding rollups
+    "EXPORT_CHUNK_SIZE": 2000,
+    # payment_done outbox rows claimed at a time
+    "OUTBOX_BATCH_SIZE": 100,
+    # Seconds a claimed outbox row is left to its dispatcher, and after
+    # which a failed one is retried (multiplied by attempts so far)
+    "OUTBOX_CLAIM_TIMEOUT": 300,
+    "OUTBOX_RETRY_DELAY": 60,
+    # Attempts after which an outbox row is no longer retried
+    "OUTBOX_MAX_ATTEMPTS": 10,
+    # Records fetched per page while syncing with Instamojo
+    "SYNC_BATCH_SIZE": 100,
+    # Seconds for which response of an Idempotency-Key is replayed
+    "IDEMPOTENCY_KEY_TTL": 24 * 60 * 60,
+    # Calls per second to Instamojo per configuration, None for no limit
+    "RATE_LIMIT": None,
+    "RATE_LIMIT_BURST": 10,
+    "RATE_LIMIT_TIMEOUT": 1,
+    "RATE_LIMIT_CACHE": None,
+    # Circuit breaker of calls to Instamojo
+    "CIRCUIT_BREAKER": True,
+    "CIRCUIT_FAILURE_RATE": 0.5,
+    "CIRCUIT_MIN_CALLS": 20,
+    "CIRCUIT_WINDOW": 60,
+    "CIRCUIT_SLOW_CALL": 5,
+    "CIRCUIT_RESET_TIMEOUT": 30,
+    # Metrics backend and buckets (seconds) of latency histograms
+    "METRICS_BACKEND": "drf_instamojo.metrics.NullMetrics",
+    "METRICS_BUCKETS": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    # Bearer token that allows access to MetricsView, besides staff users
+    "METRICS_TOKEN": None,
+    # Dotted paths of client classes, set these to
+    # drf_instamojo.fake.FakeInstamojo and AsyncFakeInstamojo to run
+    # without Instamojo
+    "CLIENT_CLASS": "drf_instamojo.client.PooledInstamojo",
+    "ASYNC_CLIENT_CLASS": "drf_instamojo.async_client.AsyncInstamojo",
+    # Behaviour of fake clients: seconds each call takes, fraction of
+    # calls that fail with 503 and seconds after creation at which a
+    # payment request is paid (None to pay only via FakeStore.pay())
+    "FAKE_LATENCY": 0,
+    "FAKE_FAILURE_RATE": 0,
+    "FAKE_AUTO_PAY": None,
+    # Sweeping of stale pending payment requests
+    "SWEEP_STALE_AFTER": 900,
+    "SWEEP_MAX_AGE": 7 * 24 * 60 * 60,
+    "SWEEP_BATCH_SIZE": 500,
+    "SWEEP_CONCURRENCY": 10,
+    "SWEEP_RATE": 20,
+    "SWEEP_TIME_BUDGET": 300,
+}
+
+
+def get_setting(name: str):
+    """
+    Returns value of a drf_instamojo setting
+
+    Parameters
+    ----------
+    name: str
+        Key of the setting, as defined in DEFAULTS
+
+    Returns
+    -------
+    Value from INSTAMOJO dict in project's settings, if present,
+    otherwise the default value.
+    """
+    user_settings = getattr(settings, "INSTAMOJO", {})
+    if name in user_settings:
+        return user_settings[name]
+    return DEFAULTS[name]
@@ -4,4 +4,10 @@ Django Signals
 import django.dispatch
 
 
-payment_done = django.dispatch.Signal(providing_args=["instance"])
+# Sent with PaymentRequest instance when payment request is completed.
+# Arguments: instance
+payment_done = django.dispatch.Signal()
+
+# Sent once with all the payments recorded during reconciliation.
+# Arguments: instances
+payments_recorded = django.dispatch.Signal()
@@ -1,72 +1,66 @@
 """
 Handlers for Django Signals
 """
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from drf_instamojo.models import InstamojoConfiguration
 from drf_instamojo.models import Payment
 from drf_instamojo.models import PaymentRequest
-from drf_instamojo.signals import payment_done
 
 
 @receiver(signal=post_save, sender=Payment)
 def payment_record_handler(instance: Payment, sender, **kwargs):
     """
-    Each time a payment record is saved, signal will check and update
-    other payment records and payment request.
+    Each time a payment record is saved, queues reconciliation of its
+    payment request which will check and update other payment records
+    and payment request.
     :param instance: Instance that is being saved
     :param sender: Payment model
     :param kwargs: other parameters
     :return: None
     """
-    from drf_instamojo.serializers import PaymentSerializer
-
-    from instamojo_wrapper import Instamojo
-
-    pr: PaymentRequest = instance.payment_request
-
-    imojo = Instamojo(
-        api_key=pr.configuration.api_key,
-        auth_token=pr.configuration.auth_token,
-        endpoint=pr.configuration.base_url,
-    )
-
-    pr_status = imojo.payment_request_status(id=pr.id)
-
-    # Check if payment status request is successful
-    if pr_status.get("success"):
-        payment_request_imojo = pr_status.get("payment_request")
-
-        # Hacky way to fix TypeError here.
-        # As instamojo is sending modified_at as str here
-        # We'll use strftime() to format PaymentRequest's modified_at to str
-        if payment_request_imojo.get("modified_at") > (
-            pr.modified_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        ):
-            # Update payment request
-            pr.status = payment_request_imojo.get("status")
-            pr.modified_at = payment_request_imojo.get("modified_at")
-            pr.sms_status = payment_request_imojo.get("sms_status")
-            pr.email_status = payment_request_imojo.get("email_status")
-            pr.save()
-
-        # Save other payment details, if not already saved.
-        # This may trigger more signals.
-        # TODO: Check if there is any better way to do this.
-        for payment in payment_request_imojo.get("payments"):
-            id = payment.get("payment_id")
-            try:
-                Payment.objects.get(id=payment.get("payment_id"))
-            except Payment.DoesNotExist:
-                ps = PaymentSerializer(data={"id": id, "payment_request": pr.id})
-                ps.is_valid(raise_exception=True)
-                ps.save()
+    from drf_instamojo.metrics import handler_timer
+    from drf_instamojo.reconciliation import enqueue_reconciliation
+
+    with handler_timer("payment_record_handler"):
+        enqueue_reconciliation(instance.payment_request_id, using=kwargs.get("using"))
+
+
+@receiver(signal=post_save, sender=Payment)
+@receiver(signal=post_delete, sender=Payment)
+def payment_rollup_handler(instance: Payment, sender, **kwargs):
+    """
+    Updates daily rollups of payments with the change made to a payment,
+    in the same transaction.
+    :param instance: Payment instance
+    :param sender: Payment
+    :param kwargs: Other params
+    :return: None
+    """
+    from drf_instamojo.metrics import handler_timer
+    from drf_instamojo.rollups import apply_rollups
+    from drf_instamojo.rollups import record_saved_payment
+    from drf_instamojo.rollups import rollup_values
+
+    with handler_timer("payment_rollup_handler"):
+        if kwargs["signal"] is post_delete:
+            apply_rollups(
+                removed=[instance._loaded_rollup or rollup_values(instance)],
+                using=kwargs.get("using"),
+            )
+        else:
+            record_saved_payment(
+                instance, created=kwargs.get("created"), using=kwargs.get("using")
+            )
 
 
 @receiver(signal=post_save, sender=PaymentRequest)
 def payment_completed_handler(instance: PaymentRequest, sender, **kwargs):
     """
-    Checks if payment is completed and triggers payment_done signal.
+    Checks if payment request has just been completed and queues
+    payment_done signal via outbox, to be sent once after commit.
     :param instance: PaymentRequest instance
     :param sender: PaymentRequest
     :param kwargs: Other params
@@ -75,7 +69,59 @@ def payment_completed_handler(instance: PaymentRequest, sender, **kwargs):
     Author: Himanshu Shankar (https://himanshus.com)
     """
 
+    from drf_instamojo.metrics import handler_timer
+    from drf_instamojo.outbox import enqueue_payment_done
     from drf_instamojo.variables import COMPLETED
 
-    if instance.status == COMPLETED:
-        payment_done.send(sender=sender, instance=instance)
+    with handler_timer("payment_completed_handler"):
+        previous = instance._loaded_status
+        instance._loaded_status = instance.status
+        if instance.status == COMPLETED and previous != COMPLETED:
+            enqueue_payment_done([instance], using=kwargs.get("using"))
+
+
+@receiver(signal=post_save, sender=PaymentRequest)
+@receiver(signal=post_save, sender=Payment)
+def read_sticky_handler(instance, sender, **kwargs):
+    """
+    Makes creator of a saved payment request (or its payment) read from
+    the primary database for a while, so that replication lag doesn't
+    hide the change from them.
+    :param instance: PaymentRequest or Payment instance
+    :param sender: PaymentRequest or Payment
+    :param kwargs: Other params
+    :return: None
+    """
+    from drf_instamojo.replicas import mark_write
+    from drf_instamojo.replicas import replicas_enabled
+
+    if not replicas_enabled():
+        return
+    if sender is Payment:
+        # Creator is known only if payment request is already loaded
+        if not sender._meta.get_field("payment_request").is_cached(instance):
+            return
+        instance = instance.payment_request
+    mark_write(instance.created_by_id)
+
+
+@receiver(signal=post_save, sender=InstamojoConfiguration)
+@receiver(signal=post_delete, sender=InstamojoConfiguration)
+def configuration_changed_handler(instance: InstamojoConfiguration, sender, **kwargs):
+    """
+    Drops pooled client of a configuration and cached active
+    configuration whenever a configuration is changed or deleted.
+    :param instance: InstamojoConfiguration instance
+    :param sender: InstamojoConfiguration
+    :param kwargs: Other params
+    :return: None
+    """
+    from drf_instamojo.async_client import invalidate_async_client
+    from drf_instamojo.cache import invalidate_active_configuration
+    from drf_instamojo.client import invalidate_client
+    from drf_instamojo.metrics import handler_timer
+
+    with handler_timer("configuration_changed_handler"):
+        invalidate_client(instance)
+        invalidate_async_client(instance)
+        invalidate_active_configuration()
@@ -0,0 +1,157 @@
+"""
+Sweeping of stale pending payment requests
+
+A payment request is reconciled only when one of its payments is saved,
+so requests that are paid without the redirect (or webhook) reaching us
+stay pending. ``sweep_pending`` polls Instamojo for payment requests
+that have been pending for a while, concurrently but within a rate and
+time budget, and applies the changes in bulk. Schedule it, e.g. via
+cron, with ``python manage.py sweep_instamojo_pending``.
+
+Examples
+--------
+>>> from drf_instamojo.sweeper import sweep_pending
+>>> sweep_pending(time_budget=60)
+{'checked': 1500, 'updated': 40, 'completed': 12}
+"""
+import logging
+import time
+
+from .settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_pending(
+    stale_after: int = None,
+    max_age: int = None,
+    batch_size: int = None,
+    concurrency: int = None,
+    rate: float = None,
+    time_budget: float = None,
+):
+    """
+    Polls Instamojo for stale pending payment requests and updates them.
+    Payments of completed payment requests are recorded and payment_done
+    is sent for them.
+
+    Payment requests are picked latest first via the (status,
+    modified_at) index, batch by batch, till there are none left or
+    time_budget runs out. Arguments default to the SWEEP_* settings.
+
+    Parameters
+    ----------
+    stale_after: int, optional
+        Seconds since modified_at after which a pending payment request
+        is polled
+    max_age: int, optional
+        Seconds since modified_at after which a pending payment request
+        is considered abandoned and no longer polled
+    batch_size: int, optional
+        Payment requests polled and updated together
+    concurrency: int, optional
+        Concurrent calls to Instamojo
+    rate: float, optional
+        Maximum calls to Instamojo per second
+    time_budget: float, optional
+        Seconds after which no further payment request is polled
+
+    Returns
+    -------
+    dict: number of payment requests checked, updated and completed
+    """
+    import datetime
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from .client import get_client
+    from .models import PaymentRequest
+    from .outbox import enqueue_payment_done
+    from .reconciliation import apply_payment_request_data
+    from .reconciliation import record_payments
+    from .reconciliation import SYNCED_FIELDS
+    from .throttling import TokenBucket
+    from .variables import COMPLETED
+    from .variables import PENDING
+
+    stale_after = stale_after or get_setting("SWEEP_STALE_AFTER")
+    max_age = max_age or get_setting("SWEEP_MAX_AGE")
+    batch_size = batch_size or get_setting("SWEEP_BATCH_SIZE")
+    concurrency = concurrency or get_setting("SWEEP_CONCURRENCY")
+    rate = rate or get_setting("SWEEP_RATE")
+    time_budget = time_budget or get_setting("SWEEP_TIME_BUDGET")
+
+    deadline = time.monotonic() + time_budget
+    limiter = TokenBucket(rate)
+    now = timezone.now()
+
+    queryset = (
+        PaymentRequest.objects.select_related("configuration")
+        .filter(
+            status=PENDING,
+            modified_at__lt=now - datetime.timedelta(seconds=stale_after),
+            modified_at__gte=now - datetime.timedelta(seconds=max_age),
+        )
+        .order_by("-modified_at", "-id")
+    )
+
+    def fetch(payment_request):
+        """Returns payment request data from Instamojo, None on failure"""
+        if not limiter.acquire(deadline - time.monotonic()):
+            return None
+        try:
+            response = get_client(payment_request.configuration).payment_request_status(
+                id=payment_request.id
+            )
+        except Exception:
+            logger.exception(
+                "Polling of payment request %s failed.", payment_request.id
+            )
+            return None
+        if not response.get("success"):
+            return None
+        return response.get("payment_request")
+
+    result = {"checked": 0, "updated": 0, "completed": 0}
+    last = None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while time.monotonic() < deadline:
+            page = queryset
+            if last:
+                page = queryset.filter(
+                    Q(modified_at__lt=last[0]) | Q(modified_at=last[0], id__lt=last[1])
+                )
+            batch = list(page[:batch_size])
+            if not batch:
+                break
+            last = (batch[-1].modified_at, batch[-1].id)
+
+            changed = []
+            completed = []
+            for payment_request, data in zip(batch, executor.map(fetch, batch)):
+                if data is None:
+                    continue
+                result["checked"] += 1
+                if not apply_payment_request_data(payment_request, data):
+                    continue
+                # bulk_update() doesn't set auto_now fields
+                payment_request.update_date = timezone.now()
+                changed.append(payment_request)
+                if payment_request.status == COMPLETED:
+                    completed.append((payment_request, data))
+
+            with transaction.atomic():
+                PaymentRequest.objects.bulk_update(
+                    changed, fields=SYNCED_FIELDS + ("modified_at", "update_date")
+                )
+                for payment_request, data in completed:
+                    record_payments(payment_request, data.get("payments") or [])
+                enqueue_payment_done([pr for pr, data in completed])
+
+            result["updated"] += len(changed)
+            result["completed"] += len(completed)
+
+    return result
@@ -0,0 +1,453 @@
+"""
+Incremental sync of payment requests and payments from Instamojo
+
+Pages through Instamojo's payment request and payment listings and
+upserts them locally, one page per transaction, so that memory use stays
+bounded irrespective of the number of records. Progress is stored in
+SyncState after each page: an interrupted run resumes from the page it
+stopped at, and the next run only fetches payment requests modified
+since the last completed run.
+
+Examples
+--------
+>>> from drf_instamojo.sync import sync
+>>> sync(created_by=user)
+{'payment_requests': 1200, 'payments': 800}
+"""
+from django.utils.text import gettext_lazy as _
+from rest_framework.exceptions import APIException
+
+# Fields of PaymentRequest and Payment overwritten with listed data
+PAYMENT_REQUEST_UPSERT_FIELDS = (
+    "amount",
+    "purpose",
+    "buyer_name",
+    "email",
+    "phone",
+    "send_email",
+    "send_sms",
+    "email_status",
+    "sms_status",
+    "redirect_url",
+    "webhook",
+    "allow_repeated_payments",
+    "longurl",
+    "shorturl",
+    "expires_at",
+    "status",
+    "customer_id",
+    "created_at",
+    "modified_at",
+    "update_date",
+)
+PAYMENT_UPSERT_FIELDS = (
+    "status",
+    "fees",
+    "affiliate_commission",
+    "currency",
+    "amount",
+    "buyer_name",
+    "buyer_email",
+    "buyer_phone",
+    "shipping_address",
+    "shipping_city",
+    "shipping_state",
+    "shipping_country",
+    "shipping_zip",
+    "quantity",
+    "unit_price",
+    "instrument_type",
+    "billing_instrument",
+    "tax_invoice_id",
+    "failure_message",
+    "failure_reason",
+    "payout",
+    "created_at",
+)
+
+
+def iter_pages(fetch, key: str, page: int = 1, limit: int = None):
+    """
+    Yields pages of a listing till it is exhausted
+
+    Parameters
+    ----------
+    fetch: callable
+        Listing method of client, called with page and limit
+    key: str
+        Key of items in response, e.g. "payment_requests"
+    page: int
+        Page to start from
+    limit: int, optional
+        Items per page
+
+    Yields
+    ------
+    tuple: (page, items)
+
+    Raises
+    ------
+    APIException: if Instamojo returns an unsuccessful response
+    """
+    while True:
+        response = fetch(page=page, limit=limit)
+        if not response.get("success"):
+            raise APIException(
+                _(
+                    "Error occurred while listing {key} from Instamojo: "
+                    "{message}".format(key=key, message=response.get("message"))
+                )
+            )
+        items = response.get(key) or []
+        if items:
+            yield page, items
+        if not items or (limit and len(items) < limit):
+            return
+        page += 1
+
+
+def payment_request_id_from(value):
+    """
+    Extracts payment request ID from payment_request of a listed payment,
+    which Instamojo sends as URL of the payment request.
+
+    Parameters
+    ----------
+    value: str
+        e.g. "https://www.instamojo.com/api/1.1/payment-requests/ID/"
+
+    Returns
+    -------
+    str or None
+    """
+    if not value:
+        return None
+    return str(value).rstrip("/").rsplit("/", 1)[-1] or None
+
+
+def build_payment_request(configuration, created_by, data: dict):
+    """
+    Builds an unsaved PaymentRequest from a listed payment request
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+    created_by: User instance
+        Owner of payment requests that do not exist locally
+    data: dict
+        Payment request as returned by Instamojo
+
+    Returns
+    -------
+    PaymentRequest
+    """
+    from .mappers import PAYMENT_REQUEST
+    from .models import PaymentRequest
+
+    values = PAYMENT_REQUEST.map(data).values
+    return PaymentRequest(configuration=configuration, created_by=created_by, **values)
+
+
+def upsert_payment_requests(configuration, created_by, items: list):
+    """
+    Inserts new listed payment requests, updates existing ones that were
+    modified since they were stored and queues payment_done, via outbox,
+    for the ones that got completed.
+
+    Instamojo's modified_at is the watermark, as in reconciliation:
+    existing rows are locked and left as they are unless the listed
+    modified_at is later than the stored one, or none is stored, so an
+    older listing never overwrites a newer status.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+    created_by: User instance
+        Owner of payment requests that do not exist locally
+    items: list
+        Payment requests as returned by Instamojo
+
+    Returns
+    -------
+    list: listed PaymentRequest instances, saved or not
+    """
+    from django.utils import timezone
+
+    from .models import PaymentRequest
+    from .outbox import enqueue_payment_done
+    from .variables import COMPLETED
+
+    instances = [build_payment_request(configuration, created_by, i) for i in items]
+    # Status and modified_at of existing rows, locked till they are updated
+    existing = {
+        pk: (status, modified_at)
+        for pk, status, modified_at in PaymentRequest.objects.select_for_update()
+        .filter(id__in=[i.id for i in instances])
+        .values_list("id", "status", "modified_at")
+    }
+
+    new = [i for i in instances if i.id not in existing]
+    modified = [
+        i
+        for i in instances
+        if i.id in existing
+        and i.modified_at is not None
+        and (existing[i.id][1] is None or existing[i.id][1] < i.modified_at)
+    ]
+    now = timezone.now()
+    for instance in modified:
+        instance.update_date = now
+
+    PaymentRequest.objects.bulk_create(new, ignore_conflicts=True)
+    PaymentRequest.objects.bulk_update(modified, PAYMENT_REQUEST_UPSERT_FIELDS)
+
+    completed = [
+        i
+        for i in new + modified
+        if i.status == COMPLETED and existing.get(i.id, (None,))[0] != COMPLETED
+    ]
+    enqueue_payment_done(completed)
+    return instances
+
+
+def upsert_payments(items: list):
+    """
+    Inserts or updates listed payments in a single query, updates daily
+    rollups with the change and sends payments_recorded with the newly
+    inserted ones. Payments of payment requests that do not exist
+    locally are skipped.
+
+    Parameters
+    ----------
+    items: list
+        Payments as returned by Instamojo
+
+    Returns
+    -------
+    list: upserted Payment instances
+    """
+    from django.db import transaction
+
+    from .models import Payment
+    from .models import PaymentRequest
+    from .reconciliation import build_payment
+    from .rollups import FIELDS
+    from .rollups import apply_rollups
+    from .rollups import rollup_values
+    from .signals import payments_recorded
+
+    pr_ids = {payment_request_id_from(i.get("payment_request")) for i in items}
+    payment_requests = PaymentRequest.objects.only("id").in_bulk(
+        [pr_id for pr_id in pr_ids if pr_id]
+    )
+
+    instances = [
+        build_payment(payment_requests[pr_id], item)
+        for pr_id, item in (
+            (payment_request_id_from(i.get("payment_request")), i) for i in items
+        )
+        if pr_id in payment_requests
+    ]
+    if not instances:
+        return []
+
+    # Rollup values of existing payments, locked till they are updated
+    existing = {
+        values[0]: values[1:]
+        for values in Payment.objects.select_for_update()
+        .filter(id__in=[i.id for i in instances])
+        .values_list("id", *FIELDS)
+    }
+
+    # created_at that isn't listed is kept
+    for instance in instances:
+        if instance.created_at is None and instance.id in existing:
+            instance.created_at = existing[instance.id][0]
+
+    Payment.objects.bulk_create(
+        instances,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=PAYMENT_UPSERT_FIELDS,
+    )
+    apply_rollups(
+        added=[rollup_values(i) for i in instances],
+        removed=list(existing.values()),
+    )
+
+    new = [i for i in instances if i.id not in existing]
+    if new:
+        transaction.on_commit(
+            lambda: payments_recorded.send(sender=Payment, instances=new)
+        )
+    return instances
+
+
+def _get_state(name: str, full: bool):
+    """Returns SyncState of name, reset if full sync is requested"""
+    from .models import SyncState
+
+    state, _ = SyncState.objects.get_or_create(name=name)
+    if full:
+        state.watermark = state.cursor = state.pending_watermark = None
+    return state
+
+
+def _max(*values):
+    """Returns maximum of values ignoring None"""
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def sync_payment_requests(configuration, created_by, batch_size: int, full=False):
+    """
+    Syncs payment requests modified since last completed run
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+    created_by: User instance
+        Owner of payment requests that do not exist locally
+    batch_size: int
+        Payment requests per page
+    full: bool
+        Sync all payment requests, ignoring stored progress
+
+    Returns
+    -------
+    int: number of payment requests synced
+    """
+    from django.db import transaction
+
+    from .client import get_client
+
+    state = _get_state("payment_requests:{pk}".format(pk=configuration.pk), full)
+    min_modified_at = state.watermark.isoformat() if state.watermark else None
+
+    def fetch(page, limit):
+        return get_client(configuration).payment_requests_list(
+            min_modified_at=min_modified_at, page=page, limit=limit
+        )
+
+    count = 0
+    for page, items in iter_pages(
+        fetch, "payment_requests", page=state.cursor or 1, limit=batch_size
+    ):
+        with transaction.atomic():
+            instances = upsert_payment_requests(configuration, created_by, items)
+            state.cursor = page + 1
+            state.pending_watermark = _max(
+                state.pending_watermark, *(i.modified_at for i in instances)
+            )
+            state.save()
+        count += len(instances)
+
+    state.watermark = _max(state.watermark, state.pending_watermark)
+    state.cursor = state.pending_watermark = None
+    state.save()
+    return count
+
+
+def sync_payments(configuration, batch_size: int, full=False):
+    """
+    Syncs payments created since last completed run
+
+    Instamojo lists payments latest first and cannot filter them, so
+    listing is stopped at the first page that has no payment created
+    after the last completed run.
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+    batch_size: int
+        Payments per page
+    full: bool
+        Sync all payments, ignoring stored progress
+
+    Returns
+    -------
+    int: number of payments synced
+    """
+    from django.db import transaction
+
+    from .client import get_client
+    from .utils import parse_datetime
+
+    state = _get_state("payments:{pk}".format(pk=configuration.pk), full)
+
+    def fetch(page, limit):
+        return get_client(configuration).payments_list(page=page, limit=limit)
+
+    count = 0
+    for page, items in iter_pages(
+        fetch, "payments", page=state.cursor or 1, limit=batch_size
+    ):
+        created = [parse_datetime(i.get("created_at")) for i in items]
+        with transaction.atomic():
+            count += len(upsert_payments(items))
+            state.cursor = page + 1
+            state.pending_watermark = _max(state.pending_watermark, *created)
+            state.save()
+        if state.watermark and all(c and c < state.watermark for c in created):
+            break
+
+    state.watermark = _max(state.watermark, state.pending_watermark)
+    state.cursor = state.pending_watermark = None
+    state.save()
+    return count
+
+
+def sync(
+    configuration=None,
+    created_by=None,
+    batch_size: int = None,
+    full=False,
+    payments=True,
+):
+    """
+    Syncs payment requests and then their payments from Instamojo
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration, optional
+        Defaults to active configuration
+    created_by: User instance, optional
+        Owner of payment requests that do not exist locally. Defaults to
+        owner of configuration.
+    batch_size: int, optional
+        Records per page. Defaults to SYNC_BATCH_SIZE setting.
+    full: bool
+        Sync all records, ignoring stored progress
+    payments: bool
+        Whether to sync payments as well
+
+    Returns
+    -------
+    dict: number of payment requests and payments synced
+
+    Raises
+    ------
+    APIException: if no configuration is given or active, or Instamojo
+    returns an unsuccessful response
+    """
+    from .cache import get_active_configuration
+    from .models import InstamojoConfiguration
+    from .settings import get_setting
+
+    if configuration is None:
+        try:
+            configuration = get_active_configuration()
+        except InstamojoConfiguration.DoesNotExist:
+            raise APIException(_("No active Instamojo configuration found."))
+    created_by = created_by or configuration.created_by
+    batch_size = batch_size or get_setting("SYNC_BATCH_SIZE")
+
+    result = {
+        "payment_requests": sync_payment_requests(
+            configuration, created_by, batch_size, full=full
+        ),
+        "payments": 0,
+    }
+    if payments:
+        result["payments"] = sync_payments(configuration, batch_size, full=full)
+    return result
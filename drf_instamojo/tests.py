@@ -0,0 +1,180 @@
+"""
+Tests of drf_instamojo
+
+Run with ``python manage.py test drf_instamojo`` from a project that has
+drf_instamojo, django.contrib.admin and its dependencies installed.
+"""
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include
+from django.urls import path
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import InstamojoConfiguration
+from .models import Payment
+from .models import PaymentRequest
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("instamojo/", include("drf_instamojo.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, INSTAMOJO={})
+class InstamojoTestCase(TestCase):
+    """Test case with a superuser, a configuration and rows of those"""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Creates a superuser and a configuration"""
+        cls.user = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        cls.configuration = InstamojoConfiguration.objects.create(
+            api_key="key",
+            auth_token="token",
+            salt="salt",
+            base_url="https://test.instamojo.com/api/1.1/",
+            is_active=True,
+            created_by=cls.user,
+        )
+
+    def setUp(self):
+        """Logs superuser in"""
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.client.force_login(self.user)
+        self.rows = 0
+
+    def add_rows(self, count: int):
+        """
+        Creates count payment requests with a payment each, without
+        signals, so that no reconciliation is queued
+        """
+        payment_requests = PaymentRequest.objects.bulk_create(
+            PaymentRequest(
+                id="PR{index:05d}".format(index=index),
+                amount=10,
+                purpose="Purpose",
+                redirect_url="https://example.com/",
+                longurl="https://example.com/pay/",
+                created_by=self.user,
+                configuration=self.configuration,
+            )
+            for index in range(self.rows, self.rows + count)
+        )
+        Payment.objects.bulk_create(
+            Payment(
+                id="MOJO{pk}".format(pk=payment_request.id),
+                payment_request=payment_request,
+                status="Credit",
+                amount=10,
+            )
+            for payment_request in payment_requests
+        )
+        self.rows += count
+
+
+class QueryCountTest(InstamojoTestCase):
+    """
+    Query count of a page of list views and admin change lists doesn't
+    grow with the number of rows
+    """
+
+    def count_queries(self, get, url: str) -> int:
+        """Returns number of queries made by a GET of url"""
+        with CaptureQueriesContext(connection) as context:
+            response = get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, get, url: str):
+        """Asserts that url takes as many queries with 2 and 60 rows"""
+        self.add_rows(2)
+        expected = self.count_queries(get, url)
+        self.add_rows(58)
+        with self.assertNumQueries(expected):
+            response = get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_payment_request_list(self):
+        """Lists payment requests"""
+        self.assertConstantQueries(self.api.get, "/instamojo/request/")
+
+    def test_payment_list(self):
+        """Lists payments"""
+        self.assertConstantQueries(self.api.get, "/instamojo/payment/")
+
+    def test_payment_request_changelist(self):
+        """Lists payment requests in admin"""
+        self.assertConstantQueries(
+            self.client.get, "/admin/drf_instamojo/paymentrequest/"
+        )
+
+    def test_payment_changelist(self):
+        """Lists payments in admin"""
+        self.assertConstantQueries(self.client.get, "/admin/drf_instamojo/payment/")
+
+
+class PaginationTest(InstamojoTestCase):
+    """List views page through rows that share a create_date"""
+
+    def assertPagesThroughTies(self, url: str, model):
+        """
+        Asserts that next links return every row exactly once, and
+        previous links lead back, when all rows have the same create_date
+        """
+        self.add_rows(7)
+        model.objects.update(create_date=timezone.now())
+        expected = list(model.objects.order_by("-id").values_list("id", flat=True))
+
+        pages, url = [], url + "?page_size=3"
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.data["results"]])
+            url = response.data["next"]
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual(len(pages), 3)
+
+        url = response.data["previous"]
+        for page in reversed(pages[:-1]):
+            response = self.api.get(url)
+            self.assertEqual([row["id"] for row in response.data["results"]], page)
+            url = response.data["previous"]
+        self.assertIsNone(url)
+
+    def test_payment_request_list(self):
+        """Pages through payment requests"""
+        self.assertPagesThroughTies("/instamojo/request/", PaymentRequest)
+
+    def test_payment_list(self):
+        """Pages through payments"""
+        self.assertPagesThroughTies("/instamojo/payment/", Payment)
+
+    def test_invalid_cursor(self):
+        """Responds 404 to a cursor that isn't a position"""
+        response = self.api.get("/instamojo/request/?cursor=cD1pbnZhbGlk")
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportTest(InstamojoTestCase):
+    """CSV exports don't let spreadsheets run text as formulas"""
+
+    def test_formula_escaped(self):
+        """Escapes text that starts like a formula, in CSV only"""
+        self.add_rows(1)
+        PaymentRequest.objects.update(purpose="=HYPERLINK(0)")
+
+        response = self.api.get("/instamojo/request/export/")
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("'=HYPERLINK(0)", content)
+
+        response = self.api.get("/instamojo/request/export/?format=ndjson")
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn('"=HYPERLINK(0)"', content)
@@ -0,0 +1,316 @@
+"""
+Rate limiting and circuit breaking of calls to Instamojo
+
+Every client of a configuration, sync or async, shares one rate limiter
+and one circuit breaker:
+
+* Rate limiter keeps calls within RATE_LIMIT per second. A call waits up
+  to RATE_LIMIT_TIMEOUT seconds for its turn, and RateLimitExceeded is
+  raised otherwise. Limit is per process, unless RATE_LIMIT_CACHE names
+  a Django cache shared by all the nodes.
+* Circuit breaker opens when too many of the recent calls fail or are
+  slow. While it is open, calls fail right away with CircuitOpen instead
+  of piling up on a struggling Instamojo. After CIRCUIT_RESET_TIMEOUT
+  seconds a single trial call is let through, which closes the circuit
+  if it succeeds.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from .settings import get_setting
+
+
+class BaseRateLimiter:
+    """Base class for rate limiters"""
+
+    def take(self) -> float:
+        """
+        Takes a token if one is available
+
+        Returns
+        -------
+        float: 0 if token was taken, else seconds after which one may be
+        available
+        """
+        raise NotImplementedError
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Waits for a token
+
+        Parameters
+        ----------
+        timeout: float, optional
+            Maximum seconds to wait, waits as long as needed if None
+
+        Returns
+        -------
+        bool: True if token was taken within timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, timeout: float = None) -> bool:
+        """Async counterpart of acquire()"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take()
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class TokenBucket(BaseRateLimiter):
+    """
+    In-process token bucket, safe to share across threads
+
+    Parameters
+    ----------
+    rate: float
+        Tokens added per second
+    capacity: int, optional
+        Maximum tokens, i.e. burst size. Defaults to 1.
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        """Initialize bucket with all the tokens"""
+        self.rate = rate
+        self.capacity = capacity or 1
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """Takes a token, see BaseRateLimiter.take()"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class CacheRateLimiter(BaseRateLimiter):
+    """
+    Rate limiter shared by all the processes using a Django cache. Calls
+    are counted per one second window with atomic cache.incr(), so cache
+    must support it across processes, e.g. Redis or Memcached.
+
+    Parameters
+    ----------
+    name: str
+        Name of the limit, part of cache key
+    rate: float
+        Calls per second
+    cache: str
+        Alias of cache in CACHES
+    """
+
+    def __init__(self, name: str, rate: float, cache: str):
+        """Initialize limiter"""
+        from django.core.cache import caches
+
+        self.name = name
+        self.rate = max(int(rate), 1)
+        self.cache = caches[cache]
+
+    def take(self) -> float:
+        """Counts call in current window, see BaseRateLimiter.take()"""
+        now = time.time()
+        window = int(now)
+        key = "drf_instamojo:rate:{name}:{window}".format(name=self.name, window=window)
+        self.cache.add(key, 0, timeout=2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Key expired in between
+            self.cache.add(key, 1, timeout=2)
+            count = 1
+        if count <= self.rate:
+            return 0
+        return window + 1 - now
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker based on failure rate of calls in a sliding window
+
+    Parameters
+    ----------
+    failure_rate: float
+        Fraction of failed calls, in window, at which circuit opens
+    min_calls: int
+        Minimum calls in window before failure rate is considered
+    window: float
+        Seconds for which calls are remembered
+    slow_call: float
+        Seconds after which a call is counted as failed
+    reset_timeout: float
+        Seconds for which circuit stays open before a trial call
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate, min_calls, window, slow_call, reset_timeout):
+        """Initialize closed circuit"""
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.calls = deque()
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Checks if a call is allowed
+
+        Raises
+        ------
+        CircuitOpen: if circuit is open, or half open with trial call in
+        progress
+        """
+        from .exceptions import CircuitOpen
+
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpen()
+
+    def record(self, duration: float, failed: bool):
+        """
+        Records outcome of an allowed call
+
+        Parameters
+        ----------
+        duration: float
+            Seconds taken by the call
+        failed: bool
+            Whether the call failed
+        """
+        failed = failed or duration >= self.slow_call
+        now = time.monotonic()
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = self.CLOSED
+                    self.calls.clear()
+                    self.failures = 0
+                return
+            if self.state == self.OPEN:
+                # Call allowed before circuit opened
+                return
+
+            self.calls.append((now, failed))
+            self.failures += failed
+            while self.calls and self.calls[0][0] < now - self.window:
+                self.failures -= self.calls.popleft()[1]
+
+            calls = len(self.calls)
+            if calls >= self.min_calls and self.failures >= self.failure_rate * calls:
+                self._open(now)
+
+    def _open(self, now):
+        """Opens circuit"""
+        self.state = self.OPEN
+        self.opened_at = now
+        self.calls.clear()
+        self.failures = 0
+
+
+_limiters = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_rate_limiter(configuration):
+    """
+    Returns rate limiter shared by clients of configuration as per
+    settings
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+
+    Returns
+    -------
+    BaseRateLimiter or None: None if RATE_LIMIT is not set
+    """
+    rate = get_setting("RATE_LIMIT")
+    if not rate:
+        return None
+    limiter = _limiters.get(configuration.pk)
+    if limiter is None:
+        with _lock:
+            limiter = _limiters.get(configuration.pk)
+            if limiter is None:
+                cache = get_setting("RATE_LIMIT_CACHE")
+                if cache:
+                    limiter = CacheRateLimiter(
+                        name=str(configuration.pk), rate=rate, cache=cache
+                    )
+                else:
+                    limiter = TokenBucket(
+                        rate=rate, capacity=get_setting("RATE_LIMIT_BURST")
+                    )
+                _limiters[configuration.pk] = limiter
+    return limiter
+
+
+def get_circuit_breaker(configuration):
+    """
+    Returns circuit breaker shared by clients of configuration as per
+    settings
+
+    Parameters
+    ----------
+    configuration: InstamojoConfiguration
+
+    Returns
+    -------
+    CircuitBreaker or None: None if CIRCUIT_BREAKER is disabled
+    """
+    if not get_setting("CIRCUIT_BREAKER"):
+        return None
+    breaker = _breakers.get(configuration.pk)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(configuration.pk)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_rate=get_setting("CIRCUIT_FAILURE_RATE"),
+                    min_calls=get_setting("CIRCUIT_MIN_CALLS"),
+                    window=get_setting("CIRCUIT_WINDOW"),
+                    slow_call=get_setting("CIRCUIT_SLOW_CALL"),
+                    reset_timeout=get_setting("CIRCUIT_RESET_TIMEOUT"),
+                )
+                _breakers[configuration.pk] = breaker
+    return breaker
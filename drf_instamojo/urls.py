@@ -5,8 +5,17 @@ Author: Himanshu Shankar (https://himanshus.com)
 """
 from django.urls import path
 
+from .views import BulkAddPaymentRequestView
+from .views import ExportPaymentRequestView
+from .views import ExportPaymentView
 from .views import ListAddPaymentRequestView
 from .views import ListAddPaymentView
+from .views import MetricsView
+from .views import PaymentReportExportView
+from .views import PaymentReportView
+from .views import PaymentWebhookView
+from .views import RetrievePaymentRequestView
+from .views import RetrievePaymentView
 
 
 app_name = "drf_instamojo"
@@ -16,5 +25,30 @@ urlpatterns = [
     path(
         "request/", ListAddPaymentRequestView.as_view(), name="List Add Payment Request"
     ),
+    path(
+        "request/bulk/",
+        BulkAddPaymentRequestView.as_view(),
+        name="Bulk Add Payment Request",
+    ),
+    path(
+        "request/export/",
+        ExportPaymentRequestView.as_view(),
+        name="Export Payment Request",
+    ),
+    path(
+        "request/<str:pk>/",
+        RetrievePaymentRequestView.as_view(),
+        name="Retrieve Payment Request",
+    ),
     path("payment/", ListAddPaymentView.as_view(), name="List Add Payment"),
+    path("payment/export/", ExportPaymentView.as_view(), name="Export Payment"),
+    path("payment/<str:pk>/", RetrievePaymentView.as_view(), name="Retrieve Payment"),
+    path("webhook/", PaymentWebhookView.as_view(), name="Payment Webhook"),
+    path("report/payment/", PaymentReportView.as_view(), name="Payment Report"),
+    path(
+        "report/payment/export/",
+        PaymentReportExportView.as_view(),
+        name="Export Payment Report",
+    ),
+    path("metrics/", MetricsView.as_view(), name="Metrics"),
 ]
@@ -0,0 +1,42 @@
+"""
+Utilities for drf_instamojo
+"""
+
+
+def parse_datetime(value):
+    """
+    Parses datetime sent by Instamojo, e.g. "2020-08-23T14:06:10.405Z"
+
+    Parameters
+    ----------
+    value: str, datetime or None
+
+    Returns
+    -------
+    datetime or None: aware datetime if USE_TZ is True, otherwise naive
+    datetime in current timezone. None if value is empty or invalid.
+    """
+    import datetime
+
+    from django.conf import settings
+    from django.utils import dateparse
+    from django.utils import timezone
+
+    if not value:
+        return None
+
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        try:
+            parsed = dateparse.parse_datetime(str(value))
+        except ValueError:
+            return None
+        if parsed is None:
+            return None
+
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        return timezone.make_aware(parsed, datetime.timezone.utc)
+    if not settings.USE_TZ and timezone.is_aware(parsed):
+        return timezone.make_naive(parsed)
+    return parsed
@@ -27,8 +27,30 @@ SENT_STATUS_CHOICES = (
 
 PAYMENT_STATUS_CHOICES = ((CREDIT, "CREDIT"), (FAILED, "FAILED"))
 
+REPORT_GROUP_CHOICES = (
+    ("date", "DATE"),
+    ("month", "MONTH"),
+    ("status", "STATUS"),
+    ("instrument_type", "INSTRUMENT TYPE"),
+)
+
+CREATE = "create"
+STATUS = "status"
+WEBHOOK = "webhook"
+
+RAW_RESPONSE_SOURCE_CHOICES = (
+    (CREATE, "CREATE"),
+    (STATUS, "STATUS"),
+    (WEBHOOK, "WEBHOOK"),
+)
+
+TEXT_STORAGE = "text"
+COMPRESSED_STORAGE = "compressed"
+JSON_STORAGE = "json"
+
 CREATE_REQUEST = "payment-requests/"
 LIST_REQUEST = "payment-requests/"
+PAYMENTS_LIST_REQUEST = "payments/"
 RETRIEVE_REQUEST = "payment-requests/{id}/"
 DISABLE_REQUEST = "payment-requests/{id}/disable/"
 ENABLE_REQUEST = "payment-requests/{id}/enable/"
@@ -3,33 +3,382 @@ All views related to drf_instamojo
 
 Author: Himanshu Shankar (https://himanshus.com)
 """
+from drfaddons.generics import OwnerGenericAPIView
 from drfaddons.generics import OwnerListCreateAPIView
+from drfaddons.generics import OwnerRetrieveAPIView
+from rest_framework.generics import GenericAPIView
 from rest_framework.generics import ListCreateAPIView
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.views import APIView
 
+from .idempotency import IdempotentCreateMixin
+from .replicas import ReplicaReadMixin
 
-class ListAddPaymentRequestView(OwnerListCreateAPIView):
+
+class ListAddPaymentRequestView(
+    ReplicaReadMixin, IdempotentCreateMixin, OwnerListCreateAPIView
+):
     """
     Creates and Lists all payment requests by current user.
 
+    Send an Idempotency-Key header to safely retry creation. Lists are
+    read from a replica, if READ_DATABASES is set.
+
     Author: Himanshu Shankar (https://himanshus.com)
     """
 
-    from .serializers import PaymentRequestSerializer
+    from .filters import PaymentRequestFilter
     from .models import PaymentRequest
+    from .pagination import CreateDateCursorPagination
+    from .serializers import PaymentRequestSerializer
 
     serializer_class = PaymentRequestSerializer
-    queryset = PaymentRequest.objects.all()
+    # Load only the columns that are serialized
+    queryset = PaymentRequest.objects.only(
+        "create_date", *PaymentRequestSerializer.Meta.fields
+    )
+    pagination_class = CreateDateCursorPagination
+    filterset_class = PaymentRequestFilter
 
 
-class ListAddPaymentView(ListCreateAPIView):
+class ListAddPaymentView(ReplicaReadMixin, ListCreateAPIView):
     """
-    Creates and Lists all Payments made by current user.
+    Creates and Lists all Payments made by current user. Lists are read
+    from a replica, if READ_DATABASES is set.
 
     Author: Himanshu Shankar (https://himanshus.com)
     """
 
-    from .serializers import PaymentSerializer
+    from django_filters.rest_framework.backends import DjangoFilterBackend
+
+    from .filters import PaymentFilter
     from .models import Payment
+    from .pagination import CreateDateCursorPagination
+    from .serializers import PaymentSerializer
 
     serializer_class = PaymentSerializer
-    queryset = Payment.objects.all()
+    # Load only the columns that are serialized
+    queryset = Payment.objects.only("create_date", *PaymentSerializer.Meta.fields)
+    pagination_class = CreateDateCursorPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = PaymentFilter
+
+    def get_queryset(self):
+        """Payments of current user's payment requests"""
+        queryset = super(ListAddPaymentView, self).get_queryset()
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(payment_request__created_by=self.request.user)
+
+
+class PaymentWebhookView(APIView):
+    """
+    Receives payment webhooks from Instamojo.
+
+    Set this view's URL as webhook while creating a payment request.
+    MAC of data is verified against salt of payment request's
+    configuration and the payment is recorded without calling
+    Instamojo. Safe to be called multiple times with same data.
+    """
+
+    from rest_framework.parsers import FormParser
+    from rest_framework.parsers import MultiPartParser
+    from rest_framework.permissions import AllowAny
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    parser_classes = (FormParser, MultiPartParser)
+
+    def post(self, request, *args, **kwargs):
+        """Verifies and records the payment"""
+        from django.utils.text import gettext_lazy as _
+        from rest_framework import status
+        from rest_framework.exceptions import NotFound
+        from rest_framework.exceptions import PermissionDenied
+        from rest_framework.response import Response
+
+        from .models import PaymentRequest
+        from .webhooks import record_webhook_payment
+        from .webhooks import verify_mac
+
+        data = request.data.dict()
+
+        try:
+            pr = PaymentRequest.objects.select_related("configuration").get(
+                id=data.get("payment_request_id")
+            )
+        except PaymentRequest.DoesNotExist:
+            raise NotFound(_("Payment request does not exist."))
+
+        if not verify_mac(data, pr.configuration.salt):
+            raise PermissionDenied(_("Invalid MAC."))
+
+        record_webhook_payment(pr, data)
+        return Response(status=status.HTTP_200_OK)
+
+
+class BulkAddPaymentRequestView(OwnerGenericAPIView):
+    """
+    Creates many payment requests at once for current user.
+
+    Accepts a list of payment requests and responds with result of each,
+    in the same order. See
+    drf_instamojo.services.bulk_create_payment_requests.
+    """
+
+    from .models import PaymentRequest
+
+    queryset = PaymentRequest.objects.none()
+
+    def post(self, request, *args, **kwargs):
+        """Creates payment requests"""
+        from django.utils.text import gettext_lazy as _
+        from rest_framework.exceptions import ValidationError
+        from rest_framework.response import Response
+
+        from .replicas import mark_write
+        from .services import bulk_create_payment_requests
+        from .settings import get_setting
+
+        max_items = get_setting("BULK_MAX_ITEMS")
+        if not isinstance(request.data, list):
+            raise ValidationError(_("Expected a list of payment requests."))
+        if len(request.data) > max_items:
+            raise ValidationError(
+                _("At most {max_items} payment requests are allowed.").format(
+                    max_items=max_items
+                )
+            )
+
+        results = bulk_create_payment_requests(
+            request.data, created_by=request.user, request=request
+        )
+        # Read own payment requests from the primary for a while
+        mark_write(request.user.pk)
+        return Response(results)
+
+
+class RetrievePaymentRequestView(OwnerRetrieveAPIView):
+    """
+    Retrieves a payment request of current user along with its archived
+    raw responses.
+    """
+
+    from .serializers import PaymentRequestDetailSerializer
+    from .models import PaymentRequest
+
+    serializer_class = PaymentRequestDetailSerializer
+    queryset = PaymentRequest.objects.prefetch_related("raw_responses")
+
+
+class RetrievePaymentView(RetrieveAPIView):
+    """
+    Retrieves a payment made against payment request of current user
+    along with its archived raw responses.
+    """
+
+    from rest_framework.permissions import IsAuthenticated
+
+    from .serializers import PaymentDetailSerializer
+
+    serializer_class = PaymentDetailSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """Payments of current user's payment requests"""
+        from .models import Payment
+
+        return Payment.objects.filter(
+            payment_request__created_by=self.request.user
+        ).prefetch_related("raw_responses")
+
+
+class PaymentReportView(APIView):
+    """
+    Reports count and sums of amount, fees and affiliate commission of
+    payments between start and end, grouped by date, month, status and /
+    or instrument type. Read from daily rollups, so its cost doesn't
+    grow with number of payments. Allowed for staff users.
+    """
+
+    from rest_framework.permissions import IsAdminUser
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        """Returns a row per group"""
+        from rest_framework.response import Response
+
+        from .replicas import read_database
+        from .rollups import report_rollups
+        from .serializers import PaymentReportQuerySerializer
+
+        query = PaymentReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        return Response(
+            report_rollups(
+                start=data.get("start"),
+                end=data.get("end"),
+                group_by=data.get("group_by", ()),
+                statuses=data.get("status", ()),
+                instrument_type=data.get("instrument_type"),
+                using=read_database(request.user),
+            )
+        )
+
+
+class PaymentReportExportView(APIView):
+    """
+    Streams payments between start and end, of given status and
+    instrument type, as CSV or NDJSON. Allowed for staff users.
+    """
+
+    from rest_framework.permissions import IsAdminUser
+
+    from .renderers import CSVRenderer
+    from .renderers import NDJSONRenderer
+
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+
+    def get(self, request, *args, **kwargs):
+        """Streams payments, oldest first"""
+        from .exports import export_fields
+        from .exports import export_response
+        from .models import Payment
+        from .replicas import read_database
+        from .rollups import filter_payments
+        from .serializers import PaymentReportQuerySerializer
+
+        query = PaymentReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        data = query.validated_data
+
+        payments = filter_payments(
+            Payment.objects.using(read_database(request.user)),
+            start=data.get("start"),
+            end=data.get("end"),
+            statuses=data.get("status", ()),
+            instrument_type=data.get("instrument_type"),
+        ).order_by("created_at")
+        return export_response(
+            payments,
+            export_fields(Payment),
+            "payments",
+            format=request.accepted_renderer.format,
+        )
+
+
+class ExportPaymentRequestView(ReplicaReadMixin, OwnerGenericAPIView):
+    """
+    Streams all payment requests of current user, oldest first, as CSV
+    or NDJSON as per Accept header or ?format=csv / ?format=ndjson.
+
+    Takes filters of ListAddPaymentRequestView. Archived raw response of
+    creation is included with ?raw=true.
+    """
+
+    from .filters import PaymentRequestFilter
+    from .models import PaymentRequest
+    from .renderers import CSVRenderer
+    from .renderers import NDJSONRenderer
+
+    queryset = PaymentRequest.objects.order_by("create_date")
+    filterset_class = PaymentRequestFilter
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+
+    def get(self, request, *args, **kwargs):
+        """Streams payment requests"""
+        from .exports import export_fields
+        from .exports import export_response
+        from .mappers import to_bool
+        from .models import PaymentRequest
+
+        return export_response(
+            self.filter_queryset(self.get_queryset()),
+            export_fields(PaymentRequest),
+            "payment_requests",
+            format=request.accepted_renderer.format,
+            raw=to_bool(request.query_params.get("raw")),
+        )
+
+
+class ExportPaymentView(ReplicaReadMixin, GenericAPIView):
+    """
+    Streams all payments made by current user, oldest first, as CSV or
+    NDJSON as per Accept header or ?format=csv / ?format=ndjson.
+
+    Takes filters of ListAddPaymentView. Latest archived raw response of
+    each payment is included with ?raw=true.
+    """
+
+    from django_filters.rest_framework.backends import DjangoFilterBackend
+    from rest_framework.permissions import IsAuthenticated
+
+    from .filters import PaymentFilter
+    from .models import Payment
+    from .renderers import CSVRenderer
+    from .renderers import NDJSONRenderer
+
+    queryset = Payment.objects.order_by("create_date")
+    permission_classes = (IsAuthenticated,)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = PaymentFilter
+    renderer_classes = (CSVRenderer, NDJSONRenderer)
+
+    def get_queryset(self):
+        """Payments of current user's payment requests"""
+        queryset = super(ExportPaymentView, self).get_queryset()
+        return queryset.filter(payment_request__created_by=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        """Streams payments"""
+        from .exports import export_fields
+        from .exports import export_response
+        from .mappers import to_bool
+        from .models import Payment
+
+        return export_response(
+            self.filter_queryset(self.get_queryset()),
+            export_fields(Payment),
+            "payments",
+            format=request.accepted_renderer.format,
+            raw=to_bool(request.query_params.get("raw")),
+        )
+
+
+class MetricsView(APIView):
+    """
+    Exports metrics collected by drf_instamojo.metrics.InMemoryMetrics in
+    Prometheus text format. Allowed for staff users and METRICS_TOKEN,
+    which is accepted ahead of DEFAULT_AUTHENTICATION_CLASSES.
+    """
+
+    from rest_framework.settings import api_settings
+
+    from .authentication import MetricsTokenAuthentication
+    from .permissions import CanViewMetrics
+
+    authentication_classes = (
+        MetricsTokenAuthentication,
+        *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+    )
+    permission_classes = (CanViewMetrics,)
+
+    def get(self, request, *args, **kwargs):
+        """Renders metrics"""
+        from django.http import HttpResponse
+        from django.utils.text import gettext_lazy as _
+        from rest_framework.exceptions import NotFound
+
+        from .metrics import get_metrics
+
+        metrics = get_metrics()
+        if not hasattr(metrics, "export"):
+            raise NotFound(_("Metrics are not collected in memory."))
+
+        return HttpResponse(
+            metrics.export(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
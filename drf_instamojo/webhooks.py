@@ -0,0 +1,147 @@
+"""
+Handling of Instamojo webhooks
+
+Instamojo POSTs payment data to the webhook URL of payment request
+along with a MAC, i.e. HMAC-SHA1 of the data signed with private salt.
+Verified data is recorded as it is, without calling Instamojo.
+"""
+import hashlib
+import hmac
+
+
+def compute_mac(data: dict, salt: str) -> str:
+    """
+    Computes MAC of webhook data as per Instamojo.
+
+    Values are sorted by their (case-insensitive) keys, joined with
+    "|" and signed with salt using HMAC-SHA1.
+
+    Parameters
+    ----------
+    data: dict
+        Webhook data, mac (if present) is ignored
+    salt: str
+        Private salt of InstamojoConfiguration
+
+    Returns
+    -------
+    str: hex digest
+    """
+    keys = sorted((k for k in data if k != "mac"), key=lambda k: k.lower())
+    message = "|".join(str(data[k]) for k in keys)
+    return hmac.new(
+        salt.encode("utf-8"), message.encode("utf-8"), hashlib.sha1
+    ).hexdigest()
+
+
+def verify_mac(data: dict, salt: str) -> bool:
+    """
+    Checks MAC of webhook data in constant time.
+
+    Parameters
+    ----------
+    data: dict
+        Webhook data including mac
+    salt: str
+        Private salt of InstamojoConfiguration
+
+    Returns
+    -------
+    bool
+    """
+    mac = data.get("mac")
+    if not mac:
+        return False
+    return hmac.compare_digest(compute_mac(data, salt), str(mac))
+
+
+def record_webhook_payment(payment_request, data: dict):
+    """
+    Creates or updates Payment from verified webhook data and marks it
+    as verified via webhook. Payment request is marked as completed when
+    payment is credited.
+
+    Repeated deliveries of the same data change nothing, even if they
+    arrive concurrently. post_save is not sent for the payment, so no
+    reconciliation is queued.
+
+    Parameters
+    ----------
+    payment_request: PaymentRequest
+        Payment request of the payment
+    data: dict
+        Webhook data with verified MAC
+
+    Returns
+    -------
+    Payment
+    """
+    from django.db import IntegrityError
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .mappers import WEBHOOK_PAYMENT
+    from .models import Payment
+    from .models import RawResponse
+    from .reconciliation import build_payment
+    from .rollups import FIELDS
+    from .rollups import apply_rollups
+    from .rollups import rollup_values
+    from .signals import payments_recorded
+    from .variables import COMPLETED
+    from .variables import CREDIT
+    from .variables import WEBHOOK
+
+    payment = build_payment(payment_request, data, mapper=WEBHOOK_PAYMENT)
+    payment.webhook_verified = True
+    # Webhooks don't carry created_at, they are sent as payment is made.
+    # Sync overwrites it with Instamojo's.
+    if payment.created_at is None:
+        payment.created_at = timezone.now()
+
+    with transaction.atomic():
+        locked = (
+            Payment.objects.select_for_update()
+            .only("id", "mac", "webhook_verified", *FIELDS)
+            .filter(id=payment.id)
+        )
+        existing = locked.first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    Payment.objects.bulk_create([payment])
+            except IntegrityError:
+                # Inserted by a concurrent first delivery meanwhile
+                existing = locked.first()
+                if existing is None:
+                    raise
+
+        if existing is None:
+            apply_rollups(added=[rollup_values(payment)])
+            transaction.on_commit(
+                lambda: payments_recorded.send(sender=Payment, instances=[payment])
+            )
+        elif not (
+            existing.webhook_verified
+            and existing.status == payment.status
+            and existing.mac == payment.mac
+        ):
+            Payment.objects.filter(id=payment.id).update(
+                status=payment.status, mac=payment.mac, webhook_verified=True
+            )
+            previous = rollup_values(existing)
+            existing.status = payment.status
+            apply_rollups(added=[rollup_values(existing)], removed=[previous])
+        else:
+            # Repeated delivery
+            return payment
+
+        RawResponse.build(
+            data, source=WEBHOOK, payment_request=payment_request, payment=payment
+        ).save()
+
+        if payment.status == CREDIT and payment_request.status != COMPLETED:
+            payment_request.status = COMPLETED
+            payment_request.save(update_fields=["status", "update_date"])
+
+    return payment
@@ -13,26 +13,28 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     license=__import__("drf_instamojo").__license__,
     url="https://github.com/101Loop/drf-instamojo",
-    python_requires=">=3.4",
+    python_requires=">=3.8",
     install_requires=open("requirements.txt").read().split(),
+    extras_require={
+        "async": ["httpx>=0.23.0"],
+        "opentelemetry": ["opentelemetry-api>=1.12.0"],
+    },
     packages=setuptools.find_packages(),
     include_package_data=True,
     classifiers=(
         "Development Status :: 5 - Production/Stable",
         "Environment :: Web Environment",
         "Framework :: Django",
-        "Framework :: Django :: 2.0",
-        "Framework :: Django :: 2.1",
-        "Framework :: Django :: 2.2",
-        "Framework :: Django :: 3.1",
+        "Framework :: Django :: 4.1",
+        "Framework :: Django :: 4.2",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
         "Operating System :: OS Independent",
         "Programming Language :: Python",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
         "Topic :: Internet :: WWW/HTTP",
     ),
 )